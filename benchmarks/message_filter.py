@@ -0,0 +1,110 @@
+"""監視対象外チャンネルの投稿を BotClient が破棄できる速度を計測する。
+
+実行例: `poetry run python benchmarks/message_filter.py --rules 500 --messages 200000`
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time
+import types
+from datetime import datetime, timezone
+from pathlib import Path
+
+import discord
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from app.repositories import CachedChannelNicknameRuleStore, ChannelNicknameRule  # noqa: E402
+from app.services import TemporaryVoiceChannelService  # noqa: E402
+from bot.client import BotClient  # noqa: E402
+
+
+class _UnfilteredRuleStore:
+    """`is_watched` を持たないストア。従来どおり投稿ごとに on_message を起動させる。"""
+
+    def __init__(self, store: CachedChannelNicknameRuleStore) -> None:
+        self._store = store
+
+    async def get_rule_for_channel(self, guild_id: int, channel_id: int):
+        return await self._store.get_rule_for_channel(guild_id, channel_id)
+
+
+class _StaticRuleRepository:
+    def __init__(self, rules: list[ChannelNicknameRule]) -> None:
+        self._rules = rules
+
+    async def list_rules(self) -> list[ChannelNicknameRule]:
+        return self._rules
+
+
+def _build_rules(count: int) -> list[ChannelNicknameRule]:
+    now = datetime.now(timezone.utc)
+    return [
+        ChannelNicknameRule(
+            guild_id=index % 50,
+            channel_id=1_000_000 + index,
+            role_id=1,
+            updated_by=1,
+            updated_at=now,
+        )
+        for index in range(count)
+    ]
+
+
+def _build_message(guild_id: int, channel_id: int) -> types.SimpleNamespace:
+    return types.SimpleNamespace(
+        guild=types.SimpleNamespace(id=guild_id),
+        channel=types.SimpleNamespace(id=channel_id),
+        author=types.SimpleNamespace(bot=False),
+    )
+
+
+async def _measure(client: BotClient, messages: list, message_count: int) -> float:
+    started = time.perf_counter()
+    for index in range(message_count):
+        client.dispatch("message", messages[index & 1023])
+    pending = asyncio.all_tasks() - {asyncio.current_task()}
+    if pending:
+        await asyncio.gather(*pending)
+    return time.perf_counter() - started
+
+
+async def _run(rule_count: int, message_count: int) -> None:
+    store = CachedChannelNicknameRuleStore(_StaticRuleRepository(_build_rules(rule_count)))
+    await store.load()
+    messages = [_build_message(index % 50, 5_000_000 + index) for index in range(1024)]
+
+    voice_service = TemporaryVoiceChannelService(
+        category_repo=types.SimpleNamespace(), channel_repo=types.SimpleNamespace()
+    )
+    filtered = BotClient(
+        intents=discord.Intents.none(),
+        rule_store=store,
+        temporary_voice_service=voice_service,
+    )
+    unfiltered = BotClient(
+        intents=discord.Intents.none(),
+        rule_store=_UnfilteredRuleStore(store),
+        temporary_voice_service=voice_service,
+    )
+    async with filtered, unfiltered:
+        filtered_elapsed = await _measure(filtered, messages, message_count)
+        unfiltered_elapsed = await _measure(unfiltered, messages, message_count)
+
+    print(f"rules={rule_count} messages={message_count}")
+    print(f"dispatch で同期破棄     : {message_count / filtered_elapsed:,.0f} msg/s")
+    print(f"on_message で await 判定: {message_count / unfiltered_elapsed:,.0f} msg/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rules", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=200_000)
+    args = parser.parse_args()
+    asyncio.run(_run(args.rules, args.messages))
+
+
+if __name__ == "__main__":
+    main()
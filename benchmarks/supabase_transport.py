@@ -0,0 +1,173 @@
+"""Supabase クライアントの HTTP 接続設定ごとのスループットを計測する。
+
+ローカルに PostgREST 互換の最小サーバーを立て、`Database` を通して SELECT を並行実行する。
+同一の SELECT は `Database` 内で 1 回にまとめられるため、リクエストごとにフィルター値を変える。
+新規接続ごとに `--connect-delay` 秒（TLS ハンドシェイク相当）、リクエストごとに `--latency` 秒と
+`--bandwidth-mbps` の帯域で送るのにかかる時間を待つ。平文 HTTP のため HTTP/2 は使われない。
+
+実行例: `poetry run python benchmarks/supabase_transport.py --requests 2000 --concurrency 20`
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from app.database import Database, HttpTransportOptions  # noqa: E402
+from app.resilience import TimeoutPolicy  # noqa: E402
+
+
+class _PostgrestStandIn:
+    """どのテーブルへの GET にも同じ行を返す、keep-alive と gzip に対応した HTTP/1.1 サーバー。"""
+
+    def __init__(
+        self, *, rows: int, connect_delay: float, latency: float, bandwidth_mbps: float
+    ) -> None:
+        payload = [
+            {
+                "guild_id": 1,
+                "owner_user_id": 10_000 + index,
+                "channel_id": 20_000 + index,
+                "category_id": 30_000,
+                "created_at": "2026-01-01T00:00:00+00:00",
+                "last_seen_at": "2026-01-01T00:00:00+00:00",
+            }
+            for index in range(rows)
+        ]
+        self._body = json.dumps(payload).encode()
+        self._gzipped = gzip.compress(self._body)
+        self._connect_delay = connect_delay
+        self._latency = latency
+        self._bytes_per_second = bandwidth_mbps * 1_000_000 / 8
+        self._server: asyncio.base_events.Server | None = None
+        self.connections = 0
+
+    @property
+    def url(self) -> str:
+        assert self._server is not None
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        await asyncio.sleep(self._connect_delay)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                headers: dict[str, str] = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                use_gzip = "gzip" in headers.get("accept-encoding", "")
+                body = self._gzipped if use_gzip else self._body
+                delay = self._latency
+                if self._bytes_per_second > 0:
+                    delay += len(body) / self._bytes_per_second
+                await asyncio.sleep(delay)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                writer.write(
+                    (
+                        "HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                        f"Content-Length: {len(body)}\r\n"
+                        + ("Content-Encoding: gzip\r\n" if use_gzip else "")
+                        + ("" if keep_alive else "Connection: close\r\n")
+                        + "\r\n"
+                    ).encode("latin-1")
+                    + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            return
+        finally:
+            writer.close()
+
+
+async def _measure(
+    url: str, transport: HttpTransportOptions, *, requests: int, concurrency: int
+) -> float:
+    # 接続待ちの偏りでタイムアウトしないよう、打ち切りは無効にしてスループットだけを測る
+    database = Database(
+        url, "benchmark-key", timeouts=TimeoutPolicy(default=0), transport=transport
+    )
+    await database.connect()
+    remaining = iter(range(requests))
+
+    async def worker() -> None:
+        for index in remaining:
+            await database.execute(
+                database.table("temporary_voice_channels").select("*").eq("guild_id", index)
+            )
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - started
+    finally:
+        await database.close()
+
+
+async def _run(args: argparse.Namespace) -> None:
+    server = _PostgrestStandIn(
+        rows=args.rows,
+        connect_delay=args.connect_delay,
+        latency=args.latency,
+        bandwidth_mbps=args.bandwidth_mbps,
+    )
+    await server.start()
+    scenarios = {
+        "既定 (keep-alive 30s, 20 接続, gzip)": HttpTransportOptions(),
+        "keep-alive なし": HttpTransportOptions(keepalive_expiry=0),
+        "gzip なし": HttpTransportOptions(gzip=False),
+        "5 接続まで": HttpTransportOptions(max_connections=5),
+    }
+    print(
+        f"requests={args.requests} concurrency={args.concurrency} rows={args.rows} "
+        f"connect_delay={args.connect_delay}s latency={args.latency}s "
+        f"bandwidth={args.bandwidth_mbps}Mbps"
+    )
+    try:
+        for label, transport in scenarios.items():
+            before = server.connections
+            elapsed = await _measure(
+                server.url, transport, requests=args.requests, concurrency=args.concurrency
+            )
+            print(
+                f"{label:<36}: {args.requests / elapsed:8,.0f} req/s "
+                f"(新規接続 {server.connections - before})"
+            )
+    finally:
+        await server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=200)
+    parser.add_argument("--connect-delay", type=float, default=0.1)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--bandwidth-mbps", type=float, default=20.0)
+    args = parser.parse_args()
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
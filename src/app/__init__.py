@@ -1,8 +1,17 @@
-from .config import AppConfig, DatabaseSettings, DiscordSettings, load_config
+from .config import (
+    AppConfig,
+    DatabaseSettings,
+    DiscordSettings,
+    NicknameSyncSettings,
+    TemporaryVoiceSettings,
+    load_config,
+)
 
 __all__ = [
     "AppConfig",
     "DiscordSettings",
     "DatabaseSettings",
+    "NicknameSyncSettings",
+    "TemporaryVoiceSettings",
     "load_config",
 ]
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Generic, Hashable, Mapping, Sequence, TypeVar
+
+from app.deadlines import without_deadline
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass(slots=True)
+class BatchLoaderStats:
+    """単一キーの取得件数と、まとめて実行した回数。"""
+
+    loads: int = 0
+    batches: int = 0
+    batched_keys: int = 0
+    last_batch_size: int = 0
+    max_batch_size: int = 0
+
+
+class BatchLoader(Generic[K, V]):
+    """同じ時間枠に届いた単一キーの取得をまとめ、`load_many` の 1 回の呼び出しで解決する。
+
+    `window=0` では同じイベントループの 1 周の間に届いた取得を、正の値ではその秒数の間に
+    届いた取得をまとめる。`max_batch_size` 件たまった時点で待たずに実行する。
+    `load_many` は見つかったキーだけを含むマッピングを返し、含まれないキーは `None` になる。
+    まとめた取得は `request_deadline()` の締め切りを引き継がずに実行するため、呼び出し元ごとの
+    締め切りは待つ側（`Database.wait_within_deadline` など）で適用する。
+    """
+
+    def __init__(
+        self,
+        load_many: Callable[[Sequence[K]], Awaitable[Mapping[K, V]]],
+        *,
+        window: float = 0.0,
+        max_batch_size: int = 100,
+    ) -> None:
+        if window < 0:
+            raise ValueError("window must not be negative")
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self._load_many = load_many
+        self._window = window
+        self._max_batch_size = max_batch_size
+        self._pending: dict[K, asyncio.Future[V | None]] = {}
+        self._timer: asyncio.Handle | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+        self.stats = BatchLoaderStats()
+
+    async def load(self, key: K) -> V | None:
+        self.stats.loads += 1
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._pending[key] = future
+            if len(self._pending) >= self._max_batch_size:
+                self._dispatch()
+            elif self._timer is None:
+                if self._window > 0:
+                    self._timer = loop.call_later(self._window, self._dispatch)
+                else:
+                    self._timer = loop.call_soon(self._dispatch)
+        # 同じキーを待つ他の呼び出し元がいるため、キャンセルを共有の Future に伝えない
+        return await asyncio.shield(future)
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        if not batch:
+            return
+        # 最初の呼び出し元の締め切りで同じバッチの他の呼び出し元まで打ち切られないようにする
+        with without_deadline():
+            task = asyncio.get_running_loop().create_task(self._resolve(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, batch: dict[K, asyncio.Future[V | None]]) -> None:
+        self.stats.batches += 1
+        self.stats.batched_keys += len(batch)
+        self.stats.last_batch_size = len(batch)
+        self.stats.max_batch_size = max(self.stats.max_batch_size, len(batch))
+        try:
+            found = await self._load_many(list(batch))
+        except asyncio.CancelledError:
+            for future in batch.values():
+                future.cancel()
+            raise
+        except Exception as exc:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(exc)
+                    # 呼び出し元がキャンセル済みでも例外の未取得警告を出さない
+                    future.exception()
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(found.get(key))
+
+
+__all__ = ["BatchLoader", "BatchLoaderStats"]
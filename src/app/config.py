@@ -2,13 +2,15 @@ from __future__ import annotations
 
 import logging
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
 from urllib.parse import urlparse
 
 from dotenv import load_dotenv
 
 LOGGER = logging.getLogger(__name__)
+DATABASE_BACKENDS = ("supabase", "sqlite", "postgres")
+DEFAULT_SQLITE_PATH = "data/announcement_bot.sqlite3"
 
 
 @dataclass(frozen=True, slots=True)
@@ -20,10 +22,63 @@ class DiscordSettings:
 
 @dataclass(frozen=True, slots=True)
 class DatabaseSettings:
-    """Supabase 接続情報を保持する。"""
+    """永続化先の設定を保持する。`backend` が `sqlite` / `postgres` では Supabase の接続情報は使わない。"""
 
     url: str
     key: str
+    backend: str = "supabase"
+    sqlite_path: str = DEFAULT_SQLITE_PATH
+    postgres_dsn: str = ""
+    postgres_pool_min_size: int = 1
+    postgres_pool_max_size: int = 10
+    postgres_statement_cache_size: int = 100
+    postgres_command_timeout_seconds: float = 5.0
+    outbox_path: str = ""
+    retry_attempts: int = 3
+    retry_base_delay_seconds: float = 0.2
+    retry_max_delay_seconds: float = 2.0
+    breaker_failure_threshold: int = 5
+    breaker_reset_seconds: float = 30.0
+    timeout_seconds: float = 5.0
+    timeout_overrides: tuple[tuple[str, float], ...] = ()
+    http_max_connections: int = 20
+    http_keepalive_expiry_seconds: float = 30.0
+    http2: bool = True
+    http_gzip: bool = True
+    batch_window_seconds: float = 0.0
+
+
+@dataclass(frozen=True, slots=True)
+class NicknameSyncSettings:
+    """ニックネーム同期ワーカーの設定値を保持する。"""
+
+    worker_count: int = 2
+    queue_size: int = 256
+    coalesce_seconds: float = 1.0
+    forbidden_ttl_seconds: float = 600.0
+
+
+@dataclass(frozen=True, slots=True)
+class TemporaryVoiceSettings:
+    """一時VC機能の設定値を保持する。"""
+
+    last_seen_flush_seconds: float = 30.0
+    last_seen_batch_size: int = 500
+    teardown_concurrency: int = 5
+    empty_grace_seconds: float = 15.0
+    reconcile_interval_seconds: float = 3600.0
+    reconcile_page_size: int = 100
+    reconcile_page_delay_seconds: float = 0.5
+    pool_size: int = 0
+    idle_ttl_seconds: float = 86400.0
+
+
+@dataclass(frozen=True, slots=True)
+class MetricsSettings:
+    """メトリクス公開用 HTTP サーバーの設定値を保持する。`port=0` で無効。"""
+
+    host: str = "127.0.0.1"
+    port: int = 0
 
 
 @dataclass(frozen=True, slots=True)
@@ -32,6 +87,11 @@ class AppConfig:
 
     discord: DiscordSettings
     database: DatabaseSettings
+    nickname_sync: NicknameSyncSettings = field(default_factory=NicknameSyncSettings)
+    temporary_voice: TemporaryVoiceSettings = field(
+        default_factory=TemporaryVoiceSettings
+    )
+    metrics: MetricsSettings = field(default_factory=MetricsSettings)
 
 
 def _load_env_file(env_file: str | Path | None) -> None:
@@ -86,21 +146,292 @@ def _prepare_supabase_key(raw_key: str | None) -> str:
     return raw_key.strip()
 
 
+def _prepare_database_backend(raw_value: str | None) -> str:
+    """`DATABASE_BACKEND` を検証する。未設定なら Supabase。"""
+
+    if raw_value is None or raw_value.strip() == "":
+        return "supabase"
+    backend = raw_value.strip().lower()
+    if backend not in DATABASE_BACKENDS:
+        raise ValueError(
+            f"DATABASE_BACKEND must be one of: {', '.join(DATABASE_BACKENDS)}."
+        )
+    return backend
+
+
+def _prepare_positive_int(raw_value: str | None, *, name: str, default: int) -> int:
+    """正の整数を取る任意設定を検証する。"""
+
+    if raw_value is None or raw_value.strip() == "":
+        return default
+    try:
+        value = int(raw_value.strip())
+    except ValueError as exc:
+        raise ValueError(f"{name} must be an integer.") from exc
+    if value < 1:
+        raise ValueError(f"{name} must be greater than 0.")
+    return value
+
+
+def _prepare_non_negative_int(raw_value: str | None, *, name: str, default: int) -> int:
+    """0 以上の整数を取る任意設定を検証する（0 は無効化を表す）。"""
+
+    if raw_value is None or raw_value.strip() == "":
+        return default
+    try:
+        value = int(raw_value.strip())
+    except ValueError as exc:
+        raise ValueError(f"{name} must be an integer.") from exc
+    if value < 0:
+        raise ValueError(f"{name} must not be negative.")
+    return value
+
+
+def _prepare_port(raw_value: str | None, *, name: str, default: int) -> int:
+    """TCP ポート番号を検証する（0 は無効化を表す）。"""
+
+    value = _prepare_non_negative_int(raw_value, name=name, default=default)
+    if value > 65535:
+        raise ValueError(f"{name} must be a valid TCP port.")
+    return value
+
+
+def _prepare_non_negative_float(
+    raw_value: str | None, *, name: str, default: float
+) -> float:
+    """0 以上の秒数などを取る任意設定を検証する。"""
+
+    if raw_value is None or raw_value.strip() == "":
+        return default
+    try:
+        value = float(raw_value.strip())
+    except ValueError as exc:
+        raise ValueError(f"{name} must be a number.") from exc
+    if value < 0:
+        raise ValueError(f"{name} must not be negative.")
+    return value
+
+
+def _prepare_bool(raw_value: str | None, *, name: str, default: bool) -> bool:
+    """`true`/`false` などの真偽値を取る任意設定を検証する。"""
+
+    if raw_value is None or raw_value.strip() == "":
+        return default
+    normalized = raw_value.strip().lower()
+    if normalized in {"1", "true", "yes", "on"}:
+        return True
+    if normalized in {"0", "false", "no", "off"}:
+        return False
+    raise ValueError(f"{name} must be a boolean (true/false).")
+
+
+def _prepare_timeout_overrides(
+    raw_value: str | None, *, name: str
+) -> tuple[tuple[str, float], ...]:
+    """`テーブル.操作=秒,テーブル=秒` 形式のタイムアウト個別設定を検証する。"""
+
+    if raw_value is None or raw_value.strip() == "":
+        return ()
+    overrides: list[tuple[str, float]] = []
+    for item in raw_value.split(","):
+        if item.strip() == "":
+            continue
+        key, separator, seconds = item.partition("=")
+        if not separator or key.strip() == "":
+            raise ValueError(f"{name} entries must look like 'table.operation=seconds'.")
+        overrides.append(
+            (
+                key.strip(),
+                _prepare_non_negative_float(seconds, name=name, default=0.0),
+            )
+        )
+    return tuple(overrides)
+
+
 def load_config(env_file: str | Path | None = None) -> AppConfig:
     """環境変数と .env から設定を読み込む。"""
 
     _load_env_file(env_file)
 
     token = _prepare_client_token(raw_token=os.getenv("DISCORD_BOT_TOKEN"))
-    database_url = _prepare_supabase_url(raw_url=os.getenv("SUPABASE_URL"))
-    database_key = _prepare_supabase_key(raw_key=os.getenv("SUPABASE_KEY"))
+    database_backend = _prepare_database_backend(os.getenv("DATABASE_BACKEND"))
+    if database_backend == "supabase":
+        database_url = _prepare_supabase_url(raw_url=os.getenv("SUPABASE_URL"))
+        database_key = _prepare_supabase_key(raw_key=os.getenv("SUPABASE_KEY"))
+    else:
+        database_url = (os.getenv("SUPABASE_URL") or "").strip()
+        database_key = (os.getenv("SUPABASE_KEY") or "").strip()
+    postgres_dsn = (os.getenv("POSTGRES_DSN") or "").strip()
+    if database_backend == "postgres" and not postgres_dsn:
+        raise ValueError("POSTGRES_DSN is required when DATABASE_BACKEND=postgres.")
+    postgres_pool_min_size = _prepare_non_negative_int(
+        os.getenv("POSTGRES_POOL_MIN_SIZE"), name="POSTGRES_POOL_MIN_SIZE", default=1
+    )
+    postgres_pool_max_size = _prepare_positive_int(
+        os.getenv("POSTGRES_POOL_MAX_SIZE"), name="POSTGRES_POOL_MAX_SIZE", default=10
+    )
+    if postgres_pool_min_size > postgres_pool_max_size:
+        raise ValueError("POSTGRES_POOL_MIN_SIZE must not exceed POSTGRES_POOL_MAX_SIZE.")
+    nickname_sync = NicknameSyncSettings(
+        worker_count=_prepare_positive_int(
+            os.getenv("NICKNAME_SYNC_WORKERS"), name="NICKNAME_SYNC_WORKERS", default=2
+        ),
+        queue_size=_prepare_positive_int(
+            os.getenv("NICKNAME_SYNC_QUEUE_SIZE"),
+            name="NICKNAME_SYNC_QUEUE_SIZE",
+            default=256,
+        ),
+        coalesce_seconds=_prepare_non_negative_float(
+            os.getenv("NICKNAME_SYNC_COALESCE_SECONDS"),
+            name="NICKNAME_SYNC_COALESCE_SECONDS",
+            default=1.0,
+        ),
+        forbidden_ttl_seconds=_prepare_non_negative_float(
+            os.getenv("NICKNAME_SYNC_FORBIDDEN_TTL_SECONDS"),
+            name="NICKNAME_SYNC_FORBIDDEN_TTL_SECONDS",
+            default=600.0,
+        ),
+    )
+
+    temporary_voice = TemporaryVoiceSettings(
+        last_seen_flush_seconds=_prepare_non_negative_float(
+            os.getenv("TEMPORARY_VC_LAST_SEEN_FLUSH_SECONDS"),
+            name="TEMPORARY_VC_LAST_SEEN_FLUSH_SECONDS",
+            default=30.0,
+        ),
+        last_seen_batch_size=_prepare_positive_int(
+            os.getenv("TEMPORARY_VC_LAST_SEEN_BATCH_SIZE"),
+            name="TEMPORARY_VC_LAST_SEEN_BATCH_SIZE",
+            default=500,
+        ),
+        teardown_concurrency=_prepare_positive_int(
+            os.getenv("TEMPORARY_VC_TEARDOWN_CONCURRENCY"),
+            name="TEMPORARY_VC_TEARDOWN_CONCURRENCY",
+            default=5,
+        ),
+        empty_grace_seconds=_prepare_non_negative_float(
+            os.getenv("TEMPORARY_VC_EMPTY_GRACE_SECONDS"),
+            name="TEMPORARY_VC_EMPTY_GRACE_SECONDS",
+            default=15.0,
+        ),
+        reconcile_interval_seconds=_prepare_non_negative_float(
+            os.getenv("TEMPORARY_VC_RECONCILE_INTERVAL_SECONDS"),
+            name="TEMPORARY_VC_RECONCILE_INTERVAL_SECONDS",
+            default=3600.0,
+        ),
+        reconcile_page_size=_prepare_positive_int(
+            os.getenv("TEMPORARY_VC_RECONCILE_PAGE_SIZE"),
+            name="TEMPORARY_VC_RECONCILE_PAGE_SIZE",
+            default=100,
+        ),
+        reconcile_page_delay_seconds=_prepare_non_negative_float(
+            os.getenv("TEMPORARY_VC_RECONCILE_PAGE_DELAY_SECONDS"),
+            name="TEMPORARY_VC_RECONCILE_PAGE_DELAY_SECONDS",
+            default=0.5,
+        ),
+        pool_size=_prepare_non_negative_int(
+            os.getenv("TEMPORARY_VC_POOL_SIZE"), name="TEMPORARY_VC_POOL_SIZE", default=0
+        ),
+        idle_ttl_seconds=_prepare_non_negative_float(
+            os.getenv("TEMPORARY_VC_IDLE_TTL_SECONDS"),
+            name="TEMPORARY_VC_IDLE_TTL_SECONDS",
+            default=86400.0,
+        ),
+    )
+
+    metrics = MetricsSettings(
+        host=(os.getenv("METRICS_HOST") or "").strip() or "127.0.0.1",
+        port=_prepare_port(os.getenv("METRICS_PORT"), name="METRICS_PORT", default=0),
+    )
 
     LOGGER.info("設定の読み込みが完了しました。")
 
     return AppConfig(
         discord=DiscordSettings(token=token),
-        database=DatabaseSettings(url=database_url, key=database_key),
+        database=DatabaseSettings(
+            url=database_url,
+            key=database_key,
+            backend=database_backend,
+            sqlite_path=(os.getenv("SQLITE_PATH") or "").strip() or DEFAULT_SQLITE_PATH,
+            postgres_dsn=postgres_dsn,
+            postgres_pool_min_size=postgres_pool_min_size,
+            postgres_pool_max_size=postgres_pool_max_size,
+            postgres_statement_cache_size=_prepare_non_negative_int(
+                os.getenv("POSTGRES_STATEMENT_CACHE_SIZE"),
+                name="POSTGRES_STATEMENT_CACHE_SIZE",
+                default=100,
+            ),
+            postgres_command_timeout_seconds=_prepare_non_negative_float(
+                os.getenv("POSTGRES_COMMAND_TIMEOUT_SECONDS"),
+                name="POSTGRES_COMMAND_TIMEOUT_SECONDS",
+                default=5.0,
+            ),
+            outbox_path=(os.getenv("OUTBOX_PATH") or "").strip(),
+            retry_attempts=_prepare_positive_int(
+                os.getenv("SUPABASE_RETRY_ATTEMPTS"), name="SUPABASE_RETRY_ATTEMPTS", default=3
+            ),
+            retry_base_delay_seconds=_prepare_non_negative_float(
+                os.getenv("SUPABASE_RETRY_BASE_DELAY_SECONDS"),
+                name="SUPABASE_RETRY_BASE_DELAY_SECONDS",
+                default=0.2,
+            ),
+            retry_max_delay_seconds=_prepare_non_negative_float(
+                os.getenv("SUPABASE_RETRY_MAX_DELAY_SECONDS"),
+                name="SUPABASE_RETRY_MAX_DELAY_SECONDS",
+                default=2.0,
+            ),
+            breaker_failure_threshold=_prepare_positive_int(
+                os.getenv("SUPABASE_BREAKER_FAILURE_THRESHOLD"),
+                name="SUPABASE_BREAKER_FAILURE_THRESHOLD",
+                default=5,
+            ),
+            breaker_reset_seconds=_prepare_non_negative_float(
+                os.getenv("SUPABASE_BREAKER_RESET_SECONDS"),
+                name="SUPABASE_BREAKER_RESET_SECONDS",
+                default=30.0,
+            ),
+            timeout_seconds=_prepare_non_negative_float(
+                os.getenv("SUPABASE_TIMEOUT_SECONDS"),
+                name="SUPABASE_TIMEOUT_SECONDS",
+                default=5.0,
+            ),
+            timeout_overrides=_prepare_timeout_overrides(
+                os.getenv("SUPABASE_TIMEOUT_OVERRIDES"), name="SUPABASE_TIMEOUT_OVERRIDES"
+            ),
+            http_max_connections=_prepare_positive_int(
+                os.getenv("SUPABASE_HTTP_MAX_CONNECTIONS"),
+                name="SUPABASE_HTTP_MAX_CONNECTIONS",
+                default=20,
+            ),
+            http_keepalive_expiry_seconds=_prepare_non_negative_float(
+                os.getenv("SUPABASE_HTTP_KEEPALIVE_EXPIRY_SECONDS"),
+                name="SUPABASE_HTTP_KEEPALIVE_EXPIRY_SECONDS",
+                default=30.0,
+            ),
+            http2=_prepare_bool(
+                os.getenv("SUPABASE_HTTP2"), name="SUPABASE_HTTP2", default=True
+            ),
+            http_gzip=_prepare_bool(
+                os.getenv("SUPABASE_HTTP_GZIP"), name="SUPABASE_HTTP_GZIP", default=True
+            ),
+            batch_window_seconds=_prepare_non_negative_float(
+                os.getenv("SUPABASE_BATCH_WINDOW_SECONDS"),
+                name="SUPABASE_BATCH_WINDOW_SECONDS",
+                default=0.0,
+            ),
+        ),
+        nickname_sync=nickname_sync,
+        temporary_voice=temporary_voice,
+        metrics=metrics,
     )
 
 
-__all__ = ["AppConfig", "DiscordSettings", "DatabaseSettings", "load_config"]
+__all__ = [
+    "AppConfig",
+    "DiscordSettings",
+    "DatabaseSettings",
+    "MetricsSettings",
+    "NicknameSyncSettings",
+    "TemporaryVoiceSettings",
+    "load_config",
+]
@@ -1,17 +1,47 @@
 from __future__ import annotations
 
+import functools
 import logging
 from dataclasses import dataclass
+from typing import Mapping
 
+from app.batch_loader import BatchLoader
 from app.config import AppConfig
-from app.database import Database
+from app.database import Database, HttpTransportOptions
+from app.metrics import REGISTRY, MetricsRegistry
+from app.postgres_database import PostgresDatabase
+from app.sqlite_database import SQLiteDatabase
+from app.resilience import CircuitBreaker, CircuitState, RetryPolicy, TimeoutPolicy
 from app.repositories import (
+    CachedChannelNicknameRuleStore,
+    CachedTemporaryVoiceChannelStore,
     ChannelNicknameRuleRepository,
+    LastSeenFlusher,
+    OutboxTemporaryVoiceCategoryRepository,
+    OutboxTemporaryVoiceChannelRepository,
+    PostgresChannelNicknameRuleRepository,
+    PostgresTemporaryVoiceCategoryRepository,
+    PostgresTemporaryVoiceChannelRepository,
+    SQLiteChannelNicknameRuleRepository,
+    SQLiteTemporaryVoiceCategoryRepository,
+    SQLiteTemporaryVoiceChannelRepository,
     TemporaryVoiceCategoryRepository,
     TemporaryVoiceChannelRepository,
+    WriteOutbox,
 )
-from app.services import TemporaryVoiceChannelService
-from bot import BotClient, register_commands
+from app.services import (
+    IdleChannelSweeper,
+    TemporaryVoiceChannelPool,
+    TemporaryVoiceChannelService,
+    TemporaryVoiceReconciler,
+)
+from bot import (
+    BotClient,
+    MemberManageabilityCache,
+    NicknameEnforcementQueue,
+    register_commands,
+)
+from bot.handlers import enforce_nickname_and_role
 
 LOGGER = logging.getLogger(__name__)
 
@@ -22,7 +52,10 @@ class DiscordApplication:
 
     client: BotClient
     token: str
-    database: Database
+    database: Database | SQLiteDatabase | PostgresDatabase
+    last_seen_flusher: LastSeenFlusher | None = None
+    idle_sweeper: IdleChannelSweeper | None = None
+    outbox: WriteOutbox | None = None
 
     async def run(self) -> None:
         """クライアントを起動する。"""
@@ -31,6 +64,12 @@ class DiscordApplication:
             async with self.client:
                 await self.client.start(self.token)
         finally:
+            if self.idle_sweeper is not None:
+                await self.idle_sweeper.close()
+            if self.last_seen_flusher is not None:
+                await self.last_seen_flusher.stop()
+            if self.outbox is not None:
+                await self.outbox.close()
             await self.database.close()
 
 
@@ -38,28 +77,230 @@ async def build_discord_app(config: AppConfig) -> DiscordApplication:
     """Discord クライアントを初期化し、コマンド登録までを完了させる。"""
 
     LOGGER.info("Discord アプリケーションの初期化を開始します。")
-    database = Database(config.database.url, config.database.key)
-    await database.connect()
-    LOGGER.info("Supabase への接続が完了しました。")
-    rule_repository = ChannelNicknameRuleRepository(database)
-    temporary_category_repo = TemporaryVoiceCategoryRepository(database)
-    temporary_channel_repo = TemporaryVoiceChannelRepository(database)
+    database: Database | SQLiteDatabase | PostgresDatabase
+    batch_loaders: dict[str, BatchLoader] = {}
+    if config.database.backend == "postgres":
+        database = PostgresDatabase(
+            config.database.postgres_dsn,
+            min_size=config.database.postgres_pool_min_size,
+            max_size=config.database.postgres_pool_max_size,
+            statement_cache_size=config.database.postgres_statement_cache_size,
+            command_timeout=config.database.postgres_command_timeout_seconds,
+        )
+        await database.connect()
+        rule_repository = PostgresChannelNicknameRuleRepository(database)
+        temporary_category_repo = PostgresTemporaryVoiceCategoryRepository(database)
+        temporary_channel_repository = PostgresTemporaryVoiceChannelRepository(database)
+    elif config.database.backend == "sqlite":
+        database = SQLiteDatabase(config.database.sqlite_path)
+        await database.connect()
+        rule_repository = SQLiteChannelNicknameRuleRepository(database)
+        temporary_category_repo = SQLiteTemporaryVoiceCategoryRepository(database)
+        temporary_channel_repository = SQLiteTemporaryVoiceChannelRepository(database)
+    else:
+        database = _build_supabase_database(config)
+        await database.connect()
+        LOGGER.info("Supabase への接続が完了しました。")
+        rule_repository = ChannelNicknameRuleRepository(database)
+        # ルールと一時VCは索引が応答するため、データベースまで届くカテゴリ取得だけをまとめる
+        category_repository = TemporaryVoiceCategoryRepository(
+            database, batch_window=config.database.batch_window_seconds
+        )
+        temporary_category_repo = category_repository
+        temporary_channel_repository = TemporaryVoiceChannelRepository(database)
+        batch_loaders = {"temporary_vc_category_loader": category_repository.loader}
+    outbox: WriteOutbox | None = None
+    if config.database.outbox_path and config.database.backend != "sqlite":
+        outbox = WriteOutbox(config.database.outbox_path)
+        temporary_category_repo = OutboxTemporaryVoiceCategoryRepository(
+            temporary_category_repo, outbox
+        )
+        temporary_channel_repository = OutboxTemporaryVoiceChannelRepository(
+            temporary_channel_repository, outbox
+        )
+        await outbox.open()
+        outbox.start()
+    rule_store = CachedChannelNicknameRuleStore(rule_repository)
+    await rule_store.load()
+    last_seen_flusher: LastSeenFlusher | None = None
+    if config.temporary_voice.last_seen_flush_seconds > 0:
+        last_seen_flusher = LastSeenFlusher(
+            temporary_channel_repository,
+            interval=config.temporary_voice.last_seen_flush_seconds,
+            max_batch_size=config.temporary_voice.last_seen_batch_size,
+        )
+    temporary_channel_repo = CachedTemporaryVoiceChannelStore(
+        temporary_channel_repository, flusher=last_seen_flusher
+    )
+    await temporary_channel_repo.load()
+    if last_seen_flusher is not None:
+        last_seen_flusher.start()
+    temporary_voice_pool: TemporaryVoiceChannelPool | None = None
+    if config.temporary_voice.pool_size > 0:
+        temporary_voice_pool = TemporaryVoiceChannelPool(
+            size=config.temporary_voice.pool_size
+        )
     temporary_voice_service = TemporaryVoiceChannelService(
         category_repo=temporary_category_repo,
         channel_repo=temporary_channel_repo,
+        teardown_concurrency=config.temporary_voice.teardown_concurrency,
+        empty_grace_seconds=config.temporary_voice.empty_grace_seconds,
+        pool=temporary_voice_pool,
+    )
+    member_permissions = MemberManageabilityCache(
+        forbidden_ttl=config.nickname_sync.forbidden_ttl_seconds
+    )
+    nickname_queue = NicknameEnforcementQueue(
+        functools.partial(enforce_nickname_and_role, permissions=member_permissions),
+        workers=config.nickname_sync.worker_count,
+        max_size=config.nickname_sync.queue_size,
+        coalesce_window=config.nickname_sync.coalesce_seconds,
     )
     client = BotClient(
-        rule_store=rule_repository,
+        rule_store=rule_store,
         temporary_voice_service=temporary_voice_service,
+        nickname_queue=nickname_queue,
+        member_permissions=member_permissions,
+    )
+    client.reconciler = TemporaryVoiceReconciler(
+        temporary_voice_service,
+        lambda: client.guilds,
+        interval=config.temporary_voice.reconcile_interval_seconds,
+        page_size=config.temporary_voice.reconcile_page_size,
+        page_delay=config.temporary_voice.reconcile_page_delay_seconds,
+    )
+    idle_sweeper: IdleChannelSweeper | None = None
+    if config.temporary_voice.idle_ttl_seconds > 0:
+        idle_sweeper = IdleChannelSweeper(
+            temporary_voice_service,
+            client.get_guild,
+            ttl=config.temporary_voice.idle_ttl_seconds,
+            concurrency=config.temporary_voice.teardown_concurrency,
+        )
+        temporary_channel_repo.add_observer(idle_sweeper)
+    _register_stats_metrics(
+        REGISTRY,
+        database=database,
+        rule_store=rule_store,
+        last_seen_flusher=last_seen_flusher,
+        outbox=outbox,
+        batch_loaders=batch_loaders,
+        service=temporary_voice_service,
+        reconciler=client.reconciler,
+        idle_sweeper=idle_sweeper,
+        nickname_queue=nickname_queue,
+        member_permissions=member_permissions,
     )
     await register_commands(
         client,
-        rule_store=rule_repository,
+        rule_store=rule_store,
         temporary_voice_service=temporary_voice_service,
     )
     LOGGER.info("Discord クライアントの初期化が完了し、コマンドを登録しました。")
     return DiscordApplication(
-        client=client, token=config.discord.token, database=database
+        client=client,
+        token=config.discord.token,
+        database=database,
+        last_seen_flusher=last_seen_flusher,
+        idle_sweeper=idle_sweeper,
+        outbox=outbox,
+    )
+
+
+def _build_supabase_database(config: AppConfig) -> Database:
+    return Database(
+        config.database.url,
+        config.database.key,
+        retry_policy=RetryPolicy(
+            max_attempts=config.database.retry_attempts,
+            base_delay=config.database.retry_base_delay_seconds,
+            max_delay=config.database.retry_max_delay_seconds,
+        ),
+        circuit_breaker=CircuitBreaker(
+            failure_threshold=config.database.breaker_failure_threshold,
+            reset_timeout=config.database.breaker_reset_seconds,
+        ),
+        timeouts=TimeoutPolicy(
+            default=config.database.timeout_seconds,
+            overrides=dict(config.database.timeout_overrides),
+        ),
+        transport=HttpTransportOptions(
+            max_connections=config.database.http_max_connections,
+            keepalive_expiry=config.database.http_keepalive_expiry_seconds,
+            http2=config.database.http2,
+            gzip=config.database.http_gzip,
+        ),
+    )
+
+
+def _register_stats_metrics(
+    registry: MetricsRegistry,
+    *,
+    database: Database | SQLiteDatabase | PostgresDatabase,
+    rule_store: CachedChannelNicknameRuleStore,
+    last_seen_flusher: LastSeenFlusher | None,
+    outbox: WriteOutbox | None,
+    batch_loaders: Mapping[str, BatchLoader],
+    service: TemporaryVoiceChannelService,
+    reconciler: TemporaryVoiceReconciler,
+    idle_sweeper: IdleChannelSweeper | None,
+    nickname_queue: NicknameEnforcementQueue,
+    member_permissions: MemberManageabilityCache,
+) -> None:
+    """各コンポーネントの統計値を出力時に読み出すゲージとして登録する。"""
+
+    if isinstance(database, Database):
+        registry.register_stats("supabase", database.stats, "Supabase リクエストの統計")
+        registry.register_stats(
+            "supabase_circuit", database.circuit_breaker.stats, "サーキットブレーカーの統計"
+        )
+        registry.register_stats(
+            "supabase_singleflight", database.reads.stats, "同一 select の相乗りの統計"
+        )
+        registry.gauge(
+            "supabase_circuit_state",
+            "サーキットブレーカーの現在の状態 (1 が現在の状態)",
+            lambda: {
+                (state.value,): float(database.circuit_breaker.state is state)
+                for state in CircuitState
+            },
+            ("state",),
+        )
+    for prefix, loader in batch_loaders.items():
+        registry.register_stats(prefix, loader.stats, "単一キー取得のまとめ実行の統計")
+    registry.register_stats("nickname_rule_cache", rule_store.stats, "ニックネームルールキャッシュの統計")
+    if last_seen_flusher is not None:
+        registry.register_stats(
+            "temporary_vc_last_seen", last_seen_flusher.stats, "last_seen_at 一括書き込みの統計"
+        )
+    if outbox is not None:
+        registry.register_stats("outbox", outbox.stats, "書き込みアウトボックスの統計")
+        registry.gauge(
+            "outbox_pending_writes", "アウトボックスの送信待ち件数", lambda: outbox.pending_count
+        )
+    registry.register_stats("temporary_vc", service.stats, "一時VCサービスの統計")
+    registry.register_stats("temporary_vc_guild_lock", service.guild_locks.stats, "ギルドロックの統計")
+    registry.gauge(
+        "temporary_vc_pending_deletions",
+        "猶予期間中の無人一時VCの数",
+        lambda: service.pending_deletion_count,
+    )
+    if service.pool is not None:
+        registry.register_stats("temporary_vc_pool", service.pool.stats, "待機VCプールの統計")
+    registry.register_stats("temporary_vc_reconcile", reconciler.stats, "整合性チェックの統計")
+    if idle_sweeper is not None:
+        registry.register_stats("temporary_vc_idle_sweep", idle_sweeper.stats, "放置VC削除の統計")
+        registry.gauge(
+            "temporary_vc_idle_tracked",
+            "放置判定の対象として追跡中の一時VCの数",
+            lambda: idle_sweeper.tracked_count,
+        )
+    registry.register_stats("nickname_queue", nickname_queue.stats, "ニックネーム同期キューの統計")
+    registry.gauge(
+        "nickname_queue_depth", "ニックネーム同期キューの待ち件数", lambda: nickname_queue.depth
+    )
+    registry.register_stats(
+        "member_permissions", member_permissions.stats, "権限判定キャッシュの統計"
     )
 
 
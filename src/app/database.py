@@ -1,12 +1,115 @@
 from __future__ import annotations
 
 import asyncio
+import importlib.util
+import inspect
 import logging
-from typing import Any
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, TypeVar
 
-from supabase import AsyncClient, create_async_client
+import httpx
+from supabase import AsyncClient, AsyncClientOptions, create_async_client
+
+from app.deadlines import remaining_budget
+from app.metrics import REGISTRY
+from app.resilience import (
+    CircuitBreaker,
+    CircuitState,
+    RetryPolicy,
+    TimeoutPolicy,
+    describe_request,
+    is_idempotent_request,
+    is_transient_error,
+)
+from app.singleflight import SingleFlight
 
 LOGGER = logging.getLogger(__name__)
+T = TypeVar("T")
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "supabase_request_duration_seconds",
+    "Supabase リクエストの所要時間（再試行を含む）",
+    ("table", "operation", "outcome"),
+)
+RETRIES = REGISTRY.counter(
+    "supabase_retries_total", "Supabase リクエストの再試行回数", ("table", "operation")
+)
+COLLAPSED_READS = REGISTRY.counter(
+    "supabase_collapsed_reads_total",
+    "実行中の同一 select に相乗りして送信を省いた回数",
+    ("table",),
+)
+
+
+class DatabaseUnavailableError(RuntimeError):
+    """サーキットブレーカーが開いているため Supabase へ送らずに失敗した。"""
+
+
+class DatabaseTimeoutError(RuntimeError):
+    """Supabase への呼び出しがタイムアウト、または呼び出し側の締め切りを過ぎた。"""
+
+    def __init__(self, table: str, operation: str, timeout: float) -> None:
+        super().__init__(
+            f"Supabase {operation} on {table} timed out after {timeout:.3f}s"
+        )
+        self.table = table
+        self.operation = operation
+        self.timeout = timeout
+
+
+@dataclass(slots=True)
+class DatabaseStats:
+    """`execute` の実行回数・再試行回数・失敗件数。"""
+
+    requests: int = 0
+    attempts: int = 0
+    retries: int = 0
+    transient_failures: int = 0
+    failures: int = 0
+    timeouts: int = 0
+    short_circuited: int = 0
+
+
+# Supabase SDK の既定値と同じ。実際の打ち切りは `TimeoutPolicy` で行う。
+HTTP_CLIENT_TIMEOUT_SECONDS = 120.0
+
+
+@dataclass(frozen=True, slots=True)
+class HttpTransportOptions:
+    """Supabase SDK に渡す httpx クライアントの接続設定。
+
+    `keepalive_expiry=0` で接続を使い回さず、`gzip=False` でレスポンスの圧縮を要求しない。
+    """
+
+    max_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = True
+    gzip: bool = True
+
+    def __post_init__(self) -> None:
+        if self.max_connections < 1:
+            raise ValueError("max_connections must be at least 1")
+        if self.keepalive_expiry < 0:
+            raise ValueError("keepalive_expiry must not be negative")
+
+    def build_client(self) -> httpx.AsyncClient:
+        http2 = self.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            LOGGER.warning("h2 パッケージがないため HTTP/1.1 で接続します。")
+            http2 = False
+        keepalive = self.keepalive_expiry > 0
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections if keepalive else 0,
+                keepalive_expiry=self.keepalive_expiry if keepalive else None,
+            ),
+            headers=None if self.gzip else {"Accept-Encoding": "identity"},
+            timeout=HTTP_CLIENT_TIMEOUT_SECONDS,
+            follow_redirects=True,
+        )
 
 
 class Database:
@@ -16,11 +119,23 @@ class Database:
         self,
         url: str,
         key: str,
+        *,
+        retry_policy: RetryPolicy | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+        timeouts: TimeoutPolicy | None = None,
+        transport: HttpTransportOptions | None = None,
     ) -> None:
         self._url = url
         self._key = key
         self._client: AsyncClient | None = None
+        self._http_client: httpx.AsyncClient | None = None
+        self.transport = transport or HttpTransportOptions()
         self._connect_lock = asyncio.Lock()
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.timeouts = timeouts or TimeoutPolicy()
+        self.stats = DatabaseStats()
+        self.reads: SingleFlight[tuple[Any, ...], list[dict[str, Any]]] = SingleFlight()
 
     async def connect(self) -> None:
         """Supabase への接続を初期化する。"""
@@ -33,8 +148,24 @@ class Database:
                 return
 
             LOGGER.info("Supabase (%s) への接続を開始します。", self._url)
-            self._client = await create_async_client(self._url, self._key)
-            LOGGER.info("Supabase クライアントの初期化が完了しました。")
+            http_client = self.transport.build_client()
+            try:
+                self._client = await create_async_client(
+                    self._url,
+                    self._key,
+                    options=AsyncClientOptions(httpx_client=http_client),
+                )
+            except BaseException:
+                await http_client.aclose()
+                raise
+            self._http_client = http_client
+            LOGGER.info(
+                "Supabase クライアントの初期化が完了しました: max_connections=%s keepalive=%ss http2=%s gzip=%s",
+                self.transport.max_connections,
+                self.transport.keepalive_expiry,
+                self.transport.http2,
+                self.transport.gzip,
+            )
 
     async def close(self) -> None:
         """接続をクローズする。"""
@@ -48,21 +179,169 @@ class Database:
 
             client = self._client
             self._client = None
+            http_client, self._http_client = self._http_client, None
+            if http_client is not None:
+                await http_client.aclose()
             close_fn = getattr(client, "aclose", None) or getattr(client, "close", None)
             if callable(close_fn):
                 result = close_fn()
                 if asyncio.iscoroutine(result):
                     await result
                 LOGGER.info("Supabase 接続をクローズしました。")
+            elif http_client is not None:
+                LOGGER.info("Supabase の HTTP 接続プールをクローズしました。")
             else:
                 LOGGER.info(
                     "Supabase クライアントは明示的な close を持たないため参照を破棄しました。"
                 )
 
     async def execute(self, request) -> list[dict[str, Any]]:
-        """Supabase リクエストを実行し、データを返す。"""
+        """Supabase リクエストを実行し、データを返す。
+
+        1 回の試行は `timeouts` のテーブル・操作別の秒数と、`request_deadline()` で渡された
+        締め切りまでの残り時間の短い方で打ち切り、`DatabaseTimeoutError` を送出する。
+        通信断や 5xx などの一時的なエラーは、冪等なリクエストに限り `retry_policy` に従って
+        再試行する。一時的なエラーが続くとサーキットブレーカーが開き、復旧を試すまでの間は
+        `DatabaseUnavailableError` で即座に失敗する。
+        同じ select（テーブル・フィルター・ヘッダーが一致するもの）が実行中なら送信せず、
+        その結果を共有する。共有する select は締め切りと切り離して実行し、呼び出し元ごとの
+        締め切りは結果を待つ側で適用する。select 以外を送る前後には同じテーブルの実行中の
+        select を切り離し、書き込みより前に読んだ結果を後から来た呼び出し元へ返さない。
+        """
+
+        self.stats.requests += 1
+        table, operation = describe_request(request)
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            read_key = _read_key(table, request) if operation == "select" else None
+            if read_key is None:
+                if operation != "select":
+                    self._invalidate_reads(table)
+                try:
+                    data = await self._execute_with_retry(request, table, operation)
+                finally:
+                    if operation != "select":
+                        self._invalidate_reads(table)
+            else:
+                if self.reads.is_inflight(read_key):
+                    COLLAPSED_READS.inc(labels=(table,))
+                shared = await self.wait_within_deadline(
+                    self.reads.do(
+                        read_key, lambda: self._execute_with_retry(request, table, operation)
+                    ),
+                    table,
+                    operation,
+                )
+                data = list(shared)
+            outcome = "ok"
+            return data
+        except DatabaseTimeoutError:
+            outcome = "timeout"
+            raise
+        except DatabaseUnavailableError:
+            outcome = "unavailable"
+            raise
+        finally:
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started, (table, operation, outcome)
+            )
+
+    async def wait_within_deadline(self, shared: Awaitable[T], table: str, operation: str) -> T:
+        """締め切りと切り離して実行中の共有の処理を、呼び出し元の締め切りまで待つ。
+
+        `shared` は打ち切られても止まらないもの（`asyncio.shield` 済み）を渡す。
+        締め切りを過ぎたら、この呼び出し元だけが `DatabaseTimeoutError` になる。
+        """
+
+        budget = remaining_budget()
+        if budget is not None and budget <= 0:
+            self.stats.timeouts += 1
+            # 待たずに返すため、渡されたコルーチンは実行せずに閉じる
+            if inspect.iscoroutine(shared):
+                shared.close()
+            raise DatabaseTimeoutError(table, operation, 0.0)
+        try:
+            async with asyncio.timeout(budget) as scope:
+                return await shared
+        except TimeoutError as exc:
+            if not scope.expired():
+                raise
+            self.stats.timeouts += 1
+            raise DatabaseTimeoutError(table, operation, budget or 0.0) from exc
+
+    def _invalidate_reads(self, table: str) -> None:
+        self.reads.invalidate(lambda key: key[0] == table)
+
+    async def _execute_with_retry(
+        self, request, table: str, operation: str
+    ) -> list[dict[str, Any]]:
+        retryable = is_idempotent_request(request)
+        policy_timeout = self.timeouts.timeout_for(table, operation)
+        attempt = 0
+        while True:
+            attempt += 1
+            budget = remaining_budget()
+            if budget is not None and budget <= 0:
+                self.stats.timeouts += 1
+                raise DatabaseTimeoutError(table, operation, 0.0)
+            timeout = policy_timeout or None
+            if budget is not None and (timeout is None or budget < timeout):
+                timeout = budget
+            if not self.circuit_breaker.allow():
+                self.stats.short_circuited += 1
+                raise DatabaseUnavailableError("Supabase circuit breaker is open")
+            self.stats.attempts += 1
+            try:
+                async with asyncio.timeout(timeout):
+                    response = await request.execute()
+            except TimeoutError as exc:
+                self.stats.timeouts += 1
+                error: Exception = DatabaseTimeoutError(table, operation, timeout or 0.0)
+                error.__cause__ = exc
+                if timeout != policy_timeout:
+                    # 呼び出し側の締め切りで打ち切っただけなので Supabase の失敗には数えない
+                    self.circuit_breaker.record_abandoned()
+                    self.stats.failures += 1
+                    raise error
+                self.circuit_breaker.record_failure()
+            except Exception as exc:
+                if not is_transient_error(exc):
+                    self.circuit_breaker.record_success()
+                    self.stats.failures += 1
+                    raise
+                self.circuit_breaker.record_failure()
+                error = exc
+            except BaseException:
+                self.circuit_breaker.record_abandoned()
+                raise
+            else:
+                self.circuit_breaker.record_success()
+                break
+
+            self.stats.transient_failures += 1
+            delay = self.retry_policy.backoff(attempt)
+            budget = remaining_budget()
+            if (
+                not retryable
+                or attempt >= self.retry_policy.max_attempts
+                or self.circuit_breaker.state is CircuitState.OPEN
+                or (budget is not None and budget <= delay)
+            ):
+                self.stats.failures += 1
+                raise error
+            self.stats.retries += 1
+            RETRIES.inc(labels=(table, operation))
+            LOGGER.warning(
+                "Supabase リクエストを再試行します: table=%s operation=%s attempt=%s delay=%.3fs error=%r",
+                table,
+                operation,
+                attempt,
+                delay,
+                error,
+            )
+            await asyncio.sleep(delay)
 
-        response = await request.execute()
         error = getattr(response, "error", None)
         if error is not None:
             LOGGER.error("Supabase クエリエラーが発生しました: %s", error)
@@ -82,6 +361,11 @@ class Database:
             return None
         return data[0]
 
+    def rpc(self, name: str, params: dict[str, Any]):
+        """データベース関数を呼ぶリクエストビルダーを返す。"""
+
+        return self._require_client().rpc(name, params)
+
     def table(self, name: str):
         """テーブルアクセス用のクエリビルダーを返す。"""
 
@@ -93,4 +377,28 @@ class Database:
         return self._client
 
 
-__all__ = ["Database"]
+def _read_key(table: str, request) -> tuple[Any, ...] | None:
+    """select リクエストを同一視するためのキー。先頭はテーブル名で、パラメーターの順序は問わない。"""
+
+    config = getattr(request, "request", None)
+    path = getattr(config, "path", None)
+    if path is None:
+        return None
+    params = getattr(config, "params", None)
+    headers = getattr(config, "headers", None)
+    return (
+        table,
+        type(request),
+        str(path),
+        tuple(sorted(params.multi_items())) if params is not None else (),
+        tuple(sorted(headers.items())) if headers is not None else (),
+    )
+
+
+__all__ = [
+    "Database",
+    "DatabaseStats",
+    "DatabaseTimeoutError",
+    "DatabaseUnavailableError",
+    "HttpTransportOptions",
+]
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+# `time.monotonic()` 基準の締め切り。未設定なら None。
+_REQUEST_DEADLINE: ContextVar[float | None] = ContextVar("request_deadline", default=None)
+
+
+def current_deadline() -> float | None:
+    """現在のタスクに設定された締め切り（`time.monotonic()` 基準）を返す。"""
+
+    return _REQUEST_DEADLINE.get()
+
+
+def remaining_budget() -> float | None:
+    """締め切りまでの残り秒数を返す。締め切りがなければ None、過ぎていれば 0 以下。"""
+
+    deadline = _REQUEST_DEADLINE.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+@contextmanager
+def request_deadline(deadline: float | None) -> Iterator[None]:
+    """ブロック内の Supabase 呼び出しに締め切りを伝える。
+
+    入れ子にした場合は早い方の締め切りが有効になる。`None` なら何もしない。
+    """
+
+    if deadline is None:
+        yield
+        return
+    outer = _REQUEST_DEADLINE.get()
+    token = _REQUEST_DEADLINE.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        _REQUEST_DEADLINE.reset(token)
+
+
+@contextmanager
+def without_deadline() -> Iterator[None]:
+    """ブロック内（とそこで作成したタスク）を呼び出し元の締め切りから切り離す。"""
+
+    token = _REQUEST_DEADLINE.set(None)
+    try:
+        yield
+    finally:
+        _REQUEST_DEADLINE.reset(token)
+
+
+__all__ = ["current_deadline", "remaining_budget", "request_deadline", "without_deadline"]
@@ -0,0 +1,290 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+from array import array
+from bisect import bisect_left
+from dataclasses import fields, is_dataclass
+from typing import Callable, Iterable, Mapping, Sequence
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_LATENCY_BUCKETS: tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = tuple[str, ...]
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """単調増加のカウンター。ラベル値の組ごとに 1 つの float を持つ。"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, labels: LabelValues = ()) -> None:
+        if amount < 0:
+            raise ValueError("counter can only increase")
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, labels: LabelValues = ()) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram:
+    """固定バケットのヒストグラム。
+
+    ラベル値の組ごとに `array('d')` を 1 本だけ持ち、[各バケットの件数..., +Inf の件数, 合計, 件数]
+    を格納する。観測値ごとのオブジェクトは作らない。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        *,
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> None:
+        bounds = sorted(float(bound) for bound in buckets if not math.isinf(bound))
+        if not bounds:
+            raise ValueError("at least one finite bucket is required")
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._bounds = tuple(bounds)
+        self._series: dict[LabelValues, array] = {}
+
+    @property
+    def buckets(self) -> tuple[float, ...]:
+        return self._bounds
+
+    def observe(self, value: float, labels: LabelValues = ()) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = array("d", bytes(8 * (len(self._bounds) + 3)))
+            self._series[labels] = series
+        series[bisect_left(self._bounds, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def count(self, labels: LabelValues = ()) -> int:
+        series = self._series.get(labels)
+        return int(series[-1]) if series is not None else 0
+
+    def total(self, labels: LabelValues = ()) -> float:
+        series = self._series.get(labels)
+        return series[-2] if series is not None else 0.0
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, series in self._series.items():
+            cumulative = 0.0
+            for index, bound in enumerate((*self._bounds, math.inf)):
+                cumulative += series[index]
+                le = f'le="{_format_value(bound)}"'
+                yield (
+                    f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} "
+                    f"{_format_value(cumulative)}"
+                )
+            label_text = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {_format_value(series[-2])}"
+            yield f"{self.name}_count{label_text} {_format_value(series[-1])}"
+
+
+class Gauge:
+    """読み出し時に `collect()` を呼んで値を得るゲージ。"""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        collect: Callable[[], float | Mapping[LabelValues, float]],
+        labelnames: Sequence[str] = (),
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._collect = collect
+
+    def render(self) -> Iterable[str]:
+        try:
+            collected = self._collect()
+        except Exception:
+            LOGGER.exception("メトリクスの収集に失敗しました: %s", self.name)
+            return
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} gauge"
+        samples = collected if isinstance(collected, Mapping) else {(): collected}
+        for labels, value in samples.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(float(value))}"
+
+
+class MetricsRegistry:
+    """メトリクスを名前で管理し、Prometheus のテキスト形式で出力する。"""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter | Histogram | Gauge] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        *,
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+    def gauge(
+        self,
+        name: str,
+        documentation: str,
+        collect: Callable[[], float | Mapping[LabelValues, float]],
+        labelnames: Sequence[str] = (),
+    ) -> Gauge:
+        """`collect` を出力時に呼ぶゲージを登録する。同名のゲージは置き換える。"""
+
+        gauge = Gauge(name, documentation, collect, labelnames)
+        self._metrics[name] = gauge
+        return gauge
+
+    def register_stats(self, prefix: str, stats: object, documentation: str) -> None:
+        """`stats` データクラスの数値フィールドを `{prefix}_{フィールド名}` のゲージとして公開する。"""
+
+        if not is_dataclass(stats):
+            raise TypeError("stats must be a dataclass instance")
+        for stats_field in fields(stats):
+            if not isinstance(getattr(stats, stats_field.name), (int, float)):
+                continue
+            self.gauge(
+                f"{prefix}_{stats_field.name}",
+                f"{documentation} ({stats_field.name})",
+                lambda name=stats_field.name: getattr(stats, name),
+            )
+
+    def get(self, name: str) -> Counter | Histogram | Gauge | None:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric):
+                raise ValueError(f"metric {metric.name} is already registered")
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+
+REGISTRY = MetricsRegistry()
+
+
+class MetricsServer:
+    """`GET /metrics` に Prometheus 形式で応答する最小限の HTTP サーバー。"""
+
+    def __init__(self, registry: MetricsRegistry, *, host: str, port: int) -> None:
+        self._registry = registry
+        self._host = host
+        self._port = port
+        self._server: asyncio.base_events.Server | None = None
+
+    @property
+    def port(self) -> int:
+        if self._server is not None and self._server.sockets:
+            return self._server.sockets[0].getsockname()[1]
+        return self._port
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self._host, self._port)
+        LOGGER.info("メトリクスを公開しました: http://%s:%s/metrics", self._host, self.port)
+
+    async def close(self) -> None:
+        server, self._server = self._server, None
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body, content_type = "200 OK", self._registry.render().encode(), CONTENT_TYPE
+            else:
+                status, body, content_type = "404 Not Found", b"not found\n", "text/plain"
+            writer.write(
+                (
+                    f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                    f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+                ).encode("latin-1")
+                + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+__all__ = [
+    "CONTENT_TYPE",
+    "Counter",
+    "DEFAULT_LATENCY_BUCKETS",
+    "Gauge",
+    "Histogram",
+    "MetricsRegistry",
+    "MetricsServer",
+    "REGISTRY",
+]
@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Iterable, Sequence, TypeVar
+
+from app.database import DatabaseTimeoutError
+from app.deadlines import remaining_budget
+from app.metrics import REGISTRY
+from app.resilience import TRANSIENT_POSTGRES_CODES
+
+if TYPE_CHECKING:
+    import asyncpg
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_TABLE_PATTERN = re.compile(r"\b(?:from|into|update)\s+([a-z_][a-z0-9_]*)", re.IGNORECASE)
+
+QUERY_SECONDS = REGISTRY.histogram(
+    "postgres_query_duration_seconds",
+    "PostgreSQL クエリの所要時間（プールの取得待ちを含む）",
+    ("operation",),
+)
+
+
+def is_transient_postgres_error(error: BaseException) -> bool:
+    """接続断・接続数超過など、asyncpg の時間を置けば成功し得るエラーかを判定する。"""
+
+    try:
+        import asyncpg
+    except ImportError:  # pragma: no cover - 任意依存
+        return False
+    if isinstance(
+        error,
+        (
+            asyncpg.exceptions.ConnectionDoesNotExistError,
+            asyncpg.exceptions.InterfaceError,
+            asyncpg.exceptions.TooManyConnectionsError,
+            asyncpg.exceptions.CannotConnectNowError,
+            asyncpg.exceptions.PostgresConnectionError,
+        ),
+    ):
+        return True
+    if isinstance(error, asyncpg.exceptions.PostgresError):
+        code = getattr(error, "sqlstate", None) or ""
+        return code in TRANSIENT_POSTGRES_CODES or code.startswith("08")
+    return False
+
+
+class PostgresDatabase:
+    """asyncpg のコネクションプールで PostgreSQL に直接接続する。
+
+    asyncpg はコネクションごとに SQL 文をプリペアドステートメントとしてキャッシュする
+    (`statement_cache_size`)。PgBouncer などトランザクション単位のプーラーを挟む場合は
+    0 にして無効化する。
+
+    1 回のクエリ（プールの取得待ちを含む）は `command_timeout` 秒と、`request_deadline()` で
+    渡された締め切りまでの残り時間の短い方で打ち切り、`DatabaseTimeoutError` を送出する。
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        *,
+        min_size: int = 1,
+        max_size: int = 10,
+        statement_cache_size: int = 100,
+        command_timeout: float = 5.0,
+    ) -> None:
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError("pool size must satisfy 0 <= min_size <= max_size and max_size >= 1")
+        if statement_cache_size < 0:
+            raise ValueError("statement_cache_size must not be negative")
+        if command_timeout < 0:
+            raise ValueError("command_timeout must not be negative")
+        self._dsn = dsn
+        self._min_size = min_size
+        self._max_size = max_size
+        self._statement_cache_size = statement_cache_size
+        self._command_timeout = command_timeout
+        self._pool: asyncpg.Pool | None = None
+        self._connect_lock = asyncio.Lock()
+
+    async def connect(self) -> None:
+        """コネクションプールを作成する。"""
+
+        if self._pool is not None:
+            return
+
+        async with self._connect_lock:
+            if self._pool is not None:
+                return
+
+            try:
+                import asyncpg
+            except ImportError as exc:  # pragma: no cover - 任意依存
+                raise RuntimeError(
+                    "DATABASE_BACKEND=postgres requires asyncpg. "
+                    "install it with `poetry install --extras postgres`."
+                ) from exc
+
+            LOGGER.info("PostgreSQL への接続プールを作成します。")
+            self._pool = await asyncpg.create_pool(
+                self._dsn,
+                min_size=self._min_size,
+                max_size=self._max_size,
+                statement_cache_size=self._statement_cache_size,
+            )
+            LOGGER.info(
+                "PostgreSQL の接続プールを作成しました: min=%s max=%s statement_cache=%s",
+                self._min_size,
+                self._max_size,
+                self._statement_cache_size,
+            )
+
+    async def close(self) -> None:
+        """コネクションプールをクローズする。"""
+
+        if self._pool is None:
+            return
+
+        async with self._connect_lock:
+            pool, self._pool = self._pool, None
+            if pool is not None:
+                await pool.close()
+                LOGGER.info("PostgreSQL の接続プールをクローズしました。")
+
+    async def fetch_all(self, sql: str, *arguments: Any) -> list[asyncpg.Record]:
+        """SQL を実行し、全行を返す。"""
+
+        pool = self._require_pool()
+        return await self._run(
+            sql, lambda timeout: pool.fetch(sql, *arguments, timeout=timeout)
+        )
+
+    async def fetch_one(self, sql: str, *arguments: Any) -> asyncpg.Record | None:
+        """SQL を実行し、先頭の 1 行を返す。"""
+
+        pool = self._require_pool()
+        return await self._run(
+            sql, lambda timeout: pool.fetchrow(sql, *arguments, timeout=timeout)
+        )
+
+    async def execute(self, sql: str, *arguments: Any) -> str:
+        """SQL を実行し、コマンドステータス（`DELETE 3` など）を返す。"""
+
+        pool = self._require_pool()
+        return await self._run(
+            sql, lambda timeout: pool.execute(sql, *arguments, timeout=timeout)
+        )
+
+    async def execute_many(self, sql: str, rows: Iterable[Sequence[Any]]) -> None:
+        """同じ SQL を複数のパラメーターで 1 トランザクション内に実行する。"""
+
+        pool = self._require_pool()
+        await self._run(sql, lambda timeout: pool.executemany(sql, rows, timeout=timeout))
+
+    async def _run(self, sql: str, call: Callable[[float | None], Awaitable[T]]) -> T:
+        budget = remaining_budget()
+        if budget is not None and budget <= 0:
+            raise DatabaseTimeoutError(_table_of(sql), _operation_of(sql), 0.0)
+        timeout = self._command_timeout or None
+        if budget is not None and (timeout is None or budget < timeout):
+            timeout = budget
+
+        started = time.perf_counter()
+        try:
+            # asyncpg の timeout はクエリ本体だけなので、プールの取得待ちも含めて打ち切る
+            async with asyncio.timeout(timeout):
+                return await call(timeout)
+        except TimeoutError as exc:
+            raise DatabaseTimeoutError(
+                _table_of(sql), _operation_of(sql), timeout or 0.0
+            ) from exc
+        finally:
+            self._observe(sql, started)
+
+    def _require_pool(self) -> asyncpg.Pool:
+        if self._pool is None:
+            raise RuntimeError("PostgresDatabase is not initialized. call connect() first.")
+        return self._pool
+
+    @staticmethod
+    def _observe(sql: str, started: float) -> None:
+        QUERY_SECONDS.observe(time.perf_counter() - started, (_operation_of(sql),))
+
+
+def _operation_of(sql: str) -> str:
+    return sql.lstrip().split(None, 1)[0].lower()
+
+
+def _table_of(sql: str) -> str:
+    match = _TABLE_PATTERN.search(sql)
+    return match.group(1).lower() if match else "unknown"
+
+
+__all__ = ["PostgresDatabase", "is_transient_postgres_error"]
@@ -1,25 +1,62 @@
 from .channel_rules import (
+    CachedChannelNicknameRuleStore,
     ChannelNicknameRule,
     ChannelNicknameRuleRepository,
     ChannelNicknameRuleStore,
+    RuleCacheStats,
+)
+from .last_seen import LastSeenFlushStats, LastSeenFlusher
+from .outbox import (
+    OutboxStats,
+    OutboxTemporaryVoiceCategoryRepository,
+    OutboxTemporaryVoiceChannelRepository,
+    WriteOutbox,
+)
+from .postgres import (
+    PostgresChannelNicknameRuleRepository,
+    PostgresTemporaryVoiceCategoryRepository,
+    PostgresTemporaryVoiceChannelRepository,
+)
+from .sqlite import (
+    SQLiteChannelNicknameRuleRepository,
+    SQLiteTemporaryVoiceCategoryRepository,
+    SQLiteTemporaryVoiceChannelRepository,
 )
 from .temporary_voice import (
+    CachedTemporaryVoiceChannelStore,
     TemporaryVoiceCategory,
     TemporaryVoiceCategoryRepository,
     TemporaryVoiceCategoryStore,
     TemporaryVoiceChannel,
+    TemporaryVoiceChannelObserver,
     TemporaryVoiceChannelRepository,
     TemporaryVoiceChannelStore,
 )
 
 __all__ = [
+    "CachedChannelNicknameRuleStore",
+    "CachedTemporaryVoiceChannelStore",
     "ChannelNicknameRule",
     "ChannelNicknameRuleRepository",
     "ChannelNicknameRuleStore",
+    "LastSeenFlushStats",
+    "LastSeenFlusher",
+    "OutboxStats",
+    "OutboxTemporaryVoiceCategoryRepository",
+    "OutboxTemporaryVoiceChannelRepository",
+    "PostgresChannelNicknameRuleRepository",
+    "PostgresTemporaryVoiceCategoryRepository",
+    "PostgresTemporaryVoiceChannelRepository",
+    "RuleCacheStats",
+    "SQLiteChannelNicknameRuleRepository",
+    "SQLiteTemporaryVoiceCategoryRepository",
+    "SQLiteTemporaryVoiceChannelRepository",
     "TemporaryVoiceCategory",
     "TemporaryVoiceCategoryRepository",
     "TemporaryVoiceCategoryStore",
     "TemporaryVoiceChannel",
+    "TemporaryVoiceChannelObserver",
     "TemporaryVoiceChannelRepository",
     "TemporaryVoiceChannelStore",
+    "WriteOutbox",
 ]
@@ -2,13 +2,14 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Protocol
+from typing import Protocol, Sequence
 import logging
 
 from app.database import Database
 from app.repositories._helpers import ensure_utc_timestamp
 
 LOGGER = logging.getLogger(__name__)
+RULE_COLUMNS = "guild_id, channel_id, role_id, updated_by, updated_at"
 
 
 @dataclass(frozen=True, slots=True)
@@ -61,7 +62,7 @@ class ChannelNicknameRuleRepository:
     ) -> ChannelNicknameRule | None:
         row = await self._database.execute_one(
             self._database.table("channel_nickname_rules")
-            .select("guild_id, channel_id, role_id, updated_by, updated_at")
+            .select(RULE_COLUMNS)
             .eq("guild_id", guild_id)
             .eq("channel_id", channel_id)
         )
@@ -70,6 +71,13 @@ class ChannelNicknameRuleRepository:
         LOGGER.debug("Fetched channel nickname rule: %s", row)
         return self._to_entity(row)
 
+    async def list_rules(self) -> Sequence[ChannelNicknameRule]:
+        rows = await self._database.execute(
+            self._database.table("channel_nickname_rules").select(RULE_COLUMNS)
+        )
+        LOGGER.debug("Listed channel nickname rules: %d records", len(rows))
+        return [self._to_entity(row) for row in rows]
+
     @staticmethod
     def _to_entity(row) -> ChannelNicknameRule:
         return ChannelNicknameRule(
@@ -81,8 +89,97 @@ class ChannelNicknameRuleRepository:
         )
 
 
+@dataclass(slots=True)
+class RuleCacheStats:
+    """ルールキャッシュのヒット/ミス件数。"""
+
+    hits: int = 0
+    misses: int = 0
+
+
+class CachedChannelNicknameRuleStore:
+    """`channel_nickname_rules` を起動時に全件読み込む write-through キャッシュ。
+
+    読み込み後は未登録のチャンネルを監視対象外と確定し、投稿ごとの PostgREST 往復を
+    発生させない（読み込み前に問い合わせたチャンネルだけ `None` の負エントリとして保持する）。ギルドごとの監視チャンネル集合は
+    `is_watched` で await せずに参照できる。
+    """
+
+    def __init__(self, repository: ChannelNicknameRuleRepository) -> None:
+        self._repository = repository
+        self._rules: dict[tuple[int, int], ChannelNicknameRule | None] = {}
+        self._watched: dict[int, frozenset[int]] = {}
+        self._loaded = False
+        self.stats = RuleCacheStats()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    async def load(self) -> None:
+        """テーブル全件を読み込み、キャッシュを置き換える。"""
+
+        rules = await self._repository.list_rules()
+        self._rules = {(rule.guild_id, rule.channel_id): rule for rule in rules}
+        watched: dict[int, set[int]] = {}
+        for rule in rules:
+            watched.setdefault(rule.guild_id, set()).add(rule.channel_id)
+        self._watched = {
+            guild_id: frozenset(channel_ids) for guild_id, channel_ids in watched.items()
+        }
+        self._loaded = True
+        LOGGER.info("ニックネーム同期ルールを読み込みました: %d 件", len(rules))
+
+    async def upsert_rule(
+        self, guild_id: int, channel_id: int, role_id: int, updated_by: int
+    ) -> ChannelNicknameRule:
+        rule = await self._repository.upsert_rule(
+            guild_id=guild_id,
+            channel_id=channel_id,
+            role_id=role_id,
+            updated_by=updated_by,
+        )
+        self._rules[(rule.guild_id, rule.channel_id)] = rule
+        self._watched[rule.guild_id] = self._watched.get(
+            rule.guild_id, frozenset()
+        ) | {rule.channel_id}
+        return rule
+
+    def is_watched(self, guild_id: int, channel_id: int) -> bool:
+        """監視対象の可能性があるチャンネルかを同期的に判定する。
+
+        未ロード時は判定できないため True を返し、通常の経路に委ねる。
+        """
+
+        if not self._loaded:
+            return True
+        channel_ids = self._watched.get(guild_id)
+        return channel_ids is not None and channel_id in channel_ids
+
+    async def get_rule_for_channel(
+        self, guild_id: int, channel_id: int
+    ) -> ChannelNicknameRule | None:
+        key = (guild_id, channel_id)
+        if key in self._rules:
+            self.stats.hits += 1
+            return self._rules[key]
+
+        if self._loaded:
+            # 全件読み込み済みのため、未登録チャンネルは監視対象外と確定できる
+            # 任意のチャンネル ID で辞書が増え続けないよう、負エントリは保存しない
+            self.stats.hits += 1
+            return None
+
+        self.stats.misses += 1
+        rule = await self._repository.get_rule_for_channel(guild_id, channel_id)
+        self._rules[key] = rule
+        return rule
+
+
 __all__ = [
+    "CachedChannelNicknameRuleStore",
     "ChannelNicknameRule",
     "ChannelNicknameRuleRepository",
     "ChannelNicknameRuleStore",
+    "RuleCacheStats",
 ]
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, replace
+from typing import Protocol, Sequence
+
+from postgrest.exceptions import APIError
+
+from app.repositories.temporary_voice import TemporaryVoiceChannel
+from app.resilience import is_transient_error
+
+LOGGER = logging.getLogger(__name__)
+
+
+class LastSeenWriter(Protocol):
+    async def update_last_seen(self, records: Sequence[TemporaryVoiceChannel]) -> None: ...
+
+    async def touch_last_seen(self, guild_id: int, owner_user_id: int) -> None: ...
+
+
+@dataclass(slots=True)
+class LastSeenFlushStats:
+    """`last_seen_at` の一括書き込み回数・件数・所要時間。"""
+
+    touches: int = 0
+    flushes: int = 0
+    failed_flushes: int = 0
+    fallback_rows: int = 0
+    flushed_rows: int = 0
+    last_batch_size: int = 0
+    max_batch_size: int = 0
+    last_flush_seconds: float = 0.0
+    max_flush_seconds: float = 0.0
+
+
+class LastSeenFlusher:
+    """`touch_last_seen` を (guild_id, owner_user_id) ごとの最新値にまとめて一括更新する。
+
+    `interval` 秒ごと、および `stop()` 時に未送信分を `max_batch_size` 件ずつ送る。
+    一括更新は既存の行だけを UPDATE し、削除済みの行は作り直さない。書き込み側は
+    `exclusive()` のロック内で `drop` / `refresh` とリクエストを行う。一括更新がロックを
+    持つのは送信待ちからバッチを取り出す間だけで、送信中は書き込み側を待たせない。
+    一括更新が再送しても成功しないエラー（スキーマ未適用で RPC が見つからないなど）に
+    なった場合は、一括更新をやめて送信待ちを 1 件ずつ `touch_last_seen` で書き込み、
+    以降は `batching` が False になる（書き込み側は即時に更新する）。
+    """
+
+    def __init__(
+        self,
+        writer: LastSeenWriter,
+        *,
+        interval: float = 30.0,
+        max_batch_size: int = 500,
+    ) -> None:
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self._writer = writer
+        self._interval = interval
+        self._max_batch_size = max_batch_size
+        self._pending: dict[tuple[int, int], TemporaryVoiceChannel] = {}
+        self._lock = asyncio.Lock()
+        # 一括更新どうしを直列にし、同じキーの古い値が後から届かないようにする
+        self._flush_lock = asyncio.Lock()
+        self._task: asyncio.Task[None] | None = None
+        self._batching = True
+        self.stats = LastSeenFlushStats()
+
+    @property
+    def batching(self) -> bool:
+        return self._batching
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def exclusive(self) -> asyncio.Lock:
+        """一括更新と排他にするためのロックを返す。"""
+
+        return self._lock
+
+    def touch(self, record: TemporaryVoiceChannel) -> None:
+        """`last_seen_at` を更新済みのレコードを送信待ちに積む。"""
+
+        self._pending[(record.guild_id, record.owner_user_id)] = record
+        self.stats.touches += 1
+
+    def refresh(self, record: TemporaryVoiceChannel) -> None:
+        """送信待ちのレコードを最新の内容に差し替える（`last_seen_at` は新しい方を残す）。"""
+
+        key = (record.guild_id, record.owner_user_id)
+        pending = self._pending.get(key)
+        if pending is None:
+            return
+        self._pending[key] = replace(
+            record, last_seen_at=max(pending.last_seen_at, record.last_seen_at)
+        )
+
+    def drop(self, guild_id: int, owner_user_id: int) -> None:
+        self._pending.pop((guild_id, owner_user_id), None)
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run(), name="last-seen-flusher")
+        LOGGER.info(
+            "last_seen_at の一括書き込みを開始しました: interval=%ss max_batch_size=%s",
+            self._interval,
+            self._max_batch_size,
+        )
+
+    async def stop(self) -> None:
+        """定期実行を止め、未送信分を書き込む。"""
+
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        await self.flush()
+
+    async def flush(self) -> None:
+        """呼び出し時点の送信待ちをすべて書き込む。"""
+
+        async with self._flush_lock:
+            keys = list(self._pending)
+            for offset in range(0, len(keys), self._max_batch_size):
+                async with self._lock:
+                    batch = [
+                        self._pending.pop(key)
+                        for key in keys[offset : offset + self._max_batch_size]
+                        if key in self._pending
+                    ]
+                if not batch:
+                    continue
+                if not self._batching:
+                    await self._write_each(batch)
+                    continue
+                started = time.perf_counter()
+                try:
+                    await self._writer.update_last_seen(batch)
+                except Exception as exc:
+                    self.stats.failed_flushes += 1
+                    if isinstance(exc, APIError) and not is_transient_error(exc):
+                        self._batching = False
+                        LOGGER.error(
+                            "last_seen_at の一括書き込みが使えないため 1 件ずつの更新に切り替えます。"
+                            "supabase/schema.sql を再適用してください: error=%r",
+                            exc,
+                        )
+                        await self._write_each(batch)
+                        continue
+                    LOGGER.exception(
+                        "last_seen_at の一括書き込みに失敗しました: batch=%s", len(batch)
+                    )
+                    for record in batch:
+                        key = (record.guild_id, record.owner_user_id)
+                        self._pending.setdefault(key, record)
+                    return
+                elapsed = time.perf_counter() - started
+                self.stats.flushes += 1
+                self.stats.flushed_rows += len(batch)
+                self.stats.last_batch_size = len(batch)
+                self.stats.max_batch_size = max(self.stats.max_batch_size, len(batch))
+                self.stats.last_flush_seconds = elapsed
+                self.stats.max_flush_seconds = max(self.stats.max_flush_seconds, elapsed)
+                LOGGER.debug(
+                    "last_seen_at を一括書き込みしました: rows=%s elapsed=%.3fs",
+                    len(batch),
+                    elapsed,
+                )
+
+    async def _write_each(self, records: Sequence[TemporaryVoiceChannel]) -> None:
+        for record in records:
+            try:
+                await self._writer.touch_last_seen(record.guild_id, record.owner_user_id)
+            except Exception:
+                LOGGER.exception(
+                    "last_seen_at の書き込みに失敗しました: guild=%s owner=%s",
+                    record.guild_id,
+                    record.owner_user_id,
+                )
+                continue
+            self.stats.fallback_rows += 1
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._interval)
+            await self.flush()
+
+
+__all__ = ["LastSeenFlushStats", "LastSeenFlusher", "LastSeenWriter"]
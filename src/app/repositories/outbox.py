@@ -0,0 +1,551 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Mapping, Sequence
+
+import httpx
+
+from app.database import DatabaseTimeoutError, DatabaseUnavailableError
+from app.postgres_database import is_transient_postgres_error
+from app.resilience import RetryPolicy, is_transient_error
+from app.repositories.temporary_voice import (
+    DEFAULT_PAGE_SIZE,
+    TemporaryVoiceCategory,
+    TemporaryVoiceCategoryRepository,
+    TemporaryVoiceChannel,
+    TemporaryVoiceChannelRepository,
+)
+from app.sqlite_database import SQLiteDatabase
+
+LOGGER = logging.getLogger(__name__)
+
+OUTBOX_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    seq INTEGER PRIMARY KEY,
+    key TEXT NOT NULL,
+    operation TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+DELETE_CHANNEL_OPERATION = "temporary_voice_channels.delete"
+UPSERT_CATEGORY_OPERATION = "temporary_vc_categories.upsert"
+
+OutboxHandler = Callable[[Sequence[Mapping[str, Any]]], Awaitable[None]]
+
+
+@dataclass(frozen=True, slots=True)
+class OutboxEntry:
+    seq: int
+    key: str
+    operation: str
+    payload: Mapping[str, Any]
+
+
+@dataclass(slots=True)
+class OutboxStats:
+    """アウトボックスへの追記・送信・再送の回数。"""
+
+    appended: int = 0
+    commits: int = 0
+    last_commit_size: int = 0
+    max_commit_size: int = 0
+    replayed: int = 0
+    sent: int = 0
+    send_batches: int = 0
+    failed_sends: int = 0
+    dropped: int = 0
+
+
+def is_retryable_outbox_error(error: BaseException) -> bool:
+    """時間を置いて再送すべきエラーかを判定する。それ以外は再送しても成功しない。"""
+
+    if isinstance(
+        error,
+        (
+            DatabaseTimeoutError,
+            DatabaseUnavailableError,
+            TimeoutError,
+            OSError,
+            httpx.TransportError,
+            sqlite3.OperationalError,
+        ),
+    ):
+        return True
+    return is_transient_error(error) or is_transient_postgres_error(error)
+
+
+class WriteOutbox:
+    """リモート DB への書き込みを SQLite のジャーナルへ追記してから非同期に送る。
+
+    `append()` は fsync 付きでジャーナルにコミットした時点で戻る。同時に届いた追記は
+    1 回のコミットにまとめる。送信はバックグラウンドのタスクが行い、同じキーの書き込みは
+    追記順に 1 件ずつ、`batchable` な操作は異なるキーの先頭をまとめて 1 回で送る。
+    送信に成功した行だけをジャーナルから消すため、再起動後は未確認の行を再送する。
+    ハンドラーは冪等である必要があり、同じキーへ直接書き込む側は先に `flush_key()` /
+    `flush_keys()` を呼ぶ。
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        retry_policy: RetryPolicy | None = None,
+        max_batch_size: int = 500,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self._journal = SQLiteDatabase(path, schema=OUTBOX_SCHEMA, synchronous="FULL")
+        self._retry_policy = retry_policy or RetryPolicy(base_delay=1.0, max_delay=60.0)
+        self._max_batch_size = max_batch_size
+        self._clock = clock
+        self._handlers: dict[str, tuple[OutboxHandler, bool]] = {}
+        self._queues: dict[str, deque[OutboxEntry]] = {}
+        self._attempts: dict[str, int] = {}
+        self._retry_at: dict[str, float] = {}
+        # コミットが終わるまでの追記。コミット中の分も含む
+        self._appends: list[tuple[OutboxEntry, asyncio.Future[None]]] = []
+        self._next_seq = 1
+        self._committer: asyncio.Task[None] | None = None
+        self._send_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self.stats = OutboxStats()
+
+    @property
+    def path(self) -> str:
+        return self._journal.path
+
+    @property
+    def pending_count(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def has_pending(self, key: str) -> bool:
+        return key in self._queues
+
+    def register(self, operation: str, handler: OutboxHandler, *, batchable: bool = False) -> None:
+        """`operation` の送信処理を登録する。ハンドラーはペイロードの列を受け取る。
+
+        `batchable` でない操作には常に 1 件ずつ渡す。
+        """
+
+        self._handlers[operation] = (handler, batchable)
+
+    async def open(self) -> None:
+        """ジャーナルを開き、前回送信できなかった書き込みを送信待ちに戻す。"""
+
+        await self._journal.connect()
+        rows = await self._journal.fetch_all(
+            "SELECT seq, key, operation, payload FROM outbox ORDER BY seq"
+        )
+        for row in rows:
+            entry = OutboxEntry(
+                seq=int(row["seq"]),
+                key=row["key"],
+                operation=row["operation"],
+                payload=json.loads(row["payload"]),
+            )
+            self._queues.setdefault(entry.key, deque()).append(entry)
+            self._next_seq = entry.seq + 1
+        self.stats.replayed = len(rows)
+        if rows:
+            LOGGER.info("未送信の書き込みをジャーナルから読み込みました: %d 件", len(rows))
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run(), name="write-outbox")
+        LOGGER.info("書き込みアウトボックスの送信を開始しました: journal=%s", self.path)
+
+    async def close(self) -> None:
+        """送信を止め、送れる分を送ってからジャーナルを閉じる。残りは次回起動時に再送する。"""
+
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        if self._committer is not None:
+            await asyncio.gather(self._committer, return_exceptions=True)
+        try:
+            await self.flush()
+        except Exception:
+            LOGGER.warning(
+                "未送信の書き込みは次回起動時に再送します: %d 件",
+                self.pending_count,
+                exc_info=True,
+            )
+        await self._journal.close()
+
+    async def append(self, key: str, operation: str, payload: Mapping[str, Any]) -> None:
+        """書き込みを 1 件ジャーナルに追記し、コミットされるまで待つ。"""
+
+        await self.append_many([(key, operation, payload)])
+
+    async def append_many(
+        self, writes: Sequence[tuple[str, str, Mapping[str, Any]]]
+    ) -> None:
+        """複数の書き込みを 1 回のコミットで追記する。"""
+
+        if not writes:
+            return
+        for _, operation, _ in writes:
+            if operation not in self._handlers:
+                raise ValueError(f"outbox operation is not registered: {operation}")
+        loop = asyncio.get_running_loop()
+        futures: list[asyncio.Future[None]] = []
+        for key, operation, payload in writes:
+            entry = OutboxEntry(self._next_seq, key, operation, dict(payload))
+            self._next_seq += 1
+            future: asyncio.Future[None] = loop.create_future()
+            self._appends.append((entry, future))
+            futures.append(future)
+        if self._committer is None or self._committer.done():
+            self._committer = asyncio.create_task(self._commit_appends())
+        # 呼び出し側がキャンセルされてもコミット自体は完了させる
+        await asyncio.shield(asyncio.gather(*futures))
+
+    async def flush_key(self, key: str) -> None:
+        """`key` の送信待ちをすべて送る。一時的なエラーはそのまま送出する。"""
+
+        await self.flush_keys([key])
+
+    async def flush_keys(self, keys: Iterable[str]) -> None:
+        """`keys` の送信待ちをすべて送る。各キーの先頭をまとめて送るため、件数分の往復にならない。"""
+
+        wanted = set(keys)
+        await self._wait_for_commit(
+            [future for entry, future in self._appends if entry.key in wanted]
+        )
+        if wanted.isdisjoint(self._queues):
+            return
+        async with self._send_lock:
+            while pending := [key for key in wanted if key in self._queues]:
+                await self._send_heads(pending, raise_retryable=True)
+
+    async def flush(self) -> None:
+        """呼び出し時点の送信待ちをすべて送る。一時的なエラーはそのまま送出する。"""
+
+        await self._wait_for_commit([future for _, future in self._appends])
+        if not self._queues:
+            return
+        async with self._send_lock:
+            target = self._next_seq
+            while keys := [key for key, queue in self._queues.items() if queue[0].seq < target]:
+                await self._send_heads(keys, raise_retryable=True)
+
+    async def _commit_appends(self) -> None:
+        # 先行のコミット中に届いた追記は次のコミットにまとめる
+        while self._appends:
+            batch = list(self._appends)
+            created_at = time.time()
+            try:
+                await self._journal.execute_many(
+                    "INSERT INTO outbox (seq, key, operation, payload, created_at)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (
+                            entry.seq,
+                            entry.key,
+                            entry.operation,
+                            json.dumps(entry.payload),
+                            created_at,
+                        )
+                        for entry, _ in batch
+                    ],
+                )
+            except Exception as exc:
+                LOGGER.exception("アウトボックスへの追記に失敗しました: %d 件", len(batch))
+                del self._appends[: len(batch)]
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            del self._appends[: len(batch)]
+            self.stats.appended += len(batch)
+            self.stats.commits += 1
+            self.stats.last_commit_size = len(batch)
+            self.stats.max_commit_size = max(self.stats.max_commit_size, len(batch))
+            for entry, future in batch:
+                self._queues.setdefault(entry.key, deque()).append(entry)
+                if not future.done():
+                    future.set_result(None)
+            self._wake.set()
+
+    @staticmethod
+    async def _wait_for_commit(futures: Sequence[asyncio.Future[None]]) -> None:
+        # 同じキーへの書き込みが送信より先に届かないよう、コミット中の追記を待つ
+        if futures:
+            await asyncio.wait(futures)
+
+    async def _run(self) -> None:
+        while True:
+            now = self._clock()
+            ready = [key for key in self._queues if self._retry_at.get(key, 0.0) <= now]
+            if not ready:
+                await self._wait_for_work(now)
+                continue
+            try:
+                async with self._send_lock:
+                    await self._send_heads(ready, raise_retryable=False)
+            except Exception:
+                LOGGER.exception("アウトボックスの送信処理で予期しないエラーが発生しました。")
+                await asyncio.sleep(self._retry_policy.max_delay)
+
+    async def _wait_for_work(self, now: float) -> None:
+        self._wake.clear()
+        retry_at = [self._retry_at[key] for key in self._queues if key in self._retry_at]
+        timeout = max(0.0, min(retry_at) - now) if retry_at else None
+        try:
+            async with asyncio.timeout(timeout):
+                await self._wake.wait()
+        except TimeoutError:
+            pass
+
+    async def _send_heads(self, keys: Sequence[str], *, raise_retryable: bool) -> None:
+        """各キーの先頭の書き込みを操作ごとにまとめて送る。`_send_lock` の中で呼ぶ。"""
+
+        groups: dict[str, list[OutboxEntry]] = {}
+        for key in keys:
+            queue = self._queues.get(key)
+            if queue:
+                groups.setdefault(queue[0].operation, []).append(queue[0])
+        for operation, entries in groups.items():
+            registration = self._handlers.get(operation)
+            if registration is None:
+                LOGGER.error("未登録の操作のため書き込みを破棄します: operation=%s", operation)
+                self.stats.dropped += len(entries)
+                await self._acknowledge(entries)
+                continue
+            handler, batchable = registration
+            size = self._max_batch_size if batchable else 1
+            for offset in range(0, len(entries), size):
+                await self._deliver(
+                    handler, entries[offset : offset + size], raise_retryable=raise_retryable
+                )
+
+    async def _deliver(
+        self, handler: OutboxHandler, batch: Sequence[OutboxEntry], *, raise_retryable: bool
+    ) -> None:
+        try:
+            await handler([entry.payload for entry in batch])
+        except Exception as exc:
+            if is_retryable_outbox_error(exc):
+                self.stats.failed_sends += 1
+                now = self._clock()
+                for entry in batch:
+                    attempt = self._attempts.get(entry.key, 0) + 1
+                    self._attempts[entry.key] = attempt
+                    self._retry_at[entry.key] = now + self._retry_policy.backoff(attempt)
+                LOGGER.warning(
+                    "アウトボックスの送信に失敗したため後で再送します: operation=%s batch=%d error=%r",
+                    batch[0].operation,
+                    len(batch),
+                    exc,
+                )
+                if raise_retryable:
+                    raise
+                return
+            self.stats.dropped += len(batch)
+            LOGGER.exception(
+                "再送しても成功しない書き込みを破棄します: operation=%s keys=%s",
+                batch[0].operation,
+                [entry.key for entry in batch],
+            )
+        else:
+            self.stats.sent += len(batch)
+            self.stats.send_batches += 1
+        await self._acknowledge(batch)
+
+    async def _acknowledge(self, batch: Sequence[OutboxEntry]) -> None:
+        # ジャーナルから消えるまでは送信待ちに残し、後続の直接書き込みより先に再送させる
+        await self._journal.execute_many(
+            "DELETE FROM outbox WHERE seq = ?", [(entry.seq,) for entry in batch]
+        )
+        for entry in batch:
+            queue = self._queues.get(entry.key)
+            if queue and queue[0].seq == entry.seq:
+                queue.popleft()
+            if not queue:
+                self._queues.pop(entry.key, None)
+                self._attempts.pop(entry.key, None)
+                self._retry_at.pop(entry.key, None)
+
+
+class OutboxTemporaryVoiceCategoryRepository:
+    """`upsert_category` をアウトボックスへの追記で完了させるリポジトリ。
+
+    読み取りと削除は同じギルドの送信待ちを送ってからリポジトリへ委譲する。
+    """
+
+    def __init__(self, repository: TemporaryVoiceCategoryRepository, outbox: WriteOutbox) -> None:
+        self._repository = repository
+        self._outbox = outbox
+        outbox.register(UPSERT_CATEGORY_OPERATION, self._send_upserts)
+
+    async def upsert_category(
+        self, guild_id: int, category_id: int, updated_by: int
+    ) -> TemporaryVoiceCategory:
+        await self._outbox.append(
+            _category_key(guild_id),
+            UPSERT_CATEGORY_OPERATION,
+            {"guild_id": guild_id, "category_id": category_id, "updated_by": updated_by},
+        )
+        return TemporaryVoiceCategory(
+            guild_id=guild_id,
+            category_id=category_id,
+            updated_by=updated_by,
+            updated_at=datetime.now(timezone.utc),
+        )
+
+    async def get_category(self, guild_id: int) -> TemporaryVoiceCategory | None:
+        await self._outbox.flush_key(_category_key(guild_id))
+        return await self._repository.get_category(guild_id)
+
+    async def delete_category(self, guild_id: int) -> None:
+        await self._outbox.flush_key(_category_key(guild_id))
+        await self._repository.delete_category(guild_id)
+
+    async def _send_upserts(self, payloads: Sequence[Mapping[str, Any]]) -> None:
+        for payload in payloads:
+            await self._repository.upsert_category(
+                payload["guild_id"], payload["category_id"], payload["updated_by"]
+            )
+
+
+class OutboxTemporaryVoiceChannelRepository:
+    """`delete_record` / `delete_records` をアウトボックスへの追記で完了させるリポジトリ。
+
+    削除は異なるキーの分をまとめて `delete_records` で送る。同じキーへの書き込みは
+    該当する送信待ちを送ってからリポジトリへ委譲する。送信待ちは削除だけなので、
+    読み取りは送信を待たずに削除待ちのキーを結果から除き、削除系は順序を問わずそのまま送る。
+    """
+
+    def __init__(self, repository: TemporaryVoiceChannelRepository, outbox: WriteOutbox) -> None:
+        self._repository = repository
+        self._outbox = outbox
+        outbox.register(DELETE_CHANNEL_OPERATION, self._send_deletes, batchable=True)
+
+    async def create_record(
+        self, guild_id: int, owner_user_id: int, category_id: int
+    ) -> TemporaryVoiceChannel:
+        await self._outbox.flush_key(_channel_key(guild_id, owner_user_id))
+        return await self._repository.create_record(guild_id, owner_user_id, category_id)
+
+    async def update_channel_id(
+        self, guild_id: int, owner_user_id: int, channel_id: int
+    ) -> TemporaryVoiceChannel:
+        await self._outbox.flush_key(_channel_key(guild_id, owner_user_id))
+        return await self._repository.update_channel_id(guild_id, owner_user_id, channel_id)
+
+    async def get_by_owner(
+        self, guild_id: int, owner_user_id: int
+    ) -> TemporaryVoiceChannel | None:
+        await self._outbox.flush_key(_channel_key(guild_id, owner_user_id))
+        return await self._repository.get_by_owner(guild_id, owner_user_id)
+
+    async def get_by_channel(
+        self, guild_id: int, channel_id: int
+    ) -> TemporaryVoiceChannel | None:
+        record = await self._repository.get_by_channel(guild_id, channel_id)
+        if record is None or self._deleting(record):
+            return None
+        return record
+
+    async def delete_record(self, guild_id: int, owner_user_id: int) -> None:
+        await self._outbox.append(
+            _channel_key(guild_id, owner_user_id),
+            DELETE_CHANNEL_OPERATION,
+            {"guild_id": guild_id, "owner_user_id": owner_user_id},
+        )
+
+    async def delete_by_channel(self, guild_id: int, channel_id: int) -> None:
+        await self._repository.delete_by_channel(guild_id, channel_id)
+
+    async def delete_records(self, keys: Sequence[tuple[int, int]]) -> None:
+        await self._outbox.append_many(
+            [
+                (
+                    _channel_key(guild_id, owner_user_id),
+                    DELETE_CHANNEL_OPERATION,
+                    {"guild_id": guild_id, "owner_user_id": owner_user_id},
+                )
+                for guild_id, owner_user_id in keys
+            ]
+        )
+
+    async def list_by_guild(self, guild_id: int) -> Sequence[TemporaryVoiceChannel]:
+        records = await self._repository.list_by_guild(guild_id)
+        return [record for record in records if not self._deleting(record)]
+
+    async def list_all(self) -> Sequence[TemporaryVoiceChannel]:
+        records = await self._repository.list_all()
+        return [record for record in records if not self._deleting(record)]
+
+    async def iter_all(
+        self, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> AsyncIterator[TemporaryVoiceChannel]:
+        async for record in self._repository.iter_all(page_size):
+            if not self._deleting(record):
+                yield record
+
+    async def list_page(
+        self, after: tuple[int, int] | None, limit: int
+    ) -> Sequence[TemporaryVoiceChannel]:
+        # 削除待ちを除いた分は続きから補い、末尾以外のページは `limit` 件にそろえる
+        page: list[TemporaryVoiceChannel] = []
+        while len(page) < limit:
+            wanted = limit - len(page)
+            records = await self._repository.list_page(after, wanted)
+            page.extend(record for record in records if not self._deleting(record))
+            if len(records) < wanted:
+                break
+            after = (records[-1].guild_id, records[-1].owner_user_id)
+        return page
+
+    async def purge_guild(self, guild_id: int) -> None:
+        await self._repository.purge_guild(guild_id)
+
+    async def touch_last_seen(self, guild_id: int, owner_user_id: int) -> None:
+        await self._outbox.flush_key(_channel_key(guild_id, owner_user_id))
+        await self._repository.touch_last_seen(guild_id, owner_user_id)
+
+    async def update_last_seen(self, records: Sequence[TemporaryVoiceChannel]) -> None:
+        await self._outbox.flush_keys(
+            _channel_key(record.guild_id, record.owner_user_id) for record in records
+        )
+        await self._repository.update_last_seen(records)
+
+    def _deleting(self, record: TemporaryVoiceChannel) -> bool:
+        return self._outbox.has_pending(_channel_key(record.guild_id, record.owner_user_id))
+
+    async def _send_deletes(self, payloads: Sequence[Mapping[str, Any]]) -> None:
+        await self._repository.delete_records(
+            [(payload["guild_id"], payload["owner_user_id"]) for payload in payloads]
+        )
+
+
+def _category_key(guild_id: int) -> str:
+    return f"temporary_vc_categories:{guild_id}"
+
+
+def _channel_key(guild_id: int, owner_user_id: int) -> str:
+    return f"temporary_voice_channels:{guild_id}:{owner_user_id}"
+
+
+__all__ = [
+    "OutboxEntry",
+    "OutboxStats",
+    "OutboxTemporaryVoiceCategoryRepository",
+    "OutboxTemporaryVoiceChannelRepository",
+    "WriteOutbox",
+    "is_retryable_outbox_error",
+]
@@ -0,0 +1,306 @@
+from __future__ import annotations
+
+import logging
+from typing import AsyncIterator, Sequence
+
+from app.postgres_database import PostgresDatabase
+from app.repositories.channel_rules import ChannelNicknameRule, ChannelNicknameRuleRepository
+from app.repositories.temporary_voice import (
+    CHANNEL_COLUMNS,
+    DEFAULT_PAGE_SIZE,
+    TemporaryVoiceCategory,
+    TemporaryVoiceCategoryRepository,
+    TemporaryVoiceChannel,
+    TemporaryVoiceChannelRepository,
+)
+
+LOGGER = logging.getLogger(__name__)
+RULE_COLUMNS = "guild_id, channel_id, role_id, updated_by, updated_at"
+CATEGORY_COLUMNS = "guild_id, category_id, updated_by, updated_at"
+
+
+class PostgresChannelNicknameRuleRepository:
+    """チャンネル監視設定を asyncpg で PostgreSQL に保存するリポジトリ。"""
+
+    def __init__(self, database: PostgresDatabase) -> None:
+        self._database = database
+
+    async def upsert_rule(
+        self, guild_id: int, channel_id: int, role_id: int, updated_by: int
+    ) -> ChannelNicknameRule:
+        row = await self._database.fetch_one(
+            "INSERT INTO channel_nickname_rules"
+            " (guild_id, channel_id, role_id, updated_by, updated_at)"
+            " VALUES ($1, $2, $3, $4, now())"
+            " ON CONFLICT (guild_id, channel_id) DO UPDATE SET"
+            " role_id = excluded.role_id,"
+            " updated_by = excluded.updated_by,"
+            " updated_at = excluded.updated_at"
+            f" RETURNING {RULE_COLUMNS}",
+            guild_id,
+            channel_id,
+            role_id,
+            updated_by,
+        )
+        assert row is not None  # RETURNING があるため None にならない
+        LOGGER.debug("Upserted channel nickname rule: %s", dict(row))
+        return ChannelNicknameRuleRepository._to_entity(row)
+
+    async def get_rule_for_channel(
+        self, guild_id: int, channel_id: int
+    ) -> ChannelNicknameRule | None:
+        row = await self._database.fetch_one(
+            f"SELECT {RULE_COLUMNS} FROM channel_nickname_rules"
+            " WHERE guild_id = $1 AND channel_id = $2",
+            guild_id,
+            channel_id,
+        )
+        if row is None:
+            return None
+        return ChannelNicknameRuleRepository._to_entity(row)
+
+    async def list_rules(self) -> Sequence[ChannelNicknameRule]:
+        rows = await self._database.fetch_all(
+            f"SELECT {RULE_COLUMNS} FROM channel_nickname_rules"
+        )
+        LOGGER.debug("Listed channel nickname rules: %d records", len(rows))
+        return [ChannelNicknameRuleRepository._to_entity(row) for row in rows]
+
+
+class PostgresTemporaryVoiceCategoryRepository:
+    """一時VCカテゴリ設定を asyncpg で PostgreSQL に保存するリポジトリ。"""
+
+    def __init__(self, database: PostgresDatabase) -> None:
+        self._database = database
+
+    async def upsert_category(
+        self, guild_id: int, category_id: int, updated_by: int
+    ) -> TemporaryVoiceCategory:
+        row = await self._database.fetch_one(
+            "INSERT INTO temporary_vc_categories (guild_id, category_id, updated_by, updated_at)"
+            " VALUES ($1, $2, $3, now())"
+            " ON CONFLICT (guild_id) DO UPDATE SET"
+            " category_id = excluded.category_id,"
+            " updated_by = excluded.updated_by,"
+            " updated_at = excluded.updated_at"
+            f" RETURNING {CATEGORY_COLUMNS}",
+            guild_id,
+            category_id,
+            updated_by,
+        )
+        assert row is not None
+        LOGGER.debug("Upserted temporary voice category: %s", dict(row))
+        return TemporaryVoiceCategoryRepository._category_from_row(row)
+
+    async def get_category(self, guild_id: int) -> TemporaryVoiceCategory | None:
+        row = await self._database.fetch_one(
+            f"SELECT {CATEGORY_COLUMNS} FROM temporary_vc_categories WHERE guild_id = $1",
+            guild_id,
+        )
+        if row is None:
+            return None
+        return TemporaryVoiceCategoryRepository._category_from_row(row)
+
+    async def delete_category(self, guild_id: int) -> None:
+        LOGGER.debug("Deleting temporary voice category for guild_id=%d", guild_id)
+        await self._database.execute(
+            "DELETE FROM temporary_vc_categories WHERE guild_id = $1", guild_id
+        )
+
+
+class PostgresTemporaryVoiceChannelRepository:
+    """一時VCのレコードを asyncpg で PostgreSQL に保存するリポジトリ。"""
+
+    def __init__(self, database: PostgresDatabase) -> None:
+        self._database = database
+
+    async def create_record(
+        self, guild_id: int, owner_user_id: int, category_id: int
+    ) -> TemporaryVoiceChannel:
+        row = await self._database.fetch_one(
+            "INSERT INTO temporary_voice_channels (guild_id, owner_user_id, category_id)"
+            f" VALUES ($1, $2, $3) RETURNING {CHANNEL_COLUMNS}",
+            guild_id,
+            owner_user_id,
+            category_id,
+        )
+        assert row is not None
+        LOGGER.debug("Created temporary voice channel record: %s", dict(row))
+        return TemporaryVoiceChannelRepository._channel_from_row(row)
+
+    async def update_channel_id(
+        self, guild_id: int, owner_user_id: int, channel_id: int
+    ) -> TemporaryVoiceChannel:
+        row = await self._database.fetch_one(
+            "UPDATE temporary_voice_channels SET channel_id = $3, last_seen_at = now()"
+            f" WHERE guild_id = $1 AND owner_user_id = $2 RETURNING {CHANNEL_COLUMNS}",
+            guild_id,
+            owner_user_id,
+            channel_id,
+        )
+        if row is None:
+            raise ValueError("temporary voice channel record not found for update")
+        LOGGER.debug("Updated temporary voice channel record: %s", dict(row))
+        return TemporaryVoiceChannelRepository._channel_from_row(row)
+
+    async def get_by_owner(
+        self, guild_id: int, owner_user_id: int
+    ) -> TemporaryVoiceChannel | None:
+        row = await self._database.fetch_one(
+            f"SELECT {CHANNEL_COLUMNS} FROM temporary_voice_channels"
+            " WHERE guild_id = $1 AND owner_user_id = $2",
+            guild_id,
+            owner_user_id,
+        )
+        if row is None:
+            return None
+        return TemporaryVoiceChannelRepository._channel_from_row(row)
+
+    async def get_by_channel(
+        self, guild_id: int, channel_id: int
+    ) -> TemporaryVoiceChannel | None:
+        row = await self._database.fetch_one(
+            f"SELECT {CHANNEL_COLUMNS} FROM temporary_voice_channels"
+            " WHERE guild_id = $1 AND channel_id = $2",
+            guild_id,
+            channel_id,
+        )
+        if row is None:
+            return None
+        return TemporaryVoiceChannelRepository._channel_from_row(row)
+
+    async def delete_record(self, guild_id: int, owner_user_id: int) -> None:
+        await self._database.execute(
+            "DELETE FROM temporary_voice_channels WHERE guild_id = $1 AND owner_user_id = $2",
+            guild_id,
+            owner_user_id,
+        )
+        LOGGER.debug(
+            "Deleted temporary voice channel record for guild_id=%d, owner_user_id=%d",
+            guild_id,
+            owner_user_id,
+        )
+
+    async def delete_by_channel(self, guild_id: int, channel_id: int) -> None:
+        await self._database.execute(
+            "DELETE FROM temporary_voice_channels WHERE guild_id = $1 AND channel_id = $2",
+            guild_id,
+            channel_id,
+        )
+        LOGGER.debug(
+            "Deleted temporary voice channel record for guild_id=%d, channel_id=%d",
+            guild_id,
+            channel_id,
+        )
+
+    async def delete_records(self, keys: Sequence[tuple[int, int]]) -> None:
+        """(guild_id, owner_user_id) の組を配列で渡して 1 文で削除する。"""
+
+        if not keys:
+            return
+        await self._database.execute(
+            "DELETE FROM temporary_voice_channels AS t"
+            " USING unnest($1::bigint[], $2::bigint[]) AS k(guild_id, owner_user_id)"
+            " WHERE t.guild_id = k.guild_id AND t.owner_user_id = k.owner_user_id",
+            [guild_id for guild_id, _ in keys],
+            [owner_user_id for _, owner_user_id in keys],
+        )
+        LOGGER.debug("Deleted temporary voice channel records: %d records", len(keys))
+
+    async def list_by_guild(self, guild_id: int) -> Sequence[TemporaryVoiceChannel]:
+        return [record async for record in self.iter_by_guild(guild_id)]
+
+    async def list_all(self) -> Sequence[TemporaryVoiceChannel]:
+        return [record async for record in self.iter_all()]
+
+    async def iter_all(
+        self, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> AsyncIterator[TemporaryVoiceChannel]:
+        """全レコードを (guild_id, owner_user_id) 順に `page_size` 件ずつ取得しながら返す。"""
+
+        after: tuple[int, int] | None = None
+        while True:
+            page = await self.list_page(after, page_size)
+            for record in page:
+                yield record
+            if len(page) < page_size:
+                return
+            after = (page[-1].guild_id, page[-1].owner_user_id)
+
+    async def iter_by_guild(
+        self, guild_id: int, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> AsyncIterator[TemporaryVoiceChannel]:
+        """ギルド内のレコードを owner_user_id 順に `page_size` 件ずつ取得しながら返す。"""
+
+        after = -1
+        while True:
+            rows = await self._database.fetch_all(
+                f"SELECT {CHANNEL_COLUMNS} FROM temporary_voice_channels"
+                " WHERE guild_id = $1 AND owner_user_id > $2"
+                " ORDER BY owner_user_id LIMIT $3",
+                guild_id,
+                after,
+                page_size,
+            )
+            for row in rows:
+                yield TemporaryVoiceChannelRepository._channel_from_row(row)
+            if len(rows) < page_size:
+                return
+            after = int(rows[-1]["owner_user_id"])
+
+    async def list_page(
+        self, after: tuple[int, int] | None, limit: int
+    ) -> Sequence[TemporaryVoiceChannel]:
+        """(guild_id, owner_user_id) 順で `after` より後ろのレコードを最大 `limit` 件返す。"""
+
+        if after is None:
+            rows = await self._database.fetch_all(
+                f"SELECT {CHANNEL_COLUMNS} FROM temporary_voice_channels"
+                " ORDER BY guild_id, owner_user_id LIMIT $1",
+                limit,
+            )
+        else:
+            rows = await self._database.fetch_all(
+                f"SELECT {CHANNEL_COLUMNS} FROM temporary_voice_channels"
+                " WHERE (guild_id, owner_user_id) > ($1, $2)"
+                " ORDER BY guild_id, owner_user_id LIMIT $3",
+                *after,
+                limit,
+            )
+        return [TemporaryVoiceChannelRepository._channel_from_row(row) for row in rows]
+
+    async def purge_guild(self, guild_id: int) -> None:
+        await self._database.execute(
+            "DELETE FROM temporary_voice_channels WHERE guild_id = $1", guild_id
+        )
+        LOGGER.debug("Purged temporary voice channel records for guild_id=%d", guild_id)
+
+    async def touch_last_seen(self, guild_id: int, owner_user_id: int) -> None:
+        await self._database.execute(
+            "UPDATE temporary_voice_channels SET last_seen_at = now()"
+            " WHERE guild_id = $1 AND owner_user_id = $2",
+            guild_id,
+            owner_user_id,
+        )
+
+    async def update_last_seen(self, records: Sequence[TemporaryVoiceChannel]) -> None:
+        if not records:
+            return
+        # 削除済みの行を作り直さないよう UPDATE のみで書き込む
+        await self._database.execute(
+            "UPDATE temporary_voice_channels AS t SET last_seen_at = k.last_seen_at"
+            " FROM unnest($1::bigint[], $2::bigint[], $3::timestamptz[])"
+            " AS k(guild_id, owner_user_id, last_seen_at)"
+            " WHERE t.guild_id = k.guild_id AND t.owner_user_id = k.owner_user_id",
+            [record.guild_id for record in records],
+            [record.owner_user_id for record in records],
+            [record.last_seen_at for record in records],
+        )
+        LOGGER.debug("Updated last_seen_at for %d records", len(records))
+
+
+__all__ = [
+    "PostgresChannelNicknameRuleRepository",
+    "PostgresTemporaryVoiceCategoryRepository",
+    "PostgresTemporaryVoiceChannelRepository",
+]
@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timezone
+from typing import AsyncIterator, Sequence
+
+from app.repositories.channel_rules import ChannelNicknameRule, ChannelNicknameRuleRepository
+from app.repositories.temporary_voice import (
+    CHANNEL_COLUMNS,
+    DEFAULT_PAGE_SIZE,
+    TemporaryVoiceCategory,
+    TemporaryVoiceCategoryRepository,
+    TemporaryVoiceChannel,
+    TemporaryVoiceChannelRepository,
+)
+from app.sqlite_database import SQLiteDatabase
+
+LOGGER = logging.getLogger(__name__)
+RULE_COLUMNS = "guild_id, channel_id, role_id, updated_by, updated_at"
+CATEGORY_COLUMNS = "guild_id, category_id, updated_by, updated_at"
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class SQLiteChannelNicknameRuleRepository:
+    """チャンネル監視設定を SQLite に保存するリポジトリ。"""
+
+    def __init__(self, database: SQLiteDatabase) -> None:
+        self._database = database
+
+    async def upsert_rule(
+        self, guild_id: int, channel_id: int, role_id: int, updated_by: int
+    ) -> ChannelNicknameRule:
+        row = await self._database.fetch_one(
+            "INSERT INTO channel_nickname_rules"
+            " (guild_id, channel_id, role_id, updated_by, updated_at)"
+            " VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (guild_id, channel_id) DO UPDATE SET"
+            " role_id = excluded.role_id,"
+            " updated_by = excluded.updated_by,"
+            " updated_at = excluded.updated_at"
+            f" RETURNING {RULE_COLUMNS}",
+            (guild_id, channel_id, role_id, updated_by, _now()),
+        )
+        assert row is not None  # RETURNING があるため None にならない
+        LOGGER.debug("Upserted channel nickname rule: %s", dict(row))
+        return ChannelNicknameRuleRepository._to_entity(row)
+
+    async def get_rule_for_channel(
+        self, guild_id: int, channel_id: int
+    ) -> ChannelNicknameRule | None:
+        row = await self._database.fetch_one(
+            f"SELECT {RULE_COLUMNS} FROM channel_nickname_rules"
+            " WHERE guild_id = ? AND channel_id = ?",
+            (guild_id, channel_id),
+        )
+        if row is None:
+            return None
+        return ChannelNicknameRuleRepository._to_entity(row)
+
+    async def list_rules(self) -> Sequence[ChannelNicknameRule]:
+        rows = await self._database.fetch_all(
+            f"SELECT {RULE_COLUMNS} FROM channel_nickname_rules"
+        )
+        LOGGER.debug("Listed channel nickname rules: %d records", len(rows))
+        return [ChannelNicknameRuleRepository._to_entity(row) for row in rows]
+
+
+class SQLiteTemporaryVoiceCategoryRepository:
+    """一時VCカテゴリ設定を SQLite に保存するリポジトリ。"""
+
+    def __init__(self, database: SQLiteDatabase) -> None:
+        self._database = database
+
+    async def upsert_category(
+        self, guild_id: int, category_id: int, updated_by: int
+    ) -> TemporaryVoiceCategory:
+        row = await self._database.fetch_one(
+            "INSERT INTO temporary_vc_categories (guild_id, category_id, updated_by, updated_at)"
+            " VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (guild_id) DO UPDATE SET"
+            " category_id = excluded.category_id,"
+            " updated_by = excluded.updated_by,"
+            " updated_at = excluded.updated_at"
+            f" RETURNING {CATEGORY_COLUMNS}",
+            (guild_id, category_id, updated_by, _now()),
+        )
+        assert row is not None
+        LOGGER.debug("Upserted temporary voice category: %s", dict(row))
+        return TemporaryVoiceCategoryRepository._category_from_row(row)
+
+    async def get_category(self, guild_id: int) -> TemporaryVoiceCategory | None:
+        row = await self._database.fetch_one(
+            f"SELECT {CATEGORY_COLUMNS} FROM temporary_vc_categories WHERE guild_id = ?",
+            (guild_id,),
+        )
+        if row is None:
+            return None
+        return TemporaryVoiceCategoryRepository._category_from_row(row)
+
+    async def delete_category(self, guild_id: int) -> None:
+        LOGGER.debug("Deleting temporary voice category for guild_id=%d", guild_id)
+        await self._database.execute(
+            "DELETE FROM temporary_vc_categories WHERE guild_id = ?", (guild_id,)
+        )
+
+
+class SQLiteTemporaryVoiceChannelRepository:
+    """一時VCのレコードを SQLite に保存するリポジトリ。"""
+
+    def __init__(self, database: SQLiteDatabase) -> None:
+        self._database = database
+
+    async def create_record(
+        self, guild_id: int, owner_user_id: int, category_id: int
+    ) -> TemporaryVoiceChannel:
+        now = _now()
+        row = await self._database.fetch_one(
+            "INSERT INTO temporary_voice_channels"
+            " (guild_id, owner_user_id, category_id, created_at, last_seen_at)"
+            f" VALUES (?, ?, ?, ?, ?) RETURNING {CHANNEL_COLUMNS}",
+            (guild_id, owner_user_id, category_id, now, now),
+        )
+        assert row is not None
+        LOGGER.debug("Created temporary voice channel record: %s", dict(row))
+        return TemporaryVoiceChannelRepository._channel_from_row(row)
+
+    async def update_channel_id(
+        self, guild_id: int, owner_user_id: int, channel_id: int
+    ) -> TemporaryVoiceChannel:
+        row = await self._database.fetch_one(
+            "UPDATE temporary_voice_channels SET channel_id = ?, last_seen_at = ?"
+            f" WHERE guild_id = ? AND owner_user_id = ? RETURNING {CHANNEL_COLUMNS}",
+            (channel_id, _now(), guild_id, owner_user_id),
+        )
+        if row is None:
+            raise ValueError("temporary voice channel record not found for update")
+        LOGGER.debug("Updated temporary voice channel record: %s", dict(row))
+        return TemporaryVoiceChannelRepository._channel_from_row(row)
+
+    async def get_by_owner(
+        self, guild_id: int, owner_user_id: int
+    ) -> TemporaryVoiceChannel | None:
+        row = await self._database.fetch_one(
+            f"SELECT {CHANNEL_COLUMNS} FROM temporary_voice_channels"
+            " WHERE guild_id = ? AND owner_user_id = ?",
+            (guild_id, owner_user_id),
+        )
+        if row is None:
+            return None
+        return TemporaryVoiceChannelRepository._channel_from_row(row)
+
+    async def get_by_channel(
+        self, guild_id: int, channel_id: int
+    ) -> TemporaryVoiceChannel | None:
+        row = await self._database.fetch_one(
+            f"SELECT {CHANNEL_COLUMNS} FROM temporary_voice_channels"
+            " WHERE guild_id = ? AND channel_id = ?",
+            (guild_id, channel_id),
+        )
+        if row is None:
+            return None
+        return TemporaryVoiceChannelRepository._channel_from_row(row)
+
+    async def delete_record(self, guild_id: int, owner_user_id: int) -> None:
+        await self._database.execute(
+            "DELETE FROM temporary_voice_channels WHERE guild_id = ? AND owner_user_id = ?",
+            (guild_id, owner_user_id),
+        )
+        LOGGER.debug(
+            "Deleted temporary voice channel record for guild_id=%d, owner_user_id=%d",
+            guild_id,
+            owner_user_id,
+        )
+
+    async def delete_by_channel(self, guild_id: int, channel_id: int) -> None:
+        await self._database.execute(
+            "DELETE FROM temporary_voice_channels WHERE guild_id = ? AND channel_id = ?",
+            (guild_id, channel_id),
+        )
+        LOGGER.debug(
+            "Deleted temporary voice channel record for guild_id=%d, channel_id=%d",
+            guild_id,
+            channel_id,
+        )
+
+    async def delete_records(self, keys: Sequence[tuple[int, int]]) -> None:
+        """(guild_id, owner_user_id) の組を 1 トランザクションで削除する。"""
+
+        if not keys:
+            return
+        await self._database.execute_many(
+            "DELETE FROM temporary_voice_channels WHERE guild_id = ? AND owner_user_id = ?",
+            list(keys),
+        )
+        LOGGER.debug("Deleted temporary voice channel records: %d records", len(keys))
+
+    async def list_by_guild(self, guild_id: int) -> Sequence[TemporaryVoiceChannel]:
+        return [record async for record in self.iter_by_guild(guild_id)]
+
+    async def list_all(self) -> Sequence[TemporaryVoiceChannel]:
+        return [record async for record in self.iter_all()]
+
+    async def iter_all(
+        self, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> AsyncIterator[TemporaryVoiceChannel]:
+        """全レコードを (guild_id, owner_user_id) 順に `page_size` 件ずつ取得しながら返す。"""
+
+        after: tuple[int, int] | None = None
+        while True:
+            page = await self.list_page(after, page_size)
+            for record in page:
+                yield record
+            if len(page) < page_size:
+                return
+            after = (page[-1].guild_id, page[-1].owner_user_id)
+
+    async def iter_by_guild(
+        self, guild_id: int, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> AsyncIterator[TemporaryVoiceChannel]:
+        """ギルド内のレコードを owner_user_id 順に `page_size` 件ずつ取得しながら返す。"""
+
+        after = -1
+        while True:
+            rows = await self._database.fetch_all(
+                f"SELECT {CHANNEL_COLUMNS} FROM temporary_voice_channels"
+                " WHERE guild_id = ? AND owner_user_id > ?"
+                " ORDER BY owner_user_id LIMIT ?",
+                (guild_id, after, page_size),
+            )
+            for row in rows:
+                yield TemporaryVoiceChannelRepository._channel_from_row(row)
+            if len(rows) < page_size:
+                return
+            after = int(rows[-1]["owner_user_id"])
+
+    async def list_page(
+        self, after: tuple[int, int] | None, limit: int
+    ) -> Sequence[TemporaryVoiceChannel]:
+        """(guild_id, owner_user_id) 順で `after` より後ろのレコードを最大 `limit` 件返す。"""
+
+        if after is None:
+            rows = await self._database.fetch_all(
+                f"SELECT {CHANNEL_COLUMNS} FROM temporary_voice_channels"
+                " ORDER BY guild_id, owner_user_id LIMIT ?",
+                (limit,),
+            )
+        else:
+            rows = await self._database.fetch_all(
+                f"SELECT {CHANNEL_COLUMNS} FROM temporary_voice_channels"
+                " WHERE (guild_id, owner_user_id) > (?, ?)"
+                " ORDER BY guild_id, owner_user_id LIMIT ?",
+                (*after, limit),
+            )
+        return [TemporaryVoiceChannelRepository._channel_from_row(row) for row in rows]
+
+    async def purge_guild(self, guild_id: int) -> None:
+        await self._database.execute(
+            "DELETE FROM temporary_voice_channels WHERE guild_id = ?", (guild_id,)
+        )
+        LOGGER.debug("Purged temporary voice channel records for guild_id=%d", guild_id)
+
+    async def touch_last_seen(self, guild_id: int, owner_user_id: int) -> None:
+        await self._database.execute(
+            "UPDATE temporary_voice_channels SET last_seen_at = ?"
+            " WHERE guild_id = ? AND owner_user_id = ?",
+            (_now(), guild_id, owner_user_id),
+        )
+
+    async def update_last_seen(self, records: Sequence[TemporaryVoiceChannel]) -> None:
+        if not records:
+            return
+        # 削除済みの行を作り直さないよう UPDATE のみで書き込む
+        await self._database.execute_many(
+            "UPDATE temporary_voice_channels SET last_seen_at = ?"
+            " WHERE guild_id = ? AND owner_user_id = ?",
+            [
+                (record.last_seen_at.isoformat(), record.guild_id, record.owner_user_id)
+                for record in records
+            ],
+        )
+        LOGGER.debug("Updated last_seen_at for %d records", len(records))
+
+
+__all__ = [
+    "SQLiteChannelNicknameRuleRepository",
+    "SQLiteTemporaryVoiceCategoryRepository",
+    "SQLiteTemporaryVoiceChannelRepository",
+]
@@ -1,14 +1,30 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, replace
 from datetime import datetime, timezone
-from typing import Protocol, Sequence
+from typing import (
+    TYPE_CHECKING,
+    AsyncIterator,
+    Protocol,
+    Sequence,
+)
 import logging
 
-from app.database import Database
+from app.batch_loader import BatchLoader
+from app.database import Database, DatabaseTimeoutError, DatabaseUnavailableError
+from app.deadlines import remaining_budget
 from app.repositories._helpers import ensure_utc_timestamp
 
+if TYPE_CHECKING:
+    from app.repositories.last_seen import LastSeenFlusher
+
 LOGGER = logging.getLogger(__name__)
+DELETE_CHUNK_SIZE = 500
+# PostgREST の既定 max-rows (1000) を超えないページサイズ
+DEFAULT_PAGE_SIZE = 1000
+CHANNEL_COLUMNS = "guild_id, owner_user_id, channel_id, category_id, created_at, last_seen_at"
 
 
 @dataclass(frozen=True, slots=True)
@@ -58,18 +74,43 @@ class TemporaryVoiceChannelStore(Protocol):
 
     async def delete_by_channel(self, guild_id: int, channel_id: int) -> None: ...
 
+    async def delete_records(self, keys: Sequence[tuple[int, int]]) -> None: ...
+
     async def list_by_guild(self, guild_id: int) -> Sequence[TemporaryVoiceChannel]: ...
 
     async def list_all(self) -> Sequence[TemporaryVoiceChannel]: ...
 
+    def iter_all(
+        self, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> AsyncIterator[TemporaryVoiceChannel]: ...
+
+    async def list_page(
+        self, after: tuple[int, int] | None, limit: int
+    ) -> Sequence[TemporaryVoiceChannel]: ...
+
     async def purge_guild(self, guild_id: int) -> None: ...
 
     async def touch_last_seen(self, guild_id: int, owner_user_id: int) -> None: ...
 
 
+class TemporaryVoiceChannelObserver(Protocol):
+    def record_updated(self, record: TemporaryVoiceChannel) -> None: ...
+
+    def record_removed(self, guild_id: int, owner_user_id: int) -> None: ...
+
+
 class TemporaryVoiceCategoryRepository:
-    def __init__(self, database: Database) -> None:
+    """一時VCカテゴリ設定を PostgreSQL に保存するリポジトリ。
+
+    `get_category` は `batch_window` 秒（0 ならイベントループの 1 周）の間に届いた
+    取得をまとめ、`get_categories` の 1 回の select で解決する。
+    """
+
+    def __init__(self, database: Database, *, batch_window: float = 0.0) -> None:
         self._database = database
+        self.loader: BatchLoader[int, TemporaryVoiceCategory] = BatchLoader(
+            self.get_categories, window=batch_window
+        )
 
     async def upsert_category(
         self, guild_id: int, category_id: int, updated_by: int
@@ -91,15 +132,32 @@ class TemporaryVoiceCategoryRepository:
         return self._category_from_row(row)
 
     async def get_category(self, guild_id: int) -> TemporaryVoiceCategory | None:
-        row = await self._database.execute_one(
+        return await self._database.wait_within_deadline(
+            self.loader.load(guild_id), "temporary_vc_categories", "select"
+        )
+
+    async def get_categories(
+        self, guild_ids: Sequence[int]
+    ) -> dict[int, TemporaryVoiceCategory]:
+        """ギルドのカテゴリ設定を `in` フィルターの 1 回の select で取得する。"""
+
+        if not guild_ids:
+            return {}
+        rows = await self._database.execute(
             self._database.table("temporary_vc_categories")
             .select("guild_id, category_id, updated_by, updated_at")
-            .eq("guild_id", guild_id)
+            .in_("guild_id", sorted(set(guild_ids)))
         )
-        if row is None:
-            return None
-        LOGGER.debug("Fetched temporary voice category: %s", row)
-        return self._category_from_row(row)
+        categories = {
+            category.guild_id: category
+            for category in map(self._category_from_row, rows)
+        }
+        LOGGER.debug(
+            "Fetched temporary voice categories: %d of %d guilds",
+            len(categories),
+            len(guild_ids),
+        )
+        return categories
 
     async def delete_category(self, guild_id: int) -> None:
         LOGGER.debug("Deleting temporary voice category for guild_id=%d", guild_id)
@@ -159,9 +217,7 @@ class TemporaryVoiceChannelRepository:
     ) -> TemporaryVoiceChannel | None:
         row = await self._database.execute_one(
             self._database.table("temporary_voice_channels")
-            .select(
-                "guild_id, owner_user_id, channel_id, category_id, created_at, last_seen_at"
-            )
+            .select(CHANNEL_COLUMNS)
             .eq("guild_id", guild_id)
             .eq("owner_user_id", owner_user_id)
         )
@@ -175,9 +231,7 @@ class TemporaryVoiceChannelRepository:
     ) -> TemporaryVoiceChannel | None:
         row = await self._database.execute_one(
             self._database.table("temporary_voice_channels")
-            .select(
-                "guild_id, owner_user_id, channel_id, category_id, created_at, last_seen_at"
-            )
+            .select(CHANNEL_COLUMNS)
             .eq("guild_id", guild_id)
             .eq("channel_id", channel_id)
         )
@@ -212,29 +266,102 @@ class TemporaryVoiceChannelRepository:
             channel_id,
         )
 
+    async def delete_records(self, keys: Sequence[tuple[int, int]]) -> None:
+        """(guild_id, owner_user_id) の組をギルドごと・`DELETE_CHUNK_SIZE` 件ごとに一括削除する。"""
+
+        owners_by_guild: dict[int, list[int]] = {}
+        for guild_id, owner_user_id in keys:
+            owners_by_guild.setdefault(guild_id, []).append(owner_user_id)
+
+        for guild_id, owner_user_ids in owners_by_guild.items():
+            for offset in range(0, len(owner_user_ids), DELETE_CHUNK_SIZE):
+                chunk = owner_user_ids[offset : offset + DELETE_CHUNK_SIZE]
+                await self._database.execute(
+                    self._database.table("temporary_voice_channels")
+                    .delete()
+                    .eq("guild_id", guild_id)
+                    .in_("owner_user_id", chunk)
+                )
+                LOGGER.debug(
+                    "Deleted temporary voice channel records for guild_id=%d: %d records",
+                    guild_id,
+                    len(chunk),
+                )
+
     async def list_by_guild(self, guild_id: int) -> Sequence[TemporaryVoiceChannel]:
-        rows = await self._database.execute(
-            self._database.table("temporary_voice_channels")
-            .select(
-                "guild_id, owner_user_id, channel_id, category_id, created_at, last_seen_at"
-            )
-            .eq("guild_id", guild_id)
-        )
+        records = [record async for record in self.iter_by_guild(guild_id)]
         LOGGER.debug(
             "Listed temporary voice channel records for guild_id=%d: %d records",
             guild_id,
-            len(rows),
+            len(records),
         )
-        return [self._channel_from_row(row) for row in rows]
+        return records
 
     async def list_all(self) -> Sequence[TemporaryVoiceChannel]:
-        rows = await self._database.execute(
-            self._database.table("temporary_voice_channels").select(
-                "guild_id, owner_user_id, channel_id, category_id, created_at, last_seen_at"
+        records = [record async for record in self.iter_all()]
+        LOGGER.debug(
+            "Listed all temporary voice channel records: %d records", len(records)
+        )
+        return records
+
+    async def iter_all(
+        self, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> AsyncIterator[TemporaryVoiceChannel]:
+        """全レコードを (guild_id, owner_user_id) 順に `page_size` 件ずつ取得しながら返す。"""
+
+        after: tuple[int, int] | None = None
+        while True:
+            page = await self.list_page(after, page_size)
+            for record in page:
+                yield record
+            if len(page) < page_size:
+                return
+            after = (page[-1].guild_id, page[-1].owner_user_id)
+
+    async def iter_by_guild(
+        self, guild_id: int, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> AsyncIterator[TemporaryVoiceChannel]:
+        """ギルド内のレコードを owner_user_id 順に `page_size` 件ずつ取得しながら返す。"""
+
+        after: int | None = None
+        while True:
+            query = (
+                self._database.table("temporary_voice_channels")
+                .select(CHANNEL_COLUMNS)
+                .eq("guild_id", guild_id)
+                .order("owner_user_id")
+                .limit(page_size)
             )
+            if after is not None:
+                query = query.gt("owner_user_id", after)
+            rows = await self._database.execute(query)
+            for row in rows:
+                yield self._channel_from_row(row)
+            if len(rows) < page_size:
+                return
+            after = int(rows[-1]["owner_user_id"])
+
+    async def list_page(
+        self, after: tuple[int, int] | None, limit: int
+    ) -> Sequence[TemporaryVoiceChannel]:
+        """(guild_id, owner_user_id) 順で `after` より後ろのレコードを最大 `limit` 件返す。"""
+
+        query = (
+            self._database.table("temporary_voice_channels")
+            .select(CHANNEL_COLUMNS)
+            .order("guild_id")
+            .order("owner_user_id")
+            .limit(limit)
         )
+        if after is not None:
+            guild_id, owner_user_id = after
+            query = query.or_(
+                f"guild_id.gt.{guild_id},"
+                f"and(guild_id.eq.{guild_id},owner_user_id.gt.{owner_user_id})"
+            )
+        rows = await self._database.execute(query)
         LOGGER.debug(
-            "Listed all temporary voice channel records: %d records", len(rows)
+            "Listed temporary voice channel records after %s: %d records", after, len(rows)
         )
         return [self._channel_from_row(row) for row in rows]
 
@@ -260,6 +387,26 @@ class TemporaryVoiceChannelRepository:
             owner_user_id,
         )
 
+    async def update_last_seen(self, records: Sequence[TemporaryVoiceChannel]) -> None:
+        """`last_seen_at` を 1 回の RPC でまとめて更新する。存在しない行は作らない。
+
+        `supabase/schema.sql` の `touch_temporary_voice_channels` 関数が必要。
+        """
+
+        if not records:
+            return
+        await self._database.execute(
+            self._database.rpc(
+                "touch_temporary_voice_channels",
+                {
+                    "guild_ids": [record.guild_id for record in records],
+                    "owner_user_ids": [record.owner_user_id for record in records],
+                    "seen_at": [record.last_seen_at.isoformat() for record in records],
+                },
+            )
+        )
+        LOGGER.debug("Updated last_seen_at for %d records", len(records))
+
     @staticmethod
     def _channel_from_row(row) -> TemporaryVoiceChannel:
         channel_id = row["channel_id"]
@@ -273,11 +420,299 @@ class TemporaryVoiceChannelRepository:
         )
 
 
+class CachedTemporaryVoiceChannelStore:
+    """`temporary_voice_channels` の全件をメモリに保持する索引付きストア。
+
+    起動時に `load()` で読み込み、以降の書き込みはリポジトリへ委譲したうえで
+    索引にも反映する。`(guild_id, owner_user_id)` と `channel_id` の双方で引けるため、
+    一時VC以外の VoiceState イベントではデータベースに問い合わせない。
+    `flusher` を渡すと `touch_last_seen` は即時に書き込まず一括更新に回す。
+    """
+
+    def __init__(
+        self,
+        repository: TemporaryVoiceChannelRepository,
+        *,
+        flusher: LastSeenFlusher | None = None,
+    ) -> None:
+        self._repository = repository
+        self._flusher = flusher
+        self._by_owner: dict[tuple[int, int], TemporaryVoiceChannel] = {}
+        self._by_channel: dict[int, TemporaryVoiceChannel] = {}
+        self._observers: list[TemporaryVoiceChannelObserver] = []
+        # 索引から外したがリポジトリでの削除が終わっていないキーとギルド
+        self._deleting: set[tuple[int, int]] = set()
+        self._purging: set[int] = set()
+        self._loaded = False
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def add_observer(self, observer: TemporaryVoiceChannelObserver) -> None:
+        """索引の変更を通知する先を登録し、現在のレコードをすべて通知する。"""
+
+        self._observers.append(observer)
+        for record in self._by_owner.values():
+            observer.record_updated(record)
+
+    async def load(self) -> None:
+        """テーブル全件を読み込み、索引を置き換える。"""
+
+        self._by_owner = {}
+        self._by_channel = {}
+        self._loaded = False
+        count = 0
+        async for record in self._repository.iter_all():
+            self._remember(record)
+            count += 1
+        self._loaded = True
+        LOGGER.info("一時VCレコードを読み込みました: %d 件", count)
+
+    async def create_record(
+        self, guild_id: int, owner_user_id: int, category_id: int
+    ) -> TemporaryVoiceChannel:
+        async with self._write_barrier():
+            try:
+                record = await self._repository.create_record(
+                    guild_id, owner_user_id, category_id
+                )
+            except (DatabaseTimeoutError, DatabaseUnavailableError):
+                # 挿入されたか分からない行は呼び出し元が削除する（索引には取り込まない）
+                raise
+            except Exception:
+                # 一意制約違反などは既存の行が索引から漏れている可能性がある
+                try:
+                    await self._refresh(guild_id, owner_user_id)
+                except Exception:
+                    LOGGER.exception(
+                        "一時VCレコードの読み直しに失敗しました: guild=%s owner=%s",
+                        guild_id,
+                        owner_user_id,
+                    )
+                raise
+            self._remember(record)
+        return record
+
+    async def update_channel_id(
+        self, guild_id: int, owner_user_id: int, channel_id: int
+    ) -> TemporaryVoiceChannel:
+        async with self._write_barrier():
+            record = await self._repository.update_channel_id(
+                guild_id, owner_user_id, channel_id
+            )
+            self._remember(record)
+        return record
+
+    async def get_by_owner(
+        self, guild_id: int, owner_user_id: int
+    ) -> TemporaryVoiceChannel | None:
+        if self._loaded:
+            return self._by_owner.get((guild_id, owner_user_id))
+        return await self._repository.get_by_owner(guild_id, owner_user_id)
+
+    async def get_by_channel(
+        self, guild_id: int, channel_id: int
+    ) -> TemporaryVoiceChannel | None:
+        if self._loaded:
+            record = self._by_channel.get(channel_id)
+            if record is None or record.guild_id != guild_id:
+                return None
+            return record
+        return await self._repository.get_by_channel(guild_id, channel_id)
+
+    async def delete_record(self, guild_id: int, owner_user_id: int) -> None:
+        async with self._write_barrier():
+            # 削除中の touch が送信待ちに積まれないよう、先に索引から外す
+            forgotten = self._forget(guild_id, owner_user_id)
+            self._deleting.add((guild_id, owner_user_id))
+            try:
+                await self._repository.delete_record(guild_id, owner_user_id)
+            except Exception:
+                self._restore(forgotten)
+                raise
+            finally:
+                self._deleting.discard((guild_id, owner_user_id))
+
+    async def delete_by_channel(self, guild_id: int, channel_id: int) -> None:
+        async with self._write_barrier():
+            forgotten: list[TemporaryVoiceChannel] = []
+            record = self._by_channel.get(channel_id)
+            if record is not None and record.guild_id == guild_id:
+                forgotten = self._forget(guild_id, record.owner_user_id)
+            deleting = {(r.guild_id, r.owner_user_id) for r in forgotten} - self._deleting
+            self._deleting |= deleting
+            try:
+                await self._repository.delete_by_channel(guild_id, channel_id)
+            except Exception:
+                self._restore(forgotten)
+                raise
+            finally:
+                self._deleting -= deleting
+
+    async def delete_records(self, keys: Sequence[tuple[int, int]]) -> None:
+        async with self._write_barrier():
+            forgotten: list[TemporaryVoiceChannel] = []
+            for guild_id, owner_user_id in keys:
+                forgotten.extend(self._forget(guild_id, owner_user_id))
+            deleting = set(keys) - self._deleting
+            self._deleting |= deleting
+            try:
+                await self._repository.delete_records(keys)
+            except Exception:
+                self._restore(forgotten)
+                raise
+            finally:
+                self._deleting -= deleting
+
+    async def list_by_guild(self, guild_id: int) -> Sequence[TemporaryVoiceChannel]:
+        if self._loaded:
+            return [
+                record for record in self._by_owner.values() if record.guild_id == guild_id
+            ]
+        return await self._repository.list_by_guild(guild_id)
+
+    async def list_all(self) -> Sequence[TemporaryVoiceChannel]:
+        if self._loaded:
+            return list(self._by_owner.values())
+        return await self._repository.list_all()
+
+    async def iter_all(
+        self, page_size: int = DEFAULT_PAGE_SIZE
+    ) -> AsyncIterator[TemporaryVoiceChannel]:
+        if not self._loaded:
+            async for record in self._repository.iter_all(page_size):
+                yield record
+            return
+        for record in list(self._by_owner.values()):
+            yield record
+
+    async def list_page(
+        self, after: tuple[int, int] | None, limit: int
+    ) -> Sequence[TemporaryVoiceChannel]:
+        """テーブルを (guild_id, owner_user_id) 順に `after` の次から `limit` 件読む。
+
+        整合性チェック用に索引ではなくリポジトリを巡回する。索引にない行（作成時の
+        タイムアウトなどで取りこぼした行）は、削除中のものを除いて索引に取り込む。
+        """
+
+        records = await self._repository.list_page(after, limit)
+        if self._loaded:
+            for record in records:
+                key = (record.guild_id, record.owner_user_id)
+                if (
+                    key in self._by_owner
+                    or key in self._deleting
+                    or record.guild_id in self._purging
+                ):
+                    continue
+                LOGGER.warning(
+                    "索引になかった一時VCレコードを取り込みました: guild=%s owner=%s",
+                    record.guild_id,
+                    record.owner_user_id,
+                )
+                self._remember(record)
+        return records
+
+    async def purge_guild(self, guild_id: int) -> None:
+        async with self._write_barrier():
+            forgotten: list[TemporaryVoiceChannel] = []
+            for guild, owner_user_id in [key for key in self._by_owner if key[0] == guild_id]:
+                forgotten.extend(self._forget(guild, owner_user_id))
+            purging = guild_id not in self._purging
+            self._purging.add(guild_id)
+            try:
+                await self._repository.purge_guild(guild_id)
+            except Exception:
+                self._restore(forgotten)
+                raise
+            finally:
+                if purging:
+                    self._purging.discard(guild_id)
+
+    async def touch_last_seen(self, guild_id: int, owner_user_id: int) -> None:
+        record = self._by_owner.get((guild_id, owner_user_id))
+        if self._flusher is None or not self._flusher.batching or record is None:
+            await self._repository.touch_last_seen(guild_id, owner_user_id)
+            record = self._by_owner.get((guild_id, owner_user_id))
+            if record is not None:
+                self._remember(replace(record, last_seen_at=datetime.now(timezone.utc)))
+            return
+
+        touched = replace(record, last_seen_at=datetime.now(timezone.utc))
+        self._remember(touched)
+        self._flusher.touch(touched)
+
+    async def _refresh(self, guild_id: int, owner_user_id: int) -> None:
+        """リポジトリから 1 件読み直し、存在すれば索引に取り込む。"""
+
+        record = await self._repository.get_by_owner(guild_id, owner_user_id)
+        key = (guild_id, owner_user_id)
+        if record is None or key in self._deleting or guild_id in self._purging:
+            return
+        if key not in self._by_owner:
+            LOGGER.warning(
+                "作成に失敗した一時VCレコードが存在したため索引に取り込みました: guild=%s owner=%s",
+                guild_id,
+                owner_user_id,
+            )
+        self._remember(record)
+
+    @asynccontextmanager
+    async def _write_barrier(self) -> AsyncIterator[None]:
+        """一括更新と排他にする。ロック待ちも `request_deadline()` の締め切りで打ち切る。"""
+
+        if self._flusher is None:
+            yield
+            return
+        lock = self._flusher.exclusive()
+        budget = remaining_budget()
+        try:
+            async with asyncio.timeout(budget):
+                await lock.acquire()
+        except TimeoutError as exc:
+            raise DatabaseTimeoutError("temporary_voice_channels", "lock", budget or 0.0) from exc
+        try:
+            yield
+        finally:
+            lock.release()
+
+    def _remember(self, record: TemporaryVoiceChannel) -> None:
+        previous = self._by_owner.get((record.guild_id, record.owner_user_id))
+        if previous is not None and previous.channel_id is not None:
+            self._by_channel.pop(previous.channel_id, None)
+        self._by_owner[(record.guild_id, record.owner_user_id)] = record
+        if record.channel_id is not None:
+            self._by_channel[record.channel_id] = record
+        if self._flusher is not None:
+            self._flusher.refresh(record)
+        for observer in self._observers:
+            observer.record_updated(record)
+
+    def _forget(self, guild_id: int, owner_user_id: int) -> list[TemporaryVoiceChannel]:
+        if self._flusher is not None:
+            self._flusher.drop(guild_id, owner_user_id)
+        record = self._by_owner.pop((guild_id, owner_user_id), None)
+        if record is None:
+            return []
+        for observer in self._observers:
+            observer.record_removed(guild_id, owner_user_id)
+        if record.channel_id is not None:
+            self._by_channel.pop(record.channel_id, None)
+        return [record]
+
+    def _restore(self, records: Sequence[TemporaryVoiceChannel]) -> None:
+        for record in records:
+            self._remember(record)
+
+
 __all__ = [
+    "CachedTemporaryVoiceChannelStore",
     "TemporaryVoiceCategory",
     "TemporaryVoiceCategoryRepository",
     "TemporaryVoiceCategoryStore",
     "TemporaryVoiceChannel",
+    "TemporaryVoiceChannelObserver",
     "TemporaryVoiceChannelRepository",
     "TemporaryVoiceChannelStore",
 ]
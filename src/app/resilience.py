@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Callable, Mapping
+
+import httpx
+from postgrest.exceptions import APIError
+
+LOGGER = logging.getLogger(__name__)
+
+# PostgREST が DB へ接続できない・スキーマキャッシュ再読込中などの一時的なエラー
+TRANSIENT_POSTGREST_CODES = frozenset({"PGRST000", "PGRST001", "PGRST002", "PGRST003"})
+# 直列化失敗・デッドロック・管理者による切断など、再試行で解消し得る PostgreSQL のエラー
+TRANSIENT_POSTGRES_CODES = frozenset({"40001", "40P01", "57P01", "57P02", "57P03"})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "DELETE", "PATCH"})
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """通信断・5xx など、時間を置けば成功し得るエラーかを判定する。"""
+
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, APIError):
+        code = error.code
+        if isinstance(code, int):
+            return code >= 500
+        if code is None:
+            return False
+        code = str(code)
+        if code.isdigit() and len(code) == 3:
+            return int(code) >= 500
+        return (
+            code in TRANSIENT_POSTGREST_CODES
+            or code in TRANSIENT_POSTGRES_CODES
+            or code.startswith("08")
+        )
+    return False
+
+
+def is_idempotent_request(request) -> bool:
+    """再送しても結果が変わらないリクエストかを判定する。
+
+    GET/HEAD/DELETE と、値を代入する PATCH（このリポジトリの update はすべて代入）を対象とし、
+    POST は `on_conflict` 付きの upsert (`Prefer: resolution=...`) のみ再送する。
+    """
+
+    config = getattr(request, "request", None)
+    method = getattr(config, "http_method", None)
+    if method is None:
+        return False
+    method = method.upper()
+    if method in IDEMPOTENT_METHODS:
+        return True
+    if method == "POST":
+        prefer = config.headers.get("prefer", "") if config.headers is not None else ""
+        return "resolution=" in prefer
+    return False
+
+
+def describe_request(request) -> tuple[str, str]:
+    """リクエストの (テーブル名, 操作名) を返す。操作は select/insert/upsert/update/delete/rpc。
+
+    RPC ではテーブル名の代わりに関数名を返す。
+    """
+
+    config = getattr(request, "request", None)
+    path = getattr(config, "path", None)
+    table = getattr(path, "name", None) or "unknown"
+    method = (getattr(config, "http_method", None) or "").upper()
+    if getattr(getattr(path, "parent", None), "name", None) == "rpc":
+        operation = "rpc"
+    elif method in {"GET", "HEAD"}:
+        operation = "select"
+    elif method == "PATCH":
+        operation = "update"
+    elif method == "DELETE":
+        operation = "delete"
+    elif method == "POST":
+        operation = "upsert" if is_idempotent_request(request) else "insert"
+    else:
+        operation = method.lower() or "unknown"
+    return table, operation
+
+
+@dataclass(frozen=True, slots=True)
+class TimeoutPolicy:
+    """テーブル・操作ごとのタイムアウト秒数。0 はタイムアウトなし。
+
+    `overrides` のキーは `"テーブル.操作"`、`"テーブル"`、`"*.操作"` のいずれかで、この順に優先する。
+    """
+
+    default: float = 5.0
+    overrides: Mapping[str, float] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        if self.default < 0 or any(value < 0 for value in self.overrides.values()):
+            raise ValueError("timeouts must not be negative")
+
+    def timeout_for(self, table: str, operation: str) -> float:
+        for key in (f"{table}.{operation}", table, f"*.{operation}"):
+            if key in self.overrides:
+                return self.overrides[key]
+        return self.default
+
+
+@dataclass(frozen=True, slots=True)
+class RetryPolicy:
+    """指数バックオフ（full jitter）での再試行方針。`max_attempts=1` で再試行しない。"""
+
+    max_attempts: int = 3
+    base_delay: float = 0.2
+    max_delay: float = 2.0
+
+    def __post_init__(self) -> None:
+        if self.max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        if self.base_delay < 0 or self.max_delay < 0:
+            raise ValueError("delays must not be negative")
+
+    def backoff(self, attempt: int, *, rng: Callable[[float, float], float] = random.uniform) -> float:
+        """`attempt` 回目（1 始まり）の失敗後に待つ秒数を返す。"""
+
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return rng(0.0, ceiling)
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+@dataclass(slots=True)
+class CircuitBreakerStats:
+    """サーキットブレーカーの状態遷移回数と遮断件数。"""
+
+    opened: int = 0
+    half_opened: int = 0
+    closed: int = 0
+    rejected: int = 0
+
+
+class CircuitBreaker:
+    """一時的なエラーが `failure_threshold` 回続いたら `reset_timeout` 秒間リクエストを遮断する。
+
+    遮断時間が過ぎると 1 件だけ試行 (half-open) し、成功すれば復旧、失敗すれば再び遮断する。
+    """
+
+    def __init__(
+        self,
+        *,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+        if reset_timeout < 0:
+            raise ValueError("reset_timeout must not be negative")
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = CircuitState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.stats = CircuitBreakerStats()
+
+    @property
+    def state(self) -> CircuitState:
+        return self._state
+
+    def allow(self) -> bool:
+        """リクエストを送ってよいかを返す。遮断中は False。"""
+
+        if self._state is CircuitState.OPEN:
+            if self._clock() - self._opened_at < self._reset_timeout:
+                self.stats.rejected += 1
+                return False
+            self._transition(CircuitState.HALF_OPEN)
+        if self._state is CircuitState.HALF_OPEN:
+            if self._probing:
+                self.stats.rejected += 1
+                return False
+            self._probing = True
+        return True
+
+    def record_success(self) -> None:
+        self._failures = 0
+        self._probing = False
+        if self._state is not CircuitState.CLOSED:
+            self._transition(CircuitState.CLOSED)
+
+    def record_abandoned(self) -> None:
+        """結果が出ないまま中断された試行 (キャンセルなど) を取り消す。"""
+
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self._probing = False
+        self._failures += 1
+        if self._state is CircuitState.HALF_OPEN or (
+            self._state is CircuitState.CLOSED and self._failures >= self._failure_threshold
+        ):
+            self._opened_at = self._clock()
+            self._transition(CircuitState.OPEN)
+
+    def _transition(self, state: CircuitState) -> None:
+        previous, self._state = self._state, state
+        if state is CircuitState.OPEN:
+            self.stats.opened += 1
+            LOGGER.error(
+                "Supabase への接続を %s 秒間遮断します: previous=%s failures=%s",
+                self._reset_timeout,
+                previous.value,
+                self._failures,
+            )
+        elif state is CircuitState.HALF_OPEN:
+            self.stats.half_opened += 1
+            LOGGER.info("Supabase への試行を再開します (half-open)。")
+        else:
+            self.stats.closed += 1
+            LOGGER.info("Supabase への接続が回復しました。")
+
+
+__all__ = [
+    "CircuitBreaker",
+    "CircuitBreakerStats",
+    "CircuitState",
+    "RetryPolicy",
+    "TimeoutPolicy",
+    "describe_request",
+    "is_idempotent_request",
+    "is_transient_error",
+]
@@ -6,6 +6,7 @@ import os
 
 from .container import build_discord_app
 from .config import load_config
+from .metrics import REGISTRY, MetricsServer
 
 LOGGER = logging.getLogger(__name__)
 LOG_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
@@ -27,11 +28,25 @@ async def run_bot() -> None:
     except Exception:  # pragma: no cover - 起動時例外は稀
         LOGGER.exception("Discord アプリケーションの初期化に失敗しました。")
         return
+
+    metrics_server: MetricsServer | None = None
+    if config.metrics.port > 0:
+        metrics_server = MetricsServer(
+            REGISTRY, host=config.metrics.host, port=config.metrics.port
+        )
+        try:
+            await metrics_server.start()
+        except OSError:
+            # メトリクスが公開できなくても Bot 自体は動かす
+            LOGGER.exception("メトリクスサーバーの起動に失敗しました。")
+            metrics_server = None
     try:
         await app.run()
     except Exception:  # pragma: no cover - discord クライアント実行時例外は稀
         LOGGER.exception("Bot ランタイムで予期しないエラーが発生しました。")
     finally:
+        if metrics_server is not None:
+            await metrics_server.close()
         LOGGER.info("Bot ランタイムを終了しました。")
 
 
@@ -1,17 +1,37 @@
+from .guild_locks import GuildLockRegistry, GuildLockStats
+from .scheduling import DeadlineScheduler
 from .temporary_voice import (
     CategoryNotConfiguredError,
     CategoryUpdateResult,
+    OrphanCleanupResult,
+    ReconcilePage,
     TemporaryVoiceChannelCreationError,
     TemporaryVoiceChannelExistsError,
     TemporaryVoiceChannelNotFoundError,
     TemporaryVoiceChannelService,
+    TemporaryVoiceStats,
 )
+from .temporary_voice_pool import TemporaryVoiceChannelPool, WarmPoolStats
+from .temporary_voice_reconciler import ReconcileStats, TemporaryVoiceReconciler
+from .temporary_voice_sweeper import IdleChannelSweeper, IdleSweepStats
 
 __all__ = [
     "CategoryNotConfiguredError",
     "CategoryUpdateResult",
+    "DeadlineScheduler",
+    "GuildLockRegistry",
+    "GuildLockStats",
+    "IdleChannelSweeper",
+    "IdleSweepStats",
+    "OrphanCleanupResult",
+    "ReconcilePage",
+    "ReconcileStats",
     "TemporaryVoiceChannelCreationError",
     "TemporaryVoiceChannelExistsError",
     "TemporaryVoiceChannelNotFoundError",
+    "TemporaryVoiceChannelPool",
     "TemporaryVoiceChannelService",
+    "TemporaryVoiceReconciler",
+    "TemporaryVoiceStats",
+    "WarmPoolStats",
 ]
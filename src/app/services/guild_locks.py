@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator
+
+
+@dataclass(slots=True)
+class GuildLockStats:
+    """ギルド単位ロックの取得回数と待ち時間。"""
+
+    acquisitions: int = 0
+    contended: int = 0
+    last_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    total_wait_seconds: float = 0.0
+
+
+@dataclass(slots=True)
+class _GuildLock:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    holders: int = 0
+
+
+class GuildLockRegistry:
+    """ギルドごとの処理を直列化するロックを必要な時だけ生成し、未使用になったら破棄する。
+
+    `asyncio.Lock` は取得待ちを FIFO で解放するため、同一ギルド内のイベントは
+    到着順に処理され、異なるギルドは並行に処理される。
+    """
+
+    def __init__(self) -> None:
+        self._locks: dict[int, _GuildLock] = {}
+        self.stats = GuildLockStats()
+
+    @property
+    def active_count(self) -> int:
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, guild_id: int) -> AsyncIterator[None]:
+        entry = self._locks.get(guild_id)
+        if entry is None:
+            entry = _GuildLock()
+            self._locks[guild_id] = entry
+        entry.holders += 1
+        if entry.lock.locked():
+            self.stats.contended += 1
+        started = time.perf_counter()
+        try:
+            async with entry.lock:
+                wait = time.perf_counter() - started
+                self.stats.acquisitions += 1
+                self.stats.last_wait_seconds = wait
+                self.stats.max_wait_seconds = max(self.stats.max_wait_seconds, wait)
+                self.stats.total_wait_seconds += wait
+                yield
+        finally:
+            entry.holders -= 1
+            if entry.holders == 0 and self._locks.get(guild_id) is entry:
+                del self._locks[guild_id]
+
+
+__all__ = ["GuildLockRegistry", "GuildLockStats"]
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+LOGGER = logging.getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+
+
+class DeadlineScheduler(Generic[K]):
+    """キーごとの期限を最小ヒープで管理し、期限が来たキーをまとめてコールバックする。
+
+    再登録・取り消しはヒープから取り除かず世代番号で無効化するため、更新は O(log n)。
+    実行タスクは最初の `schedule` で起動し、次の期限まで眠る。
+    """
+
+    def __init__(
+        self,
+        on_expire: Callable[[list[K]], Awaitable[None]],
+        *,
+        name: str = "deadline-scheduler",
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._on_expire = on_expire
+        self._name = name
+        self._clock = clock
+        self._heap: list[tuple[float, int, K]] = []
+        self._entries: dict[K, tuple[float, int]] = {}
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    def deadline_of(self, key: K) -> float | None:
+        entry = self._entries.get(key)
+        return entry[0] if entry is not None else None
+
+    def schedule(self, key: K, deadline: float) -> None:
+        """`deadline`（`clock` 基準）に期限を設定する。既存の期限は置き換える。"""
+
+        sequence = next(self._sequence)
+        self._entries[key] = (deadline, sequence)
+        heapq.heappush(self._heap, (deadline, sequence, key))
+        if self._heap[0][1] == sequence:
+            self._wakeup.set()
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._compact()
+        self._ensure_running()
+
+    def cancel(self, key: K) -> bool:
+        """期限を取り消す。登録されていた場合は True を返す。"""
+
+        return self._entries.pop(key, None) is not None
+
+    async def close(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    def _ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name=self._name)
+
+    def _compact(self) -> None:
+        self._heap = [
+            (deadline, sequence, key)
+            for key, (deadline, sequence) in self._entries.items()
+        ]
+        heapq.heapify(self._heap)
+
+    def _pop_due(self, now: float) -> list[K]:
+        due: list[K] = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, sequence, key = heapq.heappop(self._heap)
+            if self._entries.get(key) == (deadline, sequence):
+                del self._entries[key]
+                due.append(key)
+        return due
+
+    def _next_deadline(self) -> float | None:
+        while self._heap:
+            deadline, sequence, key = self._heap[0]
+            if self._entries.get(key) == (deadline, sequence):
+                return deadline
+            heapq.heappop(self._heap)
+        return None
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            deadline = self._next_deadline()
+            if deadline is None:
+                await self._wakeup.wait()
+                continue
+
+            delay = deadline - self._clock()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            due = self._pop_due(self._clock())
+            if not due:
+                continue
+            try:
+                await self._on_expire(due)
+            except Exception:
+                LOGGER.exception("期限切れ処理でエラーが発生しました: scheduler=%s", self._name)
+
+
+__all__ = ["DeadlineScheduler"]
@@ -1,22 +1,42 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
 from dataclasses import dataclass
-from typing import Sequence
+from datetime import datetime
+from typing import Awaitable, Callable, Literal, Mapping, Sequence
 
 import discord
 
+from app.database import DatabaseTimeoutError, DatabaseUnavailableError
+from app.deadlines import request_deadline, without_deadline
+from app.metrics import REGISTRY
 from app.repositories import (
     TemporaryVoiceCategory,
     TemporaryVoiceCategoryRepository,
     TemporaryVoiceChannel,
-    TemporaryVoiceChannelRepository,
+    TemporaryVoiceChannelStore,
 )
+from app.services.guild_locks import GuildLockRegistry
+from app.services.scheduling import DeadlineScheduler
+from app.services.temporary_voice_pool import TemporaryVoiceChannelPool
 
 LOGGER = logging.getLogger(__name__)
 CATEGORY_RESET_REASON = "Temporary voice channel category updated"
 TEMP_CHANNEL_CLEANUP_REASON = "Temporary voice channel expired"
 
+TEMP_CHANNEL_CHURN_WINDOW_SECONDS = 60.0
+
+CREATE_SECONDS = REGISTRY.histogram(
+    "temporary_vc_create_duration_seconds", "一時VCの作成にかかった時間", ("source",)
+)
+DELETIONS = REGISTRY.counter(
+    "temporary_vc_deletions_total", "削除した一時VCの数", ("reason",)
+)
+
+TeardownProgress = Callable[[int, int], Awaitable[None]]
+
 
 class TemporaryVoiceError(RuntimeError):
     """一時VC関連の共通エラー。"""
@@ -45,6 +65,32 @@ class CategoryUpdateResult:
     category: TemporaryVoiceCategory
     deleted_channel_ids: list[int]
     missing_channel_ids: list[int]
+    teardown_seconds: float = 0.0
+
+
+@dataclass(slots=True)
+class OrphanCleanupResult:
+    removed: int
+    missing: int
+    elapsed_seconds: float
+
+
+@dataclass(slots=True)
+class ReconcilePage:
+    scanned: int
+    removed: int
+    missing: int
+    next_key: tuple[int, int] | None
+
+
+@dataclass(slots=True)
+class TemporaryVoiceStats:
+    """無人一時VCの削除と、削除直後の作り直し（チャーン）の件数。"""
+
+    deletions_scheduled: int = 0
+    deletions_cancelled: int = 0
+    deletions_executed: int = 0
+    churned_recreations: int = 0
 
 
 class TemporaryVoiceChannelService:
@@ -52,10 +98,87 @@ class TemporaryVoiceChannelService:
         self,
         *,
         category_repo: TemporaryVoiceCategoryRepository,
-        channel_repo: TemporaryVoiceChannelRepository,
+        channel_repo: TemporaryVoiceChannelStore,
+        teardown_concurrency: int = 5,
+        empty_grace_seconds: float = 0.0,
+        clock: Callable[[], float] = time.monotonic,
+        pool: TemporaryVoiceChannelPool | None = None,
     ) -> None:
+        if teardown_concurrency < 1:
+            raise ValueError("teardown_concurrency must be at least 1")
+        if empty_grace_seconds < 0:
+            raise ValueError("empty_grace_seconds must not be negative")
         self._category_repo = category_repo
         self._channel_repo = channel_repo
+        self._teardown_concurrency = teardown_concurrency
+        self._empty_grace_seconds = empty_grace_seconds
+        self._clock = clock
+        self._pending_deletions: DeadlineScheduler[tuple[int, int]] = DeadlineScheduler(
+            self._expire_empty_channels, name="temporary-vc-grace", clock=clock
+        )
+        self._pending_guilds: dict[tuple[int, int], discord.Guild] = {}
+        self._recent_deletions: dict[tuple[int, int], float] = {}
+        self._pool = pool
+        self._pool_warmup: asyncio.Task[None] | None = None
+        self._record_cleanups: set[asyncio.Task[None]] = set()
+        self.guild_locks = GuildLockRegistry()
+        self.stats = TemporaryVoiceStats()
+
+    @property
+    def pending_deletion_count(self) -> int:
+        return len(self._pending_deletions)
+
+    @property
+    def pool(self) -> TemporaryVoiceChannelPool | None:
+        return self._pool
+
+    async def close(self) -> None:
+        """猶予中の削除タイマーと待機VCの補充を止める。未削除のVCは次回起動時の整合性チェックに任せる。"""
+
+        await self._pending_deletions.close()
+        self._pending_guilds.clear()
+        if self._pool_warmup is not None:
+            self._pool_warmup.cancel()
+            await asyncio.gather(self._pool_warmup, return_exceptions=True)
+            self._pool_warmup = None
+        if self._pool is not None:
+            await self._pool.close()
+        if self._record_cleanups:
+            await asyncio.gather(*self._record_cleanups, return_exceptions=True)
+
+    def start_pool_warmup(self, guilds: Sequence[discord.Guild]) -> None:
+        """カテゴリ設定済みのギルドで待機VCを引き継ぎ・補充する処理をバックグラウンドで始める。"""
+
+        if self._pool is None or self._pool_warmup is not None:
+            return
+        self._pool_warmup = asyncio.create_task(
+            self._warm_pool(list(guilds)), name="temporary-vc-pool-warmup"
+        )
+
+    async def _warm_pool(self, guilds: Sequence[discord.Guild]) -> None:
+        assert self._pool is not None
+        # 同時に要求し、リポジトリ側で 1 回の問い合わせにまとめられるようにする
+        categories = await asyncio.gather(
+            *(self._category_repo.get_category(guild.id) for guild in guilds),
+            return_exceptions=True,
+        )
+        for guild, category in zip(guilds, categories):
+            if isinstance(category, BaseException):
+                if not isinstance(category, Exception):
+                    raise category
+                LOGGER.error(
+                    "待機VCの準備でカテゴリ取得に失敗しました: guild=%s",
+                    guild.id,
+                    exc_info=category,
+                )
+                continue
+            if category is None:
+                continue
+            discord_category = guild.get_channel(category.category_id)
+            if not isinstance(discord_category, discord.CategoryChannel):
+                continue
+            self._pool.adopt(guild, discord_category)
+            self._pool.schedule_refill(guild, discord_category)
 
     async def ensure_category(self, guild_id: int) -> TemporaryVoiceCategory | None:
         return await self._category_repo.get_category(guild_id)
@@ -65,9 +188,20 @@ class TemporaryVoiceChannelService:
         guild: discord.Guild,
         category: discord.CategoryChannel,
         executor_id: int,
+        *,
+        progress: TeardownProgress | None = None,
     ) -> CategoryUpdateResult:
-        deleted: list[int] = []
+        """既存の一時VCを並行削除してからカテゴリを登録する。
+
+        削除は `teardown_concurrency` 件ずつに制限し、1 件終わるごとに
+        `progress(完了件数, 対象件数)` を呼ぶ。
+        """
+
+        started = time.perf_counter()
         missing: list[int] = []
+        targets: list[discord.VoiceChannel] = []
+        if self._pool is not None:
+            await self._pool.drain(guild)
 
         for record in await self._channel_repo.list_by_guild(guild.id):
             channel_id = record.channel_id
@@ -76,35 +210,73 @@ class TemporaryVoiceChannelService:
                 continue
             channel = guild.get_channel(channel_id)
             if isinstance(channel, discord.VoiceChannel):
+                targets.append(channel)
+            else:
+                missing.append(channel_id)
+
+        semaphore = asyncio.Semaphore(self._teardown_concurrency)
+        completed = 0
+
+        async def teardown(channel: discord.VoiceChannel) -> int | None:
+            nonlocal completed
+            deleted_id: int | None = None
+            async with semaphore:
                 try:
                     await channel.delete(reason=CATEGORY_RESET_REASON)
                     LOGGER.info("既存の一時VCを削除しました: guild=%s channel=%s", guild.id, channel.id)
-                    deleted.append(channel.id)
+                    deleted_id = channel.id
                 except (discord.Forbidden, discord.HTTPException) as exc:
                     LOGGER.warning(
                         "一時VCの削除に失敗しました: guild=%s channel=%s error=%s",
                         guild.id,
-                        channel_id,
+                        channel.id,
                         exc,
                     )
-            else:
-                missing.append(channel_id)
+            completed += 1
+            if progress is not None:
+                await progress(completed, len(targets))
+            return deleted_id
+
+        results = await asyncio.gather(*(teardown(channel) for channel in targets))
+        deleted = [channel_id for channel_id in results if channel_id is not None]
+        teardown_seconds = time.perf_counter() - started
 
         await self._channel_repo.purge_guild(guild.id)
         stored = await self._category_repo.upsert_category(guild.id, category.id, executor_id)
+        if self._pool is not None:
+            self._pool.schedule_refill(guild, category)
         LOGGER.info(
-            "一時VCカテゴリを登録しました: guild=%s category=%s executor=%s",
+            "一時VCカテゴリを登録しました: guild=%s category=%s executor=%s teardown=%.3fs",
             guild.id,
             category.id,
             executor_id,
+            teardown_seconds,
         )
-        return CategoryUpdateResult(category=stored, deleted_channel_ids=deleted, missing_channel_ids=missing)
+        return CategoryUpdateResult(
+            category=stored,
+            deleted_channel_ids=deleted,
+            missing_channel_ids=missing,
+            teardown_seconds=teardown_seconds,
+        )
+
+    async def create_temporary_channel(
+        self, member: discord.Member, *, deadline: float | None = None
+    ) -> discord.VoiceChannel:
+        """一時VCを作成する。
+
+        `deadline`（`time.monotonic()` 基準）を渡すと、途中の Supabase 呼び出しは残り時間で
+        打ち切られ `DatabaseTimeoutError` になる。
+        """
+
+        with request_deadline(deadline):
+            return await self._create_temporary_channel(member)
 
-    async def create_temporary_channel(self, member: discord.Member) -> discord.VoiceChannel:
+    async def _create_temporary_channel(self, member: discord.Member) -> discord.VoiceChannel:
         guild = member.guild
         if guild is None:
             raise CategoryNotConfiguredError("guild is required")
 
+        started = time.perf_counter()
         category_entity, discord_category = await self._ensure_available_category(guild)
         existing = await self._channel_repo.get_by_owner(guild.id, member.id)
         if existing:
@@ -112,11 +284,17 @@ class TemporaryVoiceChannelService:
 
         try:
             record = await self._channel_repo.create_record(guild.id, member.id, category_entity.category_id)
+        except (DatabaseTimeoutError, DatabaseUnavailableError):
+            # 挿入済みかもしれない行を残すと再試行が「作成済み」になるため消しておく。
+            # 呼び出し元（/tempvc create）では混雑として応答する
+            self._discard_record_later(guild.id, member.id)
+            raise
         except Exception as exc:
             existing_record = await self._channel_repo.get_by_owner(guild.id, member.id)
             if existing_record is not None:
                 raise TemporaryVoiceChannelExistsError(existing_record) from exc
             raise TemporaryVoiceChannelCreationError("failed to create temporary voice channel record") from exc
+        channel: discord.VoiceChannel | None = None
         try:
             channel_name = self._build_channel_name(member)
             overwrites = {
@@ -132,14 +310,30 @@ class TemporaryVoiceChannelService:
                     view_channel=True,
                 )
             }
-            channel = await guild.create_voice_channel(
-                name=channel_name,
-                category=discord_category,
-                overwrites=overwrites,
-                reason="Temporary VC requested",
-            )
+            if self._pool is not None:
+                channel = await self._pool.claim(
+                    guild, discord_category, name=channel_name, overwrites=overwrites
+                )
+            pooled = channel is not None
+            if channel is None:
+                channel = await guild.create_voice_channel(
+                    name=channel_name,
+                    category=discord_category,
+                    overwrites=overwrites,
+                    reason="Temporary VC requested",
+                )
             await self._channel_repo.update_channel_id(guild.id, member.id, channel.id)
-            LOGGER.info("一時VCを作成しました: guild=%s owner=%s channel=%s", guild.id, member.id, channel.id)
+            LOGGER.info(
+                "一時VCを作成しました: guild=%s owner=%s channel=%s pooled=%s",
+                guild.id,
+                member.id,
+                channel.id,
+                pooled,
+            )
+            CREATE_SECONDS.observe(
+                time.perf_counter() - started, ("pool" if pooled else "new",)
+            )
+            self._record_recreation(guild.id, member.id)
             return channel
         except (discord.Forbidden, discord.HTTPException) as exc:
             await self._channel_repo.delete_record(guild.id, member.id)
@@ -150,6 +344,38 @@ class TemporaryVoiceChannelService:
                 exc,
             )
             raise TemporaryVoiceChannelCreationError("failed to create voice channel") from exc
+        except (DatabaseTimeoutError, DatabaseUnavailableError):
+            # channel_id を記録できなかったVCは管理外になり、レコードは再試行を妨げるため両方消しておく
+            self._discard_record_later(guild.id, member.id)
+            if channel is not None:
+                try:
+                    await channel.delete(reason=TEMP_CHANNEL_CLEANUP_REASON)
+                except (discord.Forbidden, discord.HTTPException) as exc:
+                    LOGGER.warning(
+                        "記録できなかった一時VCの削除に失敗しました: guild=%s channel=%s error=%s",
+                        guild.id,
+                        channel.id,
+                        exc,
+                    )
+            raise
+
+    def _discard_record_later(self, guild_id: int, owner_user_id: int) -> None:
+        """作成途中のレコードを締め切りと切り離したバックグラウンドで削除する（失敗時は整合性チェックで回収）。"""
+
+        with without_deadline():
+            task = asyncio.create_task(self._discard_record(guild_id, owner_user_id))
+        self._record_cleanups.add(task)
+        task.add_done_callback(self._record_cleanups.discard)
+
+    async def _discard_record(self, guild_id: int, owner_user_id: int) -> None:
+        try:
+            await self._channel_repo.delete_record(guild_id, owner_user_id)
+        except Exception:
+            LOGGER.exception(
+                "作成途中の一時VCレコードの削除に失敗しました: guild=%s owner=%s",
+                guild_id,
+                owner_user_id,
+            )
 
     async def reset_temporary_channel(self, member: discord.Member) -> None:
         guild = member.guild
@@ -164,39 +390,106 @@ class TemporaryVoiceChannelService:
         await self._channel_repo.delete_record(guild.id, member.id)
         LOGGER.info("一時VCのレコードを削除しました: guild=%s owner=%s", guild.id, member.id)
 
-    async def cleanup_orphaned_channels(self, guilds: Sequence[discord.Guild]) -> None:
+    async def cleanup_orphaned_channels(
+        self, guilds: Sequence[discord.Guild]
+    ) -> OrphanCleanupResult:
+        started = time.perf_counter()
         guild_map = {guild.id: guild for guild in guilds}
+        stale: list[tuple[int, int]] = []
         removed = 0
         missing = 0
-        for record in await self._channel_repo.list_all():
-            guild = guild_map.get(record.guild_id)
-            if guild is None:
-                LOGGER.warning("Bot が所属していないギルドのレコードを削除します: guild=%s", record.guild_id)
-                await self._channel_repo.delete_record(record.guild_id, record.owner_user_id)
-                removed += 1
+        async for record in self._channel_repo.iter_all():
+            reason = self._stale_reason(record, guild_map)
+            if reason is None:
                 continue
-
-            if record.channel_id is None:
-                LOGGER.warning("channel_id 未設定の一時VCを削除します: guild=%s owner=%s", record.guild_id, record.owner_user_id)
-                await self._channel_repo.delete_record(record.guild_id, record.owner_user_id)
+            stale.append((record.guild_id, record.owner_user_id))
+            if reason == "missing":
+                missing += 1
+            else:
                 removed += 1
-                continue
 
-            channel = guild.get_channel(record.channel_id)
-            if channel is None:
-                LOGGER.warning(
-                    "存在しないチャンネルのレコードを削除します: guild=%s channel=%s",
-                    record.guild_id,
-                    record.channel_id,
-                )
-                await self._channel_repo.delete_record(record.guild_id, record.owner_user_id)
-                missing += 1
+        if stale:
+            await self._channel_repo.delete_records(stale)
+        elapsed = time.perf_counter() - started
         LOGGER.info(
-            "一時VCの整合性チェックが完了しました: guilds=%s removed=%s missing=%s",
+            "一時VCの整合性チェックが完了しました: guilds=%s removed=%s missing=%s elapsed=%.3fs",
             len(guilds),
             removed,
             missing,
+            elapsed,
         )
+        return OrphanCleanupResult(removed=removed, missing=missing, elapsed_seconds=elapsed)
+
+    async def reconcile_page(
+        self,
+        guilds: Mapping[int, discord.Guild],
+        *,
+        after: tuple[int, int] | None,
+        limit: int,
+        settled_before: datetime | None = None,
+    ) -> ReconcilePage:
+        """`after` の次から `limit` 件だけ整合性を確認し、不整合なレコードを削除する。
+
+        `settled_before` を渡すと、それ以降に作成・更新されたレコード（作成途中の可能性がある）は対象外にする。
+        """
+
+        records = await self._channel_repo.list_page(after, limit)
+        stale: list[tuple[int, int]] = []
+        removed = 0
+        missing = 0
+        for record in records:
+            reason = self._stale_reason(record, guilds, settled_before=settled_before)
+            if reason is None:
+                continue
+            stale.append((record.guild_id, record.owner_user_id))
+            if reason == "missing":
+                missing += 1
+            else:
+                removed += 1
+
+        if stale:
+            await self._channel_repo.delete_records(stale)
+        next_key = None
+        if len(records) >= limit:
+            last = records[-1]
+            next_key = (last.guild_id, last.owner_user_id)
+        return ReconcilePage(
+            scanned=len(records), removed=removed, missing=missing, next_key=next_key
+        )
+
+    @staticmethod
+    def _stale_reason(
+        record: TemporaryVoiceChannel,
+        guilds: Mapping[int, discord.Guild],
+        *,
+        settled_before: datetime | None = None,
+    ) -> Literal["removed", "missing"] | None:
+        """削除すべきレコードなら理由を返す。"""
+
+        if settled_before is not None and record.last_seen_at > settled_before:
+            return None
+
+        guild = guilds.get(record.guild_id)
+        if guild is None:
+            LOGGER.warning("Bot が所属していないギルドのレコードを削除します: guild=%s", record.guild_id)
+            return "removed"
+
+        if getattr(guild, "unavailable", False):
+            # 障害中のギルドはチャンネル情報が空なので判断を保留する
+            return None
+
+        if record.channel_id is None:
+            LOGGER.warning("channel_id 未設定の一時VCを削除します: guild=%s owner=%s", record.guild_id, record.owner_user_id)
+            return "removed"
+
+        if guild.get_channel(record.channel_id) is None:
+            LOGGER.warning(
+                "存在しないチャンネルのレコードを削除します: guild=%s channel=%s",
+                record.guild_id,
+                record.channel_id,
+            )
+            return "missing"
+        return None
 
     async def handle_voice_state_update(
         self,
@@ -215,13 +508,23 @@ class TemporaryVoiceChannelService:
             getattr(before, "id", None),
             getattr(after, "id", None),
         )
-        if before is not None:
-            await self._cleanup_if_empty(guild, before)
-
-        if after is not None:
-            record = await self._channel_repo.get_by_channel(guild.id, after.id)
-            if record is not None:
-                await self._channel_repo.touch_last_seen(record.guild_id, record.owner_user_id)
+        # 同一ギルドのイベントは到着順に処理し、同じ無人VCを二重に削除しない
+        async with self.guild_locks.hold(guild.id):
+            if before is not None:
+                await self._cleanup_if_empty(guild, before)
+
+            if after is not None:
+                if self._pending_deletions.cancel((guild.id, after.id)):
+                    self._pending_guilds.pop((guild.id, after.id), None)
+                    self.stats.deletions_cancelled += 1
+                    LOGGER.info(
+                        "再入室により一時VCの削除を取り消しました: guild=%s channel=%s",
+                        guild.id,
+                        after.id,
+                    )
+                record = await self._channel_repo.get_by_channel(guild.id, after.id)
+                if record is not None:
+                    await self._channel_repo.touch_last_seen(record.guild_id, record.owner_user_id)
 
     async def _cleanup_if_empty(self, guild: discord.Guild, channel: discord.VoiceChannel) -> None:
         record = await self._channel_repo.get_by_channel(guild.id, channel.id)
@@ -231,9 +534,80 @@ class TemporaryVoiceChannelService:
         if channel.members:
             return
 
+        if self._empty_grace_seconds > 0:
+            key = (guild.id, channel.id)
+            self._pending_deletions.schedule(key, self._clock() + self._empty_grace_seconds)
+            self._pending_guilds[key] = guild
+            self.stats.deletions_scheduled += 1
+            LOGGER.debug(
+                "無人一時VCの削除を予約しました: guild=%s channel=%s grace=%ss",
+                guild.id,
+                channel.id,
+                self._empty_grace_seconds,
+            )
+            return
+
+        await self._delete_empty_channel(guild, record)
+
+    async def expire_idle_channel(
+        self, guild: discord.Guild, owner_user_id: int, *, idle_before: datetime
+    ) -> bool:
+        """`idle_before` 以降に入室のない無人の一時VCを削除する。削除した場合は True。
+
+        入室中のメンバーがいる場合は `last_seen_at` を更新して延命する。
+        """
+
+        async with self.guild_locks.hold(guild.id):
+            record = await self._channel_repo.get_by_owner(guild.id, owner_user_id)
+            if record is None or record.last_seen_at > idle_before:
+                return False
+            channel = guild.get_channel(record.channel_id) if record.channel_id else None
+            if channel is not None and getattr(channel, "members", None):
+                await self._channel_repo.touch_last_seen(guild.id, owner_user_id)
+                return False
+            await self._delete_empty_channel(guild, record, reason="idle")
+            return True
+
+    async def _expire_empty_channels(self, keys: list[tuple[int, int]]) -> None:
+        """猶予期間が過ぎた無人VCを、ギルドのロック内で無人のままか確かめてから削除する。"""
+
+        for key in keys:
+            guild = self._pending_guilds.pop(key, None)
+            if guild is None:
+                continue
+            guild_id, channel_id = key
+            async with self.guild_locks.hold(guild_id):
+                if key in self._pending_deletions:
+                    # ロック待ちの間に退室し直して期限が更新された
+                    continue
+                record = await self._channel_repo.get_by_channel(guild_id, channel_id)
+                if record is None:
+                    continue
+                channel = guild.get_channel(channel_id)
+                if channel is not None and getattr(channel, "members", None):
+                    continue
+                await self._delete_empty_channel(guild, record)
+
+    async def _delete_empty_channel(
+        self, guild: discord.Guild, record: TemporaryVoiceChannel, *, reason: str = "empty"
+    ) -> None:
         await self._delete_channel_if_exists(guild, record, reason=TEMP_CHANNEL_CLEANUP_REASON)
         await self._channel_repo.delete_record(record.guild_id, record.owner_user_id)
-        LOGGER.info("無人一時VCを削除しました: guild=%s channel=%s", guild.id, channel.id)
+        self.stats.deletions_executed += 1
+        DELETIONS.inc(labels=(reason,))
+        self._recent_deletions[(record.guild_id, record.owner_user_id)] = self._clock()
+        LOGGER.info("無人一時VCを削除しました: guild=%s channel=%s", guild.id, record.channel_id)
+
+    def _record_recreation(self, guild_id: int, owner_user_id: int) -> None:
+        now = self._clock()
+        deleted_at = self._recent_deletions.pop((guild_id, owner_user_id), None)
+        if deleted_at is not None and now - deleted_at <= TEMP_CHANNEL_CHURN_WINDOW_SECONDS:
+            self.stats.churned_recreations += 1
+        if len(self._recent_deletions) > 1024:
+            threshold = now - TEMP_CHANNEL_CHURN_WINDOW_SECONDS
+            self._recent_deletions = {
+                key: at for key, at in self._recent_deletions.items() if at >= threshold
+            }
 
     async def _delete_channel_if_exists(
         self,
@@ -295,8 +669,11 @@ class TemporaryVoiceChannelService:
 __all__ = [
     "CategoryNotConfiguredError",
     "CategoryUpdateResult",
+    "OrphanCleanupResult",
+    "ReconcilePage",
     "TemporaryVoiceChannelCreationError",
     "TemporaryVoiceChannelExistsError",
     "TemporaryVoiceChannelNotFoundError",
     "TemporaryVoiceChannelService",
+    "TemporaryVoiceStats",
 ]
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Mapping
+
+import discord
+
+LOGGER = logging.getLogger(__name__)
+WARM_POOL_CHANNEL_NAME = "temporary-vc-standby"
+WARM_POOL_CREATE_REASON = "Temporary VC standby channel prepared"
+WARM_POOL_CLAIM_REASON = "Temporary VC requested"
+WARM_POOL_DRAIN_REASON = "Temporary voice channel category updated"
+WARM_POOL_DISCARD_REASON = "Temporary VC standby channel could not be handed out"
+
+
+@dataclass(slots=True)
+class WarmPoolStats:
+    """待機チャンネルの払い出し・補充件数と払い出し時間。"""
+
+    hits: int = 0
+    misses: int = 0
+    created: int = 0
+    adopted: int = 0
+    refill_failures: int = 0
+    last_claim_seconds: float = 0.0
+    max_claim_seconds: float = 0.0
+    total_claim_seconds: float = 0.0
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+
+class TemporaryVoiceChannelPool:
+    """ギルドごとに非公開の待機VCを `size` 件まで作り置きし、一時VC作成時に払い出す。
+
+    払い出しは名前と権限の変更 (`channel.edit`) 1 回で済むため、VC作成の API 呼び出しを
+    応答経路から外せる。補充はバックグラウンドのタスクで 1 件ずつ行う。
+    """
+
+    def __init__(self, *, size: int) -> None:
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self._size = size
+        self._available: dict[int, deque[int]] = {}
+        self._refills: dict[int, asyncio.Task[None]] = {}
+        self.stats = WarmPoolStats()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def available_count(self, guild_id: int) -> int:
+        return len(self._available.get(guild_id, ()))
+
+    def adopt(self, guild: discord.Guild, category: discord.CategoryChannel) -> None:
+        """再起動前に作り置いた待機VCをカテゴリ内から探して引き継ぐ。
+
+        名前が一致し、`@everyone` から隠されていて、Bot 以外への権限上書きがない
+        チャンネルだけを待機VCとみなす（同名の利用者のVCを払い出さないため）。
+        """
+
+        available = self._available.setdefault(guild.id, deque())
+        for channel in category.voice_channels:
+            if channel.name != WARM_POOL_CHANNEL_NAME or channel.id in available:
+                continue
+            if channel.members or not _is_standby(guild, channel):
+                continue
+            available.append(channel.id)
+            self.stats.adopted += 1
+        if available:
+            LOGGER.info(
+                "待機VCを引き継ぎました: guild=%s category=%s count=%s",
+                guild.id,
+                category.id,
+                len(available),
+            )
+
+    async def claim(
+        self,
+        guild: discord.Guild,
+        category: discord.CategoryChannel,
+        *,
+        name: str,
+        overwrites: Mapping[discord.abc.Snowflake, discord.PermissionOverwrite],
+    ) -> discord.VoiceChannel | None:
+        """待機VCを名前・権限を付け替えて払い出す。在庫がなければ None。"""
+
+        started = time.perf_counter()
+        available = self._available.get(guild.id)
+        channel: discord.VoiceChannel | None = None
+        failed: list[int] = []
+        while available and channel is None:
+            candidate = guild.get_channel(available.popleft())
+            if not isinstance(candidate, discord.VoiceChannel):
+                continue
+            if candidate.category_id != category.id or candidate.members:
+                continue
+            try:
+                channel = await candidate.edit(
+                    name=name, overwrites=overwrites, reason=WARM_POOL_CLAIM_REASON
+                ) or candidate
+            except discord.Forbidden as exc:
+                # 権限不足は再試行しても直らないため、隠したまま残さず削除する
+                LOGGER.warning(
+                    "待機VCの払い出しに失敗しました: guild=%s channel=%s error=%s",
+                    guild.id,
+                    candidate.id,
+                    exc,
+                )
+                await self._discard(guild, candidate)
+            except discord.HTTPException as exc:
+                # 一時的な失敗は在庫に戻し、次の払い出しで再利用する
+                LOGGER.warning(
+                    "待機VCの払い出しに失敗しました: guild=%s channel=%s error=%s",
+                    guild.id,
+                    candidate.id,
+                    exc,
+                )
+                failed.append(candidate.id)
+        if failed:
+            self._available.setdefault(guild.id, deque()).extend(failed)
+
+        self.schedule_refill(guild, category)
+        if channel is None:
+            self.stats.misses += 1
+            return None
+
+        elapsed = time.perf_counter() - started
+        self.stats.hits += 1
+        self.stats.last_claim_seconds = elapsed
+        self.stats.max_claim_seconds = max(self.stats.max_claim_seconds, elapsed)
+        self.stats.total_claim_seconds += elapsed
+        LOGGER.debug(
+            "待機VCを払い出しました: guild=%s channel=%s elapsed=%.3fs",
+            guild.id,
+            channel.id,
+            elapsed,
+        )
+        return channel
+
+    def schedule_refill(self, guild: discord.Guild, category: discord.CategoryChannel) -> None:
+        """在庫が `size` 未満なら補充タスクを起動する（実行中なら何もしない）。"""
+
+        if self.available_count(guild.id) >= self._size:
+            return
+        task = self._refills.get(guild.id)
+        if task is not None and not task.done():
+            return
+        self._refills[guild.id] = asyncio.create_task(
+            self._refill(guild, category), name=f"temporary-vc-pool-{guild.id}"
+        )
+
+    async def drain(self, guild: discord.Guild) -> None:
+        """補充を止め、ギルドの待機VCをすべて削除する（カテゴリ変更時）。"""
+
+        task = self._refills.pop(guild.id, None)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        for channel_id in self._available.pop(guild.id, ()):
+            channel = guild.get_channel(channel_id)
+            if not isinstance(channel, discord.VoiceChannel):
+                continue
+            try:
+                await channel.delete(reason=WARM_POOL_DRAIN_REASON)
+            except (discord.Forbidden, discord.HTTPException) as exc:
+                LOGGER.warning(
+                    "待機VCの削除に失敗しました: guild=%s channel=%s error=%s",
+                    guild.id,
+                    channel_id,
+                    exc,
+                )
+
+    async def _discard(self, guild: discord.Guild, channel: discord.VoiceChannel) -> None:
+        try:
+            await channel.delete(reason=WARM_POOL_DISCARD_REASON)
+        except (discord.Forbidden, discord.HTTPException) as exc:
+            LOGGER.warning(
+                "待機VCの削除に失敗しました: guild=%s channel=%s error=%s",
+                guild.id,
+                channel.id,
+                exc,
+            )
+
+    async def close(self) -> None:
+        tasks = list(self._refills.values())
+        self._refills.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _refill(self, guild: discord.Guild, category: discord.CategoryChannel) -> None:
+        available = self._available.setdefault(guild.id, deque())
+        overwrites: dict[discord.abc.Snowflake, discord.PermissionOverwrite] = {
+            guild.default_role: discord.PermissionOverwrite(view_channel=False, connect=False)
+        }
+        if guild.me is not None:
+            overwrites[guild.me] = discord.PermissionOverwrite(
+                view_channel=True, connect=True, manage_channels=True
+            )
+        while len(available) < self._size:
+            try:
+                channel = await guild.create_voice_channel(
+                    name=WARM_POOL_CHANNEL_NAME,
+                    category=category,
+                    overwrites=overwrites,
+                    reason=WARM_POOL_CREATE_REASON,
+                )
+            except (discord.Forbidden, discord.HTTPException) as exc:
+                # 次の払い出し時に改めて補充する
+                self.stats.refill_failures += 1
+                LOGGER.warning(
+                    "待機VCの補充に失敗しました: guild=%s category=%s error=%s",
+                    guild.id,
+                    category.id,
+                    exc,
+                )
+                return
+            available.append(channel.id)
+            self.stats.created += 1
+        LOGGER.debug("待機VCを補充しました: guild=%s count=%s", guild.id, len(available))
+
+
+def _is_standby(guild: discord.Guild, channel: discord.VoiceChannel) -> bool:
+    """`_refill` が作る待機VCと同じ権限上書き（`@everyone` を隠し、他は Bot のみ）か。"""
+
+    hidden = channel.overwrites_for(guild.default_role)
+    if hidden.view_channel is not False or hidden.connect is not False:
+        return False
+    allowed = {guild.default_role.id}
+    if guild.me is not None:
+        allowed.add(guild.me.id)
+    return all(target.id in allowed for target in channel.overwrites)
+
+
+__all__ = ["TemporaryVoiceChannelPool", "WarmPoolStats", "WARM_POOL_CHANNEL_NAME"]
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Sequence
+
+import discord
+
+from app.services.temporary_voice import TemporaryVoiceChannelService
+
+LOGGER = logging.getLogger(__name__)
+
+# 作成途中（Discord 側の作成待ち・ゲートウェイ反映待ち）のレコードを誤って消さないための猶予
+RECONCILE_SETTLE_SECONDS = 300.0
+RECONCILE_RETRY_SECONDS = 30.0
+
+
+@dataclass(slots=True)
+class ReconcileStats:
+    """バックグラウンド整合性チェックの進捗と検出件数。"""
+
+    passes_completed: int = 0
+    pages: int = 0
+    failed_pages: int = 0
+    scanned: int = 0
+    removed: int = 0
+    missing: int = 0
+    current_pass_scanned: int = 0
+    last_pass_seconds: float = 0.0
+
+
+class TemporaryVoiceReconciler:
+    """`temporary_voice_channels` を小さなページ単位で巡回し、孤立レコードを削除する。
+
+    索引ではなくテーブル（リポジトリ）を巡回するため、索引にない行も検査し、索引へ取り込む。
+    ページ間で `page_delay` 秒待つことで Supabase への負荷を抑え、
+    巡回位置 (`cursor`) を保持するため停止・失敗後も続きから再開する。
+    1 周目は `start()` 直後に、以降は `interval` 秒ごとに実行する（0 で 1 周のみ）。
+    """
+
+    def __init__(
+        self,
+        service: TemporaryVoiceChannelService,
+        guilds: Callable[[], Sequence[discord.Guild]],
+        *,
+        interval: float = 3600.0,
+        page_size: int = 100,
+        page_delay: float = 0.5,
+    ) -> None:
+        if interval < 0:
+            raise ValueError("interval must not be negative")
+        if page_size < 1:
+            raise ValueError("page_size must be at least 1")
+        if page_delay < 0:
+            raise ValueError("page_delay must not be negative")
+        self._service = service
+        self._guilds = guilds
+        self._interval = interval
+        self._page_size = page_size
+        self._page_delay = page_delay
+        self._cursor: tuple[int, int] | None = None
+        self._task: asyncio.Task[None] | None = None
+        self.stats = ReconcileStats()
+
+    @property
+    def cursor(self) -> tuple[int, int] | None:
+        return self._cursor
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """巡回タスクを起動する。起動済みなら何もしない（再接続時の on_ready 用）。"""
+
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run(), name="temporary-vc-reconciler")
+
+    async def stop(self) -> None:
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    async def run_pass(self) -> None:
+        """カーソル位置からテーブル末尾までを 1 周巡回する。"""
+
+        started = time.perf_counter()
+        while True:
+            try:
+                done = await self._step()
+            except Exception:
+                self.stats.failed_pages += 1
+                LOGGER.exception(
+                    "一時VCの整合性チェックに失敗しました。%s 秒後に再開します: cursor=%s",
+                    RECONCILE_RETRY_SECONDS,
+                    self._cursor,
+                )
+                await asyncio.sleep(RECONCILE_RETRY_SECONDS)
+                continue
+            if done:
+                break
+            await asyncio.sleep(self._page_delay)
+
+        elapsed = time.perf_counter() - started
+        self.stats.passes_completed += 1
+        self.stats.last_pass_seconds = elapsed
+        LOGGER.info(
+            "一時VCの整合性チェックが 1 周しました: scanned=%s removed=%s missing=%s elapsed=%.3fs",
+            self.stats.current_pass_scanned,
+            self.stats.removed,
+            self.stats.missing,
+            elapsed,
+        )
+        self.stats.current_pass_scanned = 0
+
+    async def _step(self) -> bool:
+        guilds = {guild.id: guild for guild in self._guilds()}
+        settled_before = datetime.now(timezone.utc) - timedelta(
+            seconds=RECONCILE_SETTLE_SECONDS
+        )
+        page = await self._service.reconcile_page(
+            guilds,
+            after=self._cursor,
+            limit=self._page_size,
+            settled_before=settled_before,
+        )
+        self._cursor = page.next_key
+        self.stats.pages += 1
+        self.stats.scanned += page.scanned
+        self.stats.current_pass_scanned += page.scanned
+        self.stats.removed += page.removed
+        self.stats.missing += page.missing
+        LOGGER.debug(
+            "一時VCの整合性チェック: scanned=%s removed=%s missing=%s cursor=%s",
+            page.scanned,
+            page.removed,
+            page.missing,
+            self._cursor,
+        )
+        return self._cursor is None
+
+    async def _run(self) -> None:
+        while True:
+            await self.run_pass()
+            if self._interval == 0:
+                return
+            await asyncio.sleep(self._interval)
+
+
+__all__ = ["ReconcileStats", "TemporaryVoiceReconciler"]
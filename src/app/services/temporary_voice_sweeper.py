@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+import discord
+
+from app.repositories import TemporaryVoiceChannel
+from app.services.scheduling import DeadlineScheduler
+from app.services.temporary_voice import TemporaryVoiceChannelService
+
+LOGGER = logging.getLogger(__name__)
+IDLE_SWEEP_RETRY_SECONDS = 60.0
+
+
+@dataclass(slots=True)
+class IdleSweepStats:
+    """放置VCの期限切れ処理の件数。"""
+
+    expired: int = 0
+    deleted: int = 0
+    extended: int = 0
+    deferred: int = 0
+    failed: int = 0
+
+
+class IdleChannelSweeper:
+    """`last_seen_at + ttl` を期限とする最小ヒープで放置された一時VCを削除する。
+
+    `CachedTemporaryVoiceChannelStore.add_observer()` で登録すると、レコードの追加・更新・削除の
+    たびに期限を O(log n) で付け替え、次の期限が来た時だけ起きる。期限切れのVCは
+    `concurrency` 件ずつ並行して `TemporaryVoiceChannelService.expire_idle_channel()` に渡す。
+    """
+
+    def __init__(
+        self,
+        service: TemporaryVoiceChannelService,
+        get_guild: Callable[[int], discord.Guild | None],
+        *,
+        ttl: float,
+        concurrency: int = 5,
+    ) -> None:
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self._service = service
+        self._get_guild = get_guild
+        self._ttl = ttl
+        self._concurrency = concurrency
+        self._scheduler: DeadlineScheduler[tuple[int, int]] = DeadlineScheduler(
+            self._expire, name="temporary-vc-idle-sweeper", clock=time.time
+        )
+        self.stats = IdleSweepStats()
+
+    @property
+    def tracked_count(self) -> int:
+        return len(self._scheduler)
+
+    def record_updated(self, record: TemporaryVoiceChannel) -> None:
+        self._scheduler.schedule(
+            (record.guild_id, record.owner_user_id),
+            record.last_seen_at.timestamp() + self._ttl,
+        )
+
+    def record_removed(self, guild_id: int, owner_user_id: int) -> None:
+        self._scheduler.cancel((guild_id, owner_user_id))
+
+    async def close(self) -> None:
+        await self._scheduler.close()
+
+    async def _expire(self, keys: list[tuple[int, int]]) -> None:
+        self.stats.expired += len(keys)
+        idle_before = datetime.now(timezone.utc) - timedelta(seconds=self._ttl)
+        semaphore = asyncio.Semaphore(self._concurrency)
+
+        async def expire(key: tuple[int, int]) -> None:
+            guild_id, owner_user_id = key
+            guild = self._get_guild(guild_id)
+            if guild is None or getattr(guild, "unavailable", False):
+                # 起動直後などギルド情報が揃っていない間は後で確認し直す
+                self.stats.deferred += 1
+                self._scheduler.schedule(key, time.time() + IDLE_SWEEP_RETRY_SECONDS)
+                return
+            async with semaphore:
+                try:
+                    deleted = await self._service.expire_idle_channel(
+                        guild, owner_user_id, idle_before=idle_before
+                    )
+                except Exception:
+                    self.stats.failed += 1
+                    LOGGER.exception(
+                        "放置された一時VCの削除に失敗しました: guild=%s owner=%s",
+                        guild_id,
+                        owner_user_id,
+                    )
+                    self._scheduler.schedule(key, time.time() + IDLE_SWEEP_RETRY_SECONDS)
+                    return
+            if deleted:
+                self.stats.deleted += 1
+                LOGGER.info(
+                    "放置された一時VCを削除しました: guild=%s owner=%s", guild_id, owner_user_id
+                )
+            else:
+                self.stats.extended += 1
+
+        await asyncio.gather(*(expire(key) for key in keys))
+
+
+__all__ = ["IdleChannelSweeper", "IdleSweepStats"]
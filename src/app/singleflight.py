@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+from app.deadlines import without_deadline
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+
+@dataclass(slots=True)
+class SingleFlightStats:
+    """呼び出し回数と、実行中の呼び出しに相乗りした回数。"""
+
+    calls: int = 0
+    collapsed: int = 0
+    invalidated: int = 0
+
+
+class SingleFlight(Generic[K, T]):
+    """同じキーの呼び出しが実行中なら新たに実行せず、その結果（例外を含む）を共有する。
+
+    共有する呼び出しは `request_deadline()` の締め切りを引き継がずに実行するため、
+    呼び出し元ごとの締め切りは待つ側で適用する。呼び出し元がキャンセルされても実行は止めず、
+    相乗りした他の呼び出し元へ結果を返す。
+    """
+
+    def __init__(self) -> None:
+        self._inflight: dict[K, asyncio.Task[T]] = {}
+        self.stats = SingleFlightStats()
+
+    @property
+    def inflight_count(self) -> int:
+        return len(self._inflight)
+
+    def is_inflight(self, key: K) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: K, call: Callable[[], Awaitable[T]]) -> T:
+        self.stats.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            # 最初の呼び出し元の締め切りで相乗りした呼び出し元まで打ち切られないようにする
+            with without_deadline():
+                task = asyncio.ensure_future(call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.stats.collapsed += 1
+        return await asyncio.shield(task)
+
+    def invalidate(self, predicate: Callable[[K], bool]) -> int:
+        """条件に合う実行中の呼び出しを切り離し、以降の呼び出しは新たに実行させる。
+
+        すでに相乗りしている呼び出し元にはそのまま結果を返す。切り離した件数を返す。
+        """
+
+        keys = [key for key in self._inflight if predicate(key)]
+        for key in keys:
+            del self._inflight[key]
+        self.stats.invalidated += len(keys)
+        return len(keys)
+
+    def _forget(self, key: K, task: asyncio.Task[T]) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 呼び出し元が全員キャンセルされた場合でも例外の未取得警告を出さない
+        if not task.cancelled():
+            task.exception()
+
+
+__all__ = ["SingleFlight", "SingleFlightStats"]
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterable, Sequence, TypeVar
+
+from app.metrics import REGISTRY
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# `supabase/schema.sql` と同じテーブル構成。タイムスタンプは UTC の ISO 8601 文字列で持つ。
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS channel_nickname_rules (
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    role_id INTEGER NOT NULL,
+    updated_by INTEGER NOT NULL,
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    PRIMARY KEY (guild_id, channel_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS temporary_vc_categories (
+    guild_id INTEGER PRIMARY KEY,
+    category_id INTEGER NOT NULL,
+    updated_by INTEGER NOT NULL,
+    updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now'))
+);
+
+CREATE TABLE IF NOT EXISTS temporary_voice_channels (
+    guild_id INTEGER NOT NULL,
+    owner_user_id INTEGER NOT NULL,
+    channel_id INTEGER,
+    category_id INTEGER NOT NULL,
+    created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    last_seen_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')),
+    PRIMARY KEY (guild_id, owner_user_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS temporary_voice_channels_channel_idx
+    ON temporary_voice_channels (guild_id, channel_id);
+"""
+# sqlite3 がコネクションごとに保持するプリペアドステートメントの数
+STATEMENT_CACHE_SIZE = 128
+
+QUERY_SECONDS = REGISTRY.histogram(
+    "sqlite_query_duration_seconds", "SQLite クエリの所要時間（実行待ちを含む）", ("operation",)
+)
+
+
+class SQLiteDatabase:
+    """組み込み SQLite への永続化を管理する。
+
+    コネクションは 1 本だけ開き、専用スレッドで直列に実行してイベントループを塞がない。
+    WAL モードで開き、SQL 文は sqlite3 のステートメントキャッシュで使い回す。
+    `synchronous="FULL"` にするとコミットごとに WAL を fsync し、電源断でも失われない。
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        *,
+        schema: str = SQLITE_SCHEMA,
+        synchronous: str = "NORMAL",
+    ) -> None:
+        if synchronous not in {"OFF", "NORMAL", "FULL"}:
+            raise ValueError("synchronous must be OFF, NORMAL or FULL")
+        self._path = str(path)
+        self._schema = schema
+        self._synchronous = synchronous
+        self._connection: sqlite3.Connection | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._connect_lock = asyncio.Lock()
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    async def connect(self) -> None:
+        """データベースを開き、スキーマを作成する。"""
+
+        if self._connection is not None:
+            return
+
+        async with self._connect_lock:
+            if self._connection is not None:
+                return
+
+            LOGGER.info("SQLite (%s) を開きます。", self._path)
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+            try:
+                connection = await asyncio.get_running_loop().run_in_executor(
+                    executor, self._open
+                )
+            except BaseException:
+                executor.shutdown(wait=False)
+                raise
+            self._executor = executor
+            self._connection = connection
+            LOGGER.info("SQLite の初期化が完了しました。")
+
+    async def close(self) -> None:
+        """コネクションをクローズする。"""
+
+        if self._connection is None:
+            return
+
+        async with self._connect_lock:
+            connection, self._connection = self._connection, None
+            executor, self._executor = self._executor, None
+            if connection is None or executor is None:
+                return
+            await asyncio.get_running_loop().run_in_executor(executor, connection.close)
+            executor.shutdown(wait=True)
+            LOGGER.info("SQLite をクローズしました。")
+
+    async def fetch_all(self, sql: str, parameters: Sequence[Any] = ()) -> list[sqlite3.Row]:
+        """SQL を実行し、全行を返す。"""
+
+        return await self._run(sql, lambda connection: connection.execute(sql, parameters).fetchall())
+
+    async def fetch_one(self, sql: str, parameters: Sequence[Any] = ()) -> sqlite3.Row | None:
+        """SQL を実行し、先頭の 1 行を返す。"""
+
+        def fetch(connection: sqlite3.Connection) -> sqlite3.Row | None:
+            cursor = connection.execute(sql, parameters)
+            try:
+                return cursor.fetchone()
+            finally:
+                cursor.close()
+
+        return await self._run(sql, fetch)
+
+    async def execute(self, sql: str, parameters: Sequence[Any] = ()) -> int:
+        """SQL を実行し、変更された行数を返す。"""
+
+        return await self._run(sql, lambda connection: connection.execute(sql, parameters).rowcount)
+
+    async def execute_many(self, sql: str, rows: Iterable[Sequence[Any]]) -> None:
+        """同じ SQL を複数のパラメーターで 1 トランザクション内に実行する。"""
+
+        def run(connection: sqlite3.Connection) -> None:
+            connection.execute("BEGIN")
+            try:
+                connection.executemany(sql, rows)
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+        await self._run(sql, run)
+
+    async def _run(self, sql: str, operation: Callable[[sqlite3.Connection], T]) -> T:
+        connection = self._connection
+        executor = self._executor
+        if connection is None or executor is None:
+            raise RuntimeError("SQLiteDatabase is not initialized. call connect() first.")
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                executor, operation, connection
+            )
+        finally:
+            QUERY_SECONDS.observe(
+                time.perf_counter() - started, (sql.lstrip().split(None, 1)[0].lower(),)
+            )
+
+    def _open(self) -> sqlite3.Connection:
+        if self._path != ":memory:":
+            Path(self._path).parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(
+            self._path,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        try:
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(f"PRAGMA synchronous={self._synchronous}")
+            connection.execute("PRAGMA busy_timeout=5000")
+            connection.executescript(self._schema)
+        except BaseException:
+            connection.close()
+            raise
+        return connection
+
+
+__all__ = ["SQLITE_SCHEMA", "SQLiteDatabase"]
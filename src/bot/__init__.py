@@ -1,4 +1,13 @@
 from .client import BotClient
 from .commands import register_commands
+from .enforcement import EnforcementQueueStats, NicknameEnforcementQueue
+from .permissions import ManageabilityStats, MemberManageabilityCache
 
-__all__ = ["BotClient", "register_commands"]
+__all__ = [
+    "BotClient",
+    "EnforcementQueueStats",
+    "ManageabilityStats",
+    "MemberManageabilityCache",
+    "NicknameEnforcementQueue",
+    "register_commands",
+]
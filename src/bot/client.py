@@ -1,15 +1,28 @@
 from __future__ import annotations
 
+import functools
 import logging
+import time
+from typing import Any, Callable
 
 import discord
 
+from app.metrics import REGISTRY
 from app.repositories import ChannelNicknameRuleStore
-from app.services import TemporaryVoiceChannelService
+from app.services import TemporaryVoiceChannelService, TemporaryVoiceReconciler
+from bot.enforcement import NicknameEnforcementQueue
 from bot.handlers import enforce_nickname_and_role
+from bot.permissions import MemberManageabilityCache
 
 LOGGER = logging.getLogger(__name__)
 
+EVENTS = REGISTRY.counter(
+    "discord_events_total", "ゲートウェイから受け取ったイベント数", ("event", "handled")
+)
+HANDLER_SECONDS = REGISTRY.histogram(
+    "discord_event_handler_duration_seconds", "イベントハンドラーの所要時間", ("event",)
+)
+
 
 class BotClient(discord.Client):
     """Discord Client 拡張。コマンド登録と同期を担当する。"""
@@ -20,11 +33,57 @@ class BotClient(discord.Client):
         intents: discord.Intents | None = None,
         rule_store: ChannelNicknameRuleStore,
         temporary_voice_service: TemporaryVoiceChannelService,
+        nickname_queue: NicknameEnforcementQueue | None = None,
+        member_permissions: MemberManageabilityCache | None = None,
+        reconciler: TemporaryVoiceReconciler | None = None,
     ) -> None:
         super().__init__(intents=intents or discord.Intents.all())
         self.tree = discord.app_commands.CommandTree(self)
         self.rule_store = rule_store
         self.temporary_voice_service = temporary_voice_service
+        self.member_permissions = member_permissions or MemberManageabilityCache()
+        self.nickname_queue = nickname_queue or NicknameEnforcementQueue(
+            functools.partial(
+                enforce_nickname_and_role, permissions=self.member_permissions
+            )
+        )
+        self.reconciler = reconciler or TemporaryVoiceReconciler(
+            temporary_voice_service, lambda: self.guilds
+        )
+        self._is_watched: Callable[[int, int], bool] | None = getattr(
+            rule_store, "is_watched", None
+        )
+
+    def dispatch(self, event: str, /, *args: Any, **kwargs: Any) -> None:
+        # 監視対象外チャンネルの投稿は on_message のコルーチンを生成する前に破棄する
+        if (
+            event == "message"
+            and not self._listeners.get(event)
+            and not self.should_handle_message(args[0])
+        ):
+            EVENTS.inc(labels=(event, "false"))
+            return
+        EVENTS.inc(labels=(event, "true"))
+        super().dispatch(event, *args, **kwargs)
+
+    def should_handle_message(self, message: discord.Message) -> bool:
+        """ニックネーム同期の対象になり得る投稿かを await せずに判定する。"""
+
+        guild = message.guild
+        if guild is None or message.author.bot:
+            return False
+        if self._is_watched is None:
+            return True
+        return self._is_watched(guild.id, message.channel.id)
+
+    async def setup_hook(self) -> None:
+        self.nickname_queue.start()
+
+    async def close(self) -> None:
+        await self.nickname_queue.stop()
+        await self.reconciler.stop()
+        await self.temporary_voice_service.close()
+        await super().close()
 
     async def on_ready(self) -> None:
         if self.user is None:
@@ -34,8 +93,9 @@ class BotClient(discord.Client):
         LOGGER.info("ログイン完了: %s (ID: %s)", self.user, self.user.id)
         await self.tree.sync()
         LOGGER.info("アプリケーションコマンドの同期が完了しました。")
-        await self.temporary_voice_service.cleanup_orphaned_channels(self.guilds)
-        LOGGER.info("一時VCレコードの同期を完了しました。")
+        # 整合性チェックはバックグラウンドで巡回する（再接続時の on_ready では再起動しない）
+        self.reconciler.start()
+        self.temporary_voice_service.start_pool_warmup(self.guilds)
         LOGGER.info("準備完了。")
 
     async def on_message(self, message: discord.Message) -> None:
@@ -44,17 +104,41 @@ class BotClient(discord.Client):
         if message.guild is None or message.author.bot:
             return
 
-        rule = await self.rule_store.get_rule_for_channel(
-            guild_id=message.guild.id,
-            channel_id=message.channel.id,
-        )
-        if rule is None:
-            return
-
+        started = time.perf_counter()
         try:
-            await enforce_nickname_and_role(message, rule)
-        except Exception:  # pragma: no cover - 想定外の例外通知
-            LOGGER.exception("ニックネーム同期処理でエラーが発生しました。")
+            rule = await self.rule_store.get_rule_for_channel(
+                guild_id=message.guild.id,
+                channel_id=message.channel.id,
+            )
+            if rule is None:
+                return
+
+            # REST 呼び出しはワーカー側で実行し、ゲートウェイのディスパッチを塞がない
+            self.nickname_queue.submit(message, rule)
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, ("message",))
+
+    async def on_guild_update(self, before: discord.Guild, after: discord.Guild) -> None:
+        if before.owner_id != after.owner_id:
+            self.member_permissions.invalidate_guild(after.id)
+
+    async def on_guild_role_create(self, role: discord.Role) -> None:
+        self.member_permissions.invalidate_guild(role.guild.id)
+
+    async def on_guild_role_delete(self, role: discord.Role) -> None:
+        self.member_permissions.invalidate_guild(role.guild.id)
+
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role) -> None:
+        self.member_permissions.invalidate_guild(after.guild.id)
+
+    async def on_member_update(self, before: discord.Member, after: discord.Member) -> None:
+        if before.roles == after.roles:
+            return
+        if self.user is not None and after.id == self.user.id:
+            # Bot 自身のロール変更は全メンバーの判定に影響する
+            self.member_permissions.invalidate_guild(after.guild.id)
+        else:
+            self.member_permissions.invalidate_member(after.guild.id, after.id)
 
     async def on_voice_state_update(
         self,
@@ -64,12 +148,15 @@ class BotClient(discord.Client):
     ) -> None:
         before_channel = before.channel if before is not None else None
         after_channel = after.channel if after is not None else None
+        started = time.perf_counter()
         try:
             await self.temporary_voice_service.handle_voice_state_update(
                 member, before_channel, after_channel
             )
         except Exception:  # pragma: no cover - 想定外の例外通知
             LOGGER.exception("一時VCの VoiceState 処理でエラーが発生しました。")
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, ("voice_state_update",))
 
 
 __all__ = ["BotClient"]
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 import logging
+import time
 from typing import TYPE_CHECKING, cast
 
 import discord
 
+from app.database import DatabaseTimeoutError, DatabaseUnavailableError
 from app.repositories import ChannelNicknameRuleStore
 from app.services import (
     CategoryNotConfiguredError,
@@ -19,6 +21,18 @@ if TYPE_CHECKING:
     from bot.client import BotClient
 
 LOGGER = logging.getLogger(__name__)
+TEARDOWN_PROGRESS_INTERVAL = 1.5
+# 応答 (defer を含む) はインタラクション作成から 3 秒以内に返す必要がある
+INTERACTION_RESPONSE_WINDOW = 3.0
+INTERACTION_RESPONSE_MARGIN = 0.5
+
+
+def _interaction_deadline(interaction: discord.Interaction) -> float:
+    """応答期限から余裕分を引いた締め切りを `time.monotonic()` 基準で返す。"""
+
+    elapsed = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+    budget = INTERACTION_RESPONSE_WINDOW - INTERACTION_RESPONSE_MARGIN - max(elapsed, 0.0)
+    return time.monotonic() + budget
 
 
 async def register_commands(
@@ -106,23 +120,40 @@ async def register_commands(
             return
 
         await interaction.response.defer(ephemeral=True)
+        last_reported = 0.0
+
+        async def report_progress(completed: int, total: int) -> None:
+            nonlocal last_reported
+            now = time.monotonic()
+            if completed < total and now - last_reported < TEARDOWN_PROGRESS_INTERVAL:
+                return
+            last_reported = now
+            try:
+                await interaction.edit_original_response(
+                    content=f"🧹 既存の一時VCを削除しています… {completed}/{total}"
+                )
+            except discord.HTTPException:
+                pass
+
         result = await temporary_voice_service.configure_category(
-            guild, category, interaction.user.id
+            guild, category, interaction.user.id, progress=report_progress
         )
         deleted_count = len(result.deleted_channel_ids)
         missing_count = len(result.missing_channel_ids)
         LOGGER.info(
-            "/temporary_vc category: guild=%s executor=%s category=%s deleted=%s missing=%s",
+            "/temporary_vc category: guild=%s executor=%s category=%s deleted=%s missing=%s teardown=%.3fs",
             guild.id,
             interaction.user.id,
             category.id,
             deleted_count,
             missing_count,
+            result.teardown_seconds,
         )
         await interaction.followup.send(
             (
                 f"📁 一時VCカテゴリを {category.mention} に設定しました。\n"
                 f"🧹 削除済み: {deleted_count} 件 / 不存在: {missing_count} 件"
+                f"（{result.teardown_seconds:.1f} 秒）"
             ),
             ephemeral=True,
         )
@@ -144,7 +175,9 @@ async def register_commands(
         member = cast(discord.Member, interaction.user)
 
         try:
-            channel = await temporary_voice_service.create_temporary_channel(member)
+            channel = await temporary_voice_service.create_temporary_channel(
+                member, deadline=_interaction_deadline(interaction)
+            )
         except CategoryNotConfiguredError:
             LOGGER.warning(
                 "一時VCカテゴリが未設定のため作成を拒否しました: guild=%s user=%s",
@@ -182,6 +215,18 @@ async def register_commands(
                 ephemeral=True,
             )
             return
+        except (DatabaseTimeoutError, DatabaseUnavailableError) as exc:
+            LOGGER.warning(
+                "データベースの応答待ちで一時VCを作成できませんでした: guild=%s user=%s error=%s",
+                guild.id,
+                interaction.user.id,
+                exc,
+            )
+            await interaction.response.send_message(
+                "⌛ 混雑のため一時VCを作成できませんでした。時間をおいて再試行してください。",
+                ephemeral=True,
+            )
+            return
 
         await interaction.response.send_message(
             f"✅ 一時VCを作成しました: {channel.mention}",
@@ -0,0 +1,207 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+import discord
+
+from app.repositories import ChannelNicknameRule
+from bot.handlers import enforce_nickname_and_role
+
+LOGGER = logging.getLogger(__name__)
+SUPERSEDED_REACTION = "⏭️"
+
+EnforceHandler = Callable[[discord.Message, ChannelNicknameRule], Awaitable[None]]
+
+
+@dataclass(slots=True)
+class EnforcementQueueStats:
+    """ニックネーム同期キューの処理件数と待ち時間。
+
+    `processed` は成功した件数、`failed` はハンドラーが例外を送出した件数。待ち時間は
+    取り出したすべてのジョブ（`processed + failed`）について集計する。
+    """
+
+    submitted: int = 0
+    coalesced: int = 0
+    processed: int = 0
+    failed: int = 0
+    shed: int = 0
+    max_depth: int = 0
+    last_wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    total_wait_seconds: float = 0.0
+
+    @property
+    def average_wait_seconds(self) -> float:
+        dequeued = self.processed + self.failed
+        if dequeued == 0:
+            return 0.0
+        return self.total_wait_seconds / dequeued
+
+
+@dataclass(slots=True)
+class _EnforcementJob:
+    key: tuple[int, int, int]
+    message: discord.Message
+    rule: ChannelNicknameRule
+    enqueued_at: float = 0.0
+    superseded: list[discord.Message] = field(default_factory=list)
+    timer: asyncio.TimerHandle | None = None
+
+
+class NicknameEnforcementQueue:
+    """`on_message` と `enforce_nickname_and_role` の間に置く有界キューとワーカープール。
+
+    ゲートウェイのディスパッチは `submit` で積むだけで戻り、REST のレート制限待ちは
+    ワーカー側で吸収する。上限 (`max_size`) を超えた場合は最も古いジョブを破棄する。
+
+    同じ (guild, member, 付与ロール) のジョブが未処理のまま残っている間に次の投稿が届いた場合は
+    最新の投稿だけを適用し、置き換えられた投稿には `SUPERSEDED_REACTION` を付ける。
+    `coalesce_window` 秒が指定されると、最初の投稿からその時間だけ適用を遅らせて
+    連投をまとめる。
+    """
+
+    def __init__(
+        self,
+        handler: EnforceHandler = enforce_nickname_and_role,
+        *,
+        workers: int = 2,
+        max_size: int = 256,
+        coalesce_window: float = 0.0,
+    ) -> None:
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        if coalesce_window < 0:
+            raise ValueError("coalesce_window must not be negative")
+        self._handler = handler
+        self._worker_count = workers
+        self._coalesce_window = coalesce_window
+        self._queue: asyncio.Queue[_EnforcementJob] = asyncio.Queue(maxsize=max_size)
+        self._pending: dict[tuple[int, int, int], _EnforcementJob] = {}
+        self._workers: list[asyncio.Task[None]] = []
+        self.stats = EnforcementQueueStats()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def start(self) -> None:
+        """ワーカーを起動する。起動済みの場合は何もしない。"""
+
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._run_worker(), name=f"nickname-sync-worker-{index}")
+            for index in range(self._worker_count)
+        ]
+        LOGGER.info("ニックネーム同期ワーカーを起動しました: workers=%s", self._worker_count)
+
+    async def stop(self) -> None:
+        """ワーカーを停止する。未処理のジョブは破棄される。"""
+
+        workers, self._workers = self._workers, []
+        for job in self._pending.values():
+            if job.timer is not None:
+                job.timer.cancel()
+        self._pending.clear()
+        for worker in workers:
+            worker.cancel()
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
+            LOGGER.info(
+                "ニックネーム同期ワーカーを停止しました: pending=%s", self._queue.qsize()
+            )
+
+    def submit(self, message: discord.Message, rule: ChannelNicknameRule) -> None:
+        """ジョブを積む。同じメンバー・同じロールの未処理ジョブがあれば最新の投稿で置き換える。
+
+        ロールが異なるルールの投稿はまとめず、それぞれのロールを付与する。
+        """
+
+        key = (getattr(message.guild, "id", 0), message.author.id, rule.role_id)
+        self.stats.submitted += 1
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending.superseded.append(pending.message)
+            pending.message = message
+            pending.rule = rule
+            self.stats.coalesced += 1
+            return
+
+        job = _EnforcementJob(key=key, message=message, rule=rule)
+        self._pending[key] = job
+        if self._coalesce_window > 0:
+            job.timer = asyncio.get_running_loop().call_later(
+                self._coalesce_window, self._enqueue, job
+            )
+            return
+        self._enqueue(job)
+
+    def _enqueue(self, job: _EnforcementJob) -> None:
+        job.timer = None
+        # 待ち時間はまとめる時間を除き、キューに入った時点から数える
+        job.enqueued_at = time.monotonic()
+        if self._queue.full():
+            shed = self._queue.get_nowait()
+            self._queue.task_done()
+            self._pending.pop(shed.key, None)
+            self.stats.shed += 1
+            LOGGER.warning(
+                "ニックネーム同期キューが上限に達したため古いジョブを破棄しました: guild=%s user=%s",
+                shed.key[0],
+                shed.key[1],
+            )
+        self._queue.put_nowait(job)
+        self.stats.max_depth = max(self.stats.max_depth, self._queue.qsize())
+
+    async def join(self) -> None:
+        """積まれたジョブがすべて処理されるまで待つ。"""
+
+        await self._queue.join()
+
+    async def _run_worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            if self._pending.get(job.key) is job:
+                del self._pending[job.key]
+            try:
+                wait = time.monotonic() - job.enqueued_at
+                self.stats.last_wait_seconds = wait
+                self.stats.max_wait_seconds = max(self.stats.max_wait_seconds, wait)
+                self.stats.total_wait_seconds += wait
+                await self._handler(job.message, job.rule)
+                self.stats.processed += 1
+                if job.superseded:
+                    await self._mark_superseded(job)
+            except Exception:
+                self.stats.failed += 1
+                LOGGER.exception("ニックネーム同期処理でエラーが発生しました。")
+            finally:
+                self._queue.task_done()
+
+    @staticmethod
+    async def _mark_superseded(job: _EnforcementJob) -> None:
+        LOGGER.info(
+            "連投をまとめてニックネーム同期を適用しました: guild=%s user=%s skipped=%s",
+            job.key[0],
+            job.key[1],
+            len(job.superseded),
+        )
+        for message in job.superseded:
+            try:
+                await message.add_reaction(SUPERSEDED_REACTION)
+            except Exception:
+                pass
+
+
+__all__ = ["EnforcementQueueStats", "NicknameEnforcementQueue", "SUPERSEDED_REACTION"]
@@ -5,16 +5,26 @@ import logging
 import discord
 
 from app.repositories import ChannelNicknameRule
+from bot.permissions import MemberManageabilityCache
 
 LOGGER = logging.getLogger(__name__)
 ROLE_ASSIGN_REASON = "Nickname guard auto assignment"
 NICKNAME_CHANGE_REASON = "Nickname sync from message content"
+NICKNAME_AND_ROLE_REASON = "Nickname sync from message content with role assignment"
 
 
 async def enforce_nickname_and_role(
-    message: discord.Message, rule: ChannelNicknameRule
+    message: discord.Message,
+    rule: ChannelNicknameRule,
+    *,
+    permissions: MemberManageabilityCache | None = None,
 ) -> None:
-    """投稿本文をニックネームとして適用し、指定ロールを付与する。"""
+    """投稿本文をニックネームとして適用し、指定ロールを付与する。
+
+    ニックネームとロールの両方を変更する場合は 1 回の member 更新にまとめ、
+    片方が権限不足で拒否されたときだけ個別の更新へフォールバックする。
+    `permissions` を渡すと、ロール階層上確実に失敗する変更は API を呼ばずに省略する。
+    """
 
     guild = message.guild
     author = message.author
@@ -23,8 +33,9 @@ async def enforce_nickname_and_role(
     if guild is None or not isinstance(author, discord.Member):
         return
 
-    # --- ニックネーム変更 ---
+    # --- 変更内容の算出 ---
     new_nickname = message.content.strip()
+    target_nickname: str | None = None
 
     if not new_nickname:
         LOGGER.warning(
@@ -41,33 +52,15 @@ async def enforce_nickname_and_role(
         except Exception:
             pass
     elif author.display_name != new_nickname:
-        try:
-            await author.edit(nick=new_nickname, reason=NICKNAME_CHANGE_REASON)
-            LOGGER.info(
-                "ニックネームを変更しました: guild=%s user=%s new_nick=%s",
+        if permissions is not None and not permissions.can_edit_nickname(guild, author):
+            LOGGER.debug(
+                "Bot より上位のメンバーのためニックネーム変更を省略しました: guild=%s user=%s",
                 guild.id,
                 author.id,
-                new_nickname,
-            )
-            try:
-                await message.add_reaction("✅")
-            except Exception:
-                pass
-        except discord.Forbidden:
-            LOGGER.warning(
-                "ニックネーム変更権限がありません（対象ユーザーがBotより上位の可能性があります）: guild=%s user=%s",
-                guild.id,
-                author.id,
-            )
-        except discord.HTTPException as exc:
-            LOGGER.error(
-                "ニックネーム変更中にAPIエラーが発生しました: guild=%s user=%s error=%s",
-                guild.id,
-                author.id,
-                exc,
             )
+        else:
+            target_nickname = new_nickname
 
-    # --- ロール付与（既存ロジックを踏襲） ---
     role = guild.get_role(rule.role_id)
     if role is None:
         LOGGER.warning(
@@ -75,11 +68,118 @@ async def enforce_nickname_and_role(
             guild.id,
             rule.role_id,
         )
-        return
+    elif role in author.roles:
+        role = None
+    elif permissions is not None and not permissions.can_assign_role(guild, role):
+        LOGGER.debug(
+            "Bot より上位のロールのため付与を省略しました: guild=%s role=%s user=%s",
+            guild.id,
+            role.id,
+            author.id,
+        )
+        role = None
 
-    if role in author.roles:
+    # --- 適用 ---
+    if target_nickname is not None and role is not None:
+        if await _apply_nickname_and_role(message, guild, author, target_nickname, role):
+            return
+        # どちらかのフィールドが拒否されたため、個別に適用して通る方だけ反映する
+        await _apply_nickname(message, guild, author, target_nickname, permissions)
+        await _assign_role(guild, author, role, permissions)
         return
 
+    if target_nickname is not None:
+        await _apply_nickname(message, guild, author, target_nickname, permissions)
+    if role is not None:
+        await _assign_role(guild, author, role, permissions)
+
+
+async def _apply_nickname_and_role(
+    message: discord.Message,
+    guild: discord.Guild,
+    author: discord.Member,
+    nickname: str,
+    role: discord.Role,
+) -> bool:
+    """ニックネームとロールを 1 回の member 更新で適用する。権限不足時は False を返す。"""
+
+    # @everyone ロール (ID はギルド ID と同一) は roles に含めない
+    roles = [current for current in author.roles if current.id != guild.id]
+    roles.append(role)
+    try:
+        await author.edit(nick=nickname, roles=roles, reason=NICKNAME_AND_ROLE_REASON)
+    except discord.Forbidden:
+        LOGGER.info(
+            "一括更新が拒否されたため個別更新にフォールバックします: guild=%s user=%s",
+            guild.id,
+            author.id,
+        )
+        return False
+    except discord.HTTPException as exc:
+        LOGGER.error(
+            "ニックネーム・ロールの一括更新中にAPIエラーが発生しました: guild=%s user=%s error=%s",
+            guild.id,
+            author.id,
+            exc,
+        )
+        return True
+
+    LOGGER.info(
+        "ニックネームを変更しロールを付与しました: guild=%s user=%s new_nick=%s role=%s",
+        guild.id,
+        author.id,
+        nickname,
+        role.id,
+    )
+    try:
+        await message.add_reaction("✅")
+    except Exception:
+        pass
+    return True
+
+
+async def _apply_nickname(
+    message: discord.Message,
+    guild: discord.Guild,
+    author: discord.Member,
+    nickname: str,
+    permissions: MemberManageabilityCache | None,
+) -> None:
+    try:
+        await author.edit(nick=nickname, reason=NICKNAME_CHANGE_REASON)
+        LOGGER.info(
+            "ニックネームを変更しました: guild=%s user=%s new_nick=%s",
+            guild.id,
+            author.id,
+            nickname,
+        )
+        try:
+            await message.add_reaction("✅")
+        except Exception:
+            pass
+    except discord.Forbidden:
+        LOGGER.warning(
+            "ニックネーム変更権限がありません（対象ユーザーがBotより上位の可能性があります）: guild=%s user=%s",
+            guild.id,
+            author.id,
+        )
+        if permissions is not None:
+            permissions.record_member_forbidden(guild.id, author.id)
+    except discord.HTTPException as exc:
+        LOGGER.error(
+            "ニックネーム変更中にAPIエラーが発生しました: guild=%s user=%s error=%s",
+            guild.id,
+            author.id,
+            exc,
+        )
+
+
+async def _assign_role(
+    guild: discord.Guild,
+    author: discord.Member,
+    role: discord.Role,
+    permissions: MemberManageabilityCache | None,
+) -> None:
     try:
         await author.add_roles(role, reason=ROLE_ASSIGN_REASON)
         LOGGER.info(
@@ -96,6 +196,8 @@ async def enforce_nickname_and_role(
             author.id,
             exc,
         )
+        if permissions is not None and isinstance(exc, discord.Forbidden):
+            permissions.record_role_forbidden(guild.id, role.id)
 
 
 __all__ = ["enforce_nickname_and_role"]
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+import discord
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class _GuildCapabilities:
+    bot_is_owner: bool
+    owner_id: int | None
+    top_role_position: int
+    manage_nicknames: bool
+    manage_roles: bool
+
+
+@dataclass(slots=True)
+class ManageabilityStats:
+    """事前判定で省略した API 呼び出しとキャッシュ無効化の件数。"""
+
+    skipped_nickname_edits: int = 0
+    skipped_role_assignments: int = 0
+    forbidden_recorded: int = 0
+    guild_invalidations: int = 0
+    member_invalidations: int = 0
+
+
+class MemberManageabilityCache:
+    """Bot がメンバーのニックネームやロールを変更できるかをギルドごとに保持する。
+
+    Bot の最上位ロール位置・権限・ギルドオーナーをギルド単位で、判定結果を
+    メンバー単位でキャッシュする。実際に `discord.Forbidden` を受けた対象は
+    `forbidden_ttl` 秒間の負キャッシュに入れ、同じ失敗リクエストを送らない。
+    ロール/メンバー更新イベントで `invalidate_guild` / `invalidate_member` を呼ぶ。
+    """
+
+    def __init__(
+        self,
+        *,
+        forbidden_ttl: float = 600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._forbidden_ttl = forbidden_ttl
+        self._clock = clock
+        self._capabilities: dict[int, _GuildCapabilities] = {}
+        self._verdicts: dict[int, dict[int, bool]] = {}
+        self._forbidden_members: dict[tuple[int, int], float] = {}
+        self._forbidden_roles: dict[tuple[int, int], float] = {}
+        self.stats = ManageabilityStats()
+
+    def can_edit_nickname(self, guild: discord.Guild, member: discord.Member) -> bool:
+        """ニックネーム変更が確実に失敗する場合に False を返す。"""
+
+        if self._is_forbidden(self._forbidden_members, (guild.id, member.id)):
+            self.stats.skipped_nickname_edits += 1
+            return False
+
+        verdicts = self._verdicts.setdefault(guild.id, {})
+        verdict = verdicts.get(member.id)
+        if verdict is None:
+            verdict = self._compute_member_verdict(guild, member)
+            verdicts[member.id] = verdict
+        if not verdict:
+            self.stats.skipped_nickname_edits += 1
+        return verdict
+
+    def can_assign_role(self, guild: discord.Guild, role: discord.Role) -> bool:
+        """ロール付与が確実に失敗する場合に False を返す。"""
+
+        if self._is_forbidden(self._forbidden_roles, (guild.id, role.id)):
+            self.stats.skipped_role_assignments += 1
+            return False
+
+        capabilities = self._get_capabilities(guild)
+        if capabilities is None or capabilities.bot_is_owner:
+            return True
+        allowed = (
+            capabilities.manage_roles
+            and not getattr(role, "managed", False)
+            and role.position < capabilities.top_role_position
+        )
+        if not allowed:
+            self.stats.skipped_role_assignments += 1
+        return allowed
+
+    def record_member_forbidden(self, guild_id: int, member_id: int) -> None:
+        self._forbidden_members[(guild_id, member_id)] = self._clock() + self._forbidden_ttl
+        self.stats.forbidden_recorded += 1
+
+    def record_role_forbidden(self, guild_id: int, role_id: int) -> None:
+        self._forbidden_roles[(guild_id, role_id)] = self._clock() + self._forbidden_ttl
+        self.stats.forbidden_recorded += 1
+
+    def invalidate_guild(self, guild_id: int) -> None:
+        """ロール構成や Bot 自身のロールが変わった場合にギルド全体の判定を破棄する。"""
+
+        self._capabilities.pop(guild_id, None)
+        self._verdicts.pop(guild_id, None)
+        for cache in (self._forbidden_members, self._forbidden_roles):
+            for key in [key for key in cache if key[0] == guild_id]:
+                del cache[key]
+        self.stats.guild_invalidations += 1
+
+    def invalidate_member(self, guild_id: int, member_id: int) -> None:
+        """メンバーのロールが変わった場合にそのメンバーの判定を破棄する。"""
+
+        verdicts = self._verdicts.get(guild_id)
+        if verdicts is not None:
+            verdicts.pop(member_id, None)
+        self._forbidden_members.pop((guild_id, member_id), None)
+        self.stats.member_invalidations += 1
+
+    def _compute_member_verdict(self, guild: discord.Guild, member: discord.Member) -> bool:
+        capabilities = self._get_capabilities(guild)
+        if capabilities is None or capabilities.bot_is_owner:
+            return True
+        if member.id == capabilities.owner_id:
+            return False
+        if not capabilities.manage_nicknames:
+            return False
+        top_role = getattr(member, "top_role", None)
+        if top_role is None:
+            return True
+        return top_role.position < capabilities.top_role_position
+
+    def _get_capabilities(self, guild: discord.Guild) -> _GuildCapabilities | None:
+        capabilities = self._capabilities.get(guild.id)
+        if capabilities is not None:
+            return capabilities
+
+        me = getattr(guild, "me", None)
+        if me is None:
+            # Bot 自身のメンバー情報が未取得の場合は判定せず API に委ねる
+            return None
+        permissions = me.guild_permissions
+        capabilities = _GuildCapabilities(
+            bot_is_owner=guild.owner_id == me.id,
+            owner_id=guild.owner_id,
+            top_role_position=me.top_role.position,
+            manage_nicknames=permissions.manage_nicknames,
+            manage_roles=permissions.manage_roles,
+        )
+        self._capabilities[guild.id] = capabilities
+        return capabilities
+
+    def _is_forbidden(self, cache: dict[tuple[int, int], float], key: tuple[int, int]) -> bool:
+        expires_at = cache.get(key)
+        if expires_at is None:
+            return False
+        if expires_at <= self._clock():
+            del cache[key]
+            return False
+        return True
+
+
+__all__ = ["ManageabilityStats", "MemberManageabilityCache"]
@@ -26,3 +26,22 @@ CREATE TABLE IF NOT EXISTS temporary_voice_channels (
     last_seen_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP,
     PRIMARY KEY (guild_id, owner_user_id)
 );
+
+-- last_seen_at の一括更新（LastSeenFlusher が使う）。存在する行だけを UPDATE し、
+-- 削除済みの行は作り直さない。更新した行数を返す。
+CREATE OR REPLACE FUNCTION touch_temporary_voice_channels(
+    guild_ids BIGINT[],
+    owner_user_ids BIGINT[],
+    seen_at TIMESTAMPTZ[]
+) RETURNS INTEGER
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE temporary_voice_channels AS t
+        SET last_seen_at = k.last_seen_at
+        FROM unnest(guild_ids, owner_user_ids, seen_at) AS k(guild_id, owner_user_id, last_seen_at)
+        WHERE t.guild_id = k.guild_id AND t.owner_user_id = k.owner_user_id
+        RETURNING 1
+    )
+    SELECT count(*)::INTEGER FROM updated;
+$$;
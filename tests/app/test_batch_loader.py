@@ -0,0 +1,102 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+
+import pytest
+from postgrest import AsyncPostgrestClient
+
+from app.batch_loader import BatchLoader
+from app.database import Database, DatabaseTimeoutError
+from app.deadlines import current_deadline, request_deadline
+from app.repositories import TemporaryVoiceCategoryRepository
+
+
+class RecordingLoader:
+    def __init__(self, *, error: Exception | None = None) -> None:
+        self.batches: list[list[int]] = []
+        self.error = error
+
+    async def __call__(self, keys):
+        self.batches.append(list(keys))
+        if self.error is not None:
+            raise self.error
+        return {key: key * 10 for key in keys if key % 2 == 0}
+
+
+@pytest.mark.asyncio
+async def test_lookups_in_one_tick_share_one_batch() -> None:
+    load_many = RecordingLoader()
+    loader = BatchLoader(load_many)
+
+    results = await asyncio.gather(*(loader.load(key) for key in [2, 3, 2, 4]))
+
+    assert results == [20, None, 20, 40]
+    assert load_many.batches == [[2, 3, 4]]
+    assert (loader.stats.loads, loader.stats.batches, loader.stats.max_batch_size) == (4, 1, 3)
+
+    assert await loader.load(6) == 60
+    assert load_many.batches[-1] == [6]
+
+
+@pytest.mark.asyncio
+async def test_window_and_max_batch_size_bound_each_batch() -> None:
+    load_many = RecordingLoader()
+    loader = BatchLoader(load_many, window=0.02, max_batch_size=2)
+
+    first = asyncio.gather(loader.load(1), loader.load(2), loader.load(3))
+    await asyncio.sleep(0)
+    late = asyncio.ensure_future(loader.load(4))
+    await asyncio.gather(first, late)
+
+    assert load_many.batches == [[1, 2], [3, 4]]
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_caller_in_the_batch() -> None:
+    loader = BatchLoader(RecordingLoader(error=RuntimeError("down")))
+
+    results = await asyncio.gather(loader.load(1), loader.load(2), return_exceptions=True)
+
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+
+
+class RecordingDatabase(Database):
+    def __init__(self, rows: list[dict]) -> None:
+        super().__init__("http://localhost", "key")
+        self.rows = rows
+        self.params: list[dict[str, str]] = []
+        self.deadlines: list[float | None] = []
+
+    def table(self, name: str):
+        return AsyncPostgrestClient("http://localhost").from_(name)
+
+    async def execute(self, request) -> list[dict]:
+        self.params.append(dict(request.request.params))
+        self.deadlines.append(current_deadline())
+        return self.rows
+
+
+@pytest.mark.asyncio
+async def test_category_lookups_share_one_in_select_outside_caller_deadlines() -> None:
+    now = datetime.now(timezone.utc).isoformat()
+    database = RecordingDatabase(
+        [{"guild_id": 1, "category_id": 10, "updated_by": 7, "updated_at": now}]
+    )
+    repository = TemporaryVoiceCategoryRepository(database)
+
+    with request_deadline(time.monotonic() + 5):
+        categories = await asyncio.gather(
+            repository.get_category(1), repository.get_category(2), repository.get_category(1)
+        )
+
+    assert [c.category_id if c else None for c in categories] == [10, None, 10]
+    assert database.params == [
+        {"select": "guild_id,category_id,updated_by,updated_at", "guild_id": "in.(1,2)"}
+    ]
+    assert database.deadlines == [None]
+    assert repository.loader.stats.batches == 1
+
+    with request_deadline(time.monotonic() - 1):
+        with pytest.raises(DatabaseTimeoutError):
+            await repository.get_category(3)
+    assert len(database.params) == 1
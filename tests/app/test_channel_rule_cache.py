@@ -0,0 +1,96 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.repositories import CachedChannelNicknameRuleStore, ChannelNicknameRule
+
+
+def _rule(guild_id: int, channel_id: int, role_id: int = 10) -> ChannelNicknameRule:
+    return ChannelNicknameRule(
+        guild_id=guild_id,
+        channel_id=channel_id,
+        role_id=role_id,
+        updated_by=1,
+        updated_at=datetime.now(timezone.utc),
+    )
+
+
+class FakeRuleRepository:
+    def __init__(self, rules: list[ChannelNicknameRule] | None = None) -> None:
+        self.rules = {(rule.guild_id, rule.channel_id): rule for rule in rules or []}
+        self.get_calls: list[tuple[int, int]] = []
+        self.list_calls = 0
+
+    async def list_rules(self) -> list[ChannelNicknameRule]:
+        self.list_calls += 1
+        return list(self.rules.values())
+
+    async def get_rule_for_channel(self, guild_id: int, channel_id: int) -> ChannelNicknameRule | None:
+        self.get_calls.append((guild_id, channel_id))
+        return self.rules.get((guild_id, channel_id))
+
+    async def upsert_rule(
+        self, guild_id: int, channel_id: int, role_id: int, updated_by: int
+    ) -> ChannelNicknameRule:
+        rule = _rule(guild_id, channel_id, role_id)
+        self.rules[(guild_id, channel_id)] = rule
+        return rule
+
+
+@pytest.mark.asyncio
+async def test_loaded_cache_answers_without_repository() -> None:
+    repository = FakeRuleRepository([_rule(1, 100)])
+    store = CachedChannelNicknameRuleStore(repository)
+
+    await store.load()
+
+    assert (await store.get_rule_for_channel(1, 100)).role_id == 10
+    assert await store.get_rule_for_channel(1, 200) is None
+    assert await store.get_rule_for_channel(1, 200) is None
+    assert repository.get_calls == []
+    assert (1, 200) not in store._rules  # 読み込み後は負エントリを溜めない
+    assert store.stats.hits == 3
+    assert store.stats.misses == 0
+
+
+@pytest.mark.asyncio
+async def test_unloaded_cache_keeps_negative_entries() -> None:
+    repository = FakeRuleRepository()
+    store = CachedChannelNicknameRuleStore(repository)
+
+    assert await store.get_rule_for_channel(1, 100) is None
+    assert await store.get_rule_for_channel(1, 100) is None
+
+    assert repository.get_calls == [(1, 100)]
+    assert store.stats.misses == 1
+    assert store.stats.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_upsert_writes_through_and_replaces_negative_entry() -> None:
+    repository = FakeRuleRepository()
+    store = CachedChannelNicknameRuleStore(repository)
+    await store.load()
+    assert await store.get_rule_for_channel(1, 100) is None
+
+    await store.upsert_rule(guild_id=1, channel_id=100, role_id=55, updated_by=9)
+
+    rule = await store.get_rule_for_channel(1, 100)
+    assert rule is not None
+    assert rule.role_id == 55
+    assert (1, 100) in repository.rules
+
+
+@pytest.mark.asyncio
+async def test_is_watched_tracks_loaded_and_upserted_channels() -> None:
+    repository = FakeRuleRepository([_rule(1, 100)])
+    store = CachedChannelNicknameRuleStore(repository)
+    assert store.is_watched(1, 999) is True  # 未ロード時は通常経路へ委ねる
+
+    await store.load()
+    assert store.is_watched(1, 100) is True
+    assert store.is_watched(1, 200) is False
+    assert store.is_watched(2, 100) is False
+
+    await store.upsert_rule(guild_id=2, channel_id=100, role_id=1, updated_by=1)
+    assert store.is_watched(2, 100) is True
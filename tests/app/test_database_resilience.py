@@ -0,0 +1,252 @@
+import asyncio
+import time
+import types
+
+import httpx
+import pytest
+from postgrest import AsyncPostgrestClient
+from postgrest.exceptions import APIError
+
+from app.database import (
+    Database,
+    DatabaseTimeoutError,
+    DatabaseUnavailableError,
+    HttpTransportOptions,
+)
+from app.deadlines import request_deadline
+from app.resilience import CircuitBreaker, CircuitState, RetryPolicy, TimeoutPolicy
+
+
+class ScriptedRequest:
+    """PostgREST のリクエストビルダーを包み、`execute()` の結果を順に返す。"""
+
+    def __init__(self, builder, outcomes: list) -> None:
+        self.request = builder.request
+        self._outcomes = outcomes
+        self.calls = 0
+
+    async def execute(self):
+        self.calls += 1
+        outcome = self._outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return types.SimpleNamespace(data=outcome)
+
+
+def _table():
+    return AsyncPostgrestClient("http://localhost").from_("temporary_voice_channels")
+
+
+def _database(**breaker_options) -> Database:
+    return Database(
+        "http://localhost",
+        "key",
+        retry_policy=RetryPolicy(max_attempts=3, base_delay=0, max_delay=0),
+        circuit_breaker=CircuitBreaker(**breaker_options),
+    )
+
+
+@pytest.mark.asyncio
+async def test_idempotent_request_is_retried_after_transient_errors() -> None:
+    database = _database()
+    request = ScriptedRequest(
+        _table().select("*"),
+        [httpx.ConnectError("reset"), APIError({"code": 503, "message": "busy"}), [{"id": 1}]],
+    )
+
+    assert await database.execute(request) == [{"id": 1}]
+    assert request.calls == 3
+    assert (database.stats.retries, database.stats.failures) == (2, 0)
+
+
+@pytest.mark.asyncio
+async def test_plain_insert_and_client_errors_are_not_retried() -> None:
+    database = _database()
+    insert = ScriptedRequest(_table().insert({"guild_id": 1}), [httpx.ReadTimeout("slow")])
+    with pytest.raises(httpx.ReadTimeout):
+        await database.execute(insert)
+    assert insert.calls == 1
+
+    upsert = ScriptedRequest(
+        _table().upsert({"guild_id": 1}, on_conflict="guild_id"),
+        [httpx.ReadTimeout("slow"), [{"guild_id": 1}]],
+    )
+    assert await database.execute(upsert) == [{"guild_id": 1}]
+
+    select = ScriptedRequest(_table().select("*"), [APIError({"code": "42P01", "message": "missing"})])
+    with pytest.raises(APIError):
+        await database.execute(select)
+    assert select.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_fails_fast_then_recovers_after_probe() -> None:
+    now = 0.0
+    database = _database(failure_threshold=2, reset_timeout=10, clock=lambda: now)
+    failing = ScriptedRequest(_table().select("*"), [httpx.ConnectError("down")] * 2)
+    with pytest.raises(httpx.ConnectError):
+        await database.execute(failing)
+    assert database.circuit_breaker.state is CircuitState.OPEN
+
+    with pytest.raises(DatabaseUnavailableError):
+        await database.execute(ScriptedRequest(_table().select("*"), []))
+    assert database.stats.short_circuited == 1
+
+    now = 11.0
+    assert await database.execute(ScriptedRequest(_table().select("*"), [[]])) == []
+    assert database.circuit_breaker.state is CircuitState.CLOSED
+    stats = database.circuit_breaker.stats
+    assert (stats.opened, stats.half_opened, stats.closed) == (1, 1, 1)
+
+
+class SlowRequest(ScriptedRequest):
+    async def execute(self):
+        self.calls += 1
+        await asyncio.sleep(1)
+
+
+@pytest.mark.asyncio
+async def test_timeouts_follow_policy_and_caller_deadline() -> None:
+    database = Database(
+        "http://localhost",
+        "key",
+        retry_policy=RetryPolicy(max_attempts=1),
+        timeouts=TimeoutPolicy(default=5, overrides={"temporary_voice_channels.select": 0.01}),
+    )
+    select = SlowRequest(_table().select("*"), [])
+    with pytest.raises(DatabaseTimeoutError) as info:
+        await database.execute(select)
+    assert (info.value.table, info.value.operation, info.value.timeout) == (
+        "temporary_voice_channels",
+        "select",
+        0.01,
+    )
+
+    delete = SlowRequest(_table().delete().eq("guild_id", 1), [])
+    with request_deadline(time.monotonic() + 0.2):
+        with pytest.raises(DatabaseTimeoutError):
+            await database.execute(delete)
+    with request_deadline(time.monotonic() - 1):
+        with pytest.raises(DatabaseTimeoutError):
+            await database.execute(delete)
+    assert delete.calls == 1  # 締め切り後は送信しない
+    assert database.stats.timeouts == 3
+    assert database.circuit_breaker.stats.opened == 0
+
+
+@pytest.mark.asyncio
+async def test_connect_hands_tuned_http_client_to_postgrest() -> None:
+    database = Database(
+        "http://127.0.0.1:9",
+        "key",
+        transport=HttpTransportOptions(max_connections=3, keepalive_expiry=0, gzip=False),
+    )
+    await database.connect()
+    try:
+        session = database._require_client().postgrest.session
+        assert session.headers["accept-encoding"] == "identity"
+        pool = session._transport._pool
+        assert (pool._max_connections, pool._max_keepalive_connections) == (3, 0)
+    finally:
+        await database.close()
+    assert session.is_closed
+
+
+class GatedRequest:
+    """`release` がセットされるまで応答を返さないリクエスト。"""
+
+    calls = 0
+
+    def __init__(self, builder, release: asyncio.Event, outcome) -> None:
+        self.request = builder.request
+        self._release = release
+        self._outcome = outcome
+
+    async def execute(self):
+        GatedRequest.calls += 1
+        await self._release.wait()
+        if isinstance(self._outcome, BaseException):
+            raise self._outcome
+        return types.SimpleNamespace(data=self._outcome)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_selects_share_one_request() -> None:
+    database = _database()
+    release = asyncio.Event()
+    GatedRequest.calls = 0
+    rows = [{"guild_id": 1, "channel_id": 2}]
+    same = [
+        GatedRequest(_table().select("*").eq("guild_id", 1).eq("channel_id", 2), release, rows),
+        GatedRequest(_table().select("*").eq("channel_id", 2).eq("guild_id", 1), release, rows),
+        GatedRequest(_table().select("*").eq("guild_id", 1).eq("channel_id", 2), release, rows),
+    ]
+    other = GatedRequest(_table().select("*").eq("guild_id", 1).eq("channel_id", 3), release, [])
+    deletes = [
+        GatedRequest(_table().delete().eq("guild_id", 1), release, []) for _ in range(2)
+    ]
+
+    pending = asyncio.gather(*(database.execute(r) for r in [*same, other, *deletes]))
+    await asyncio.sleep(0)
+    release.set()
+    results = await pending
+
+    assert results[:3] == [rows, rows, rows]
+    assert results[0] is not results[1]
+    assert GatedRequest.calls == 4
+    assert database.reads.stats.collapsed == 2
+    assert database.reads.inflight_count == 0
+
+    failing = asyncio.Event()
+    error = APIError({"code": "42P01", "message": "missing"})
+    gated = [GatedRequest(_table().select("*"), failing, error) for _ in range(2)]
+    pending = asyncio.gather(*(database.execute(r) for r in gated), return_exceptions=True)
+    await asyncio.sleep(0)
+    failing.set()
+    assert await pending == [error, error]
+
+
+@pytest.mark.asyncio
+async def test_writes_detach_inflight_selects_on_the_same_table() -> None:
+    database = _database()
+    release = asyncio.Event()
+    GatedRequest.calls = 0
+    before = asyncio.ensure_future(
+        database.execute(GatedRequest(_table().select("*").eq("guild_id", 1), release, [1]))
+    )
+    await asyncio.sleep(0)
+    await database.execute(ScriptedRequest(_table().delete().eq("guild_id", 1), [[]]))
+
+    # 削除より前に始まった select には相乗りせず、新たに送る
+    after = asyncio.ensure_future(
+        database.execute(GatedRequest(_table().select("*").eq("guild_id", 1), release, []))
+    )
+    await asyncio.sleep(0)
+    release.set()
+    assert (await before, await after) == ([1], [])
+    assert GatedRequest.calls == 2
+    assert database.reads.stats.collapsed == 0
+
+
+@pytest.mark.asyncio
+async def test_shared_select_does_not_inherit_the_first_callers_deadline() -> None:
+    database = _database()
+    release = asyncio.Event()
+    rows = [{"guild_id": 1}]
+
+    async def hurried():
+        with request_deadline(time.monotonic() + 0.2):
+            return await database.execute(
+                GatedRequest(_table().select("*").eq("guild_id", 1), release, rows)
+            )
+
+    first = asyncio.ensure_future(hurried())
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(
+        database.execute(GatedRequest(_table().select("*").eq("guild_id", 1), release, rows))
+    )
+    with pytest.raises(DatabaseTimeoutError):
+        await first
+    release.set()
+    assert await follower == rows
+    assert database.reads.stats.collapsed == 1
@@ -0,0 +1,77 @@
+import asyncio
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.repositories import CachedTemporaryVoiceChannelStore, TemporaryVoiceChannel
+from app.services import IdleChannelSweeper, TemporaryVoiceChannelService
+
+
+def _record(owner_user_id: int, channel_id: int, idle_for: float) -> TemporaryVoiceChannel:
+    seen = datetime.now(timezone.utc) - timedelta(seconds=idle_for)
+    return TemporaryVoiceChannel(
+        guild_id=1,
+        owner_user_id=owner_user_id,
+        channel_id=channel_id,
+        category_id=10,
+        created_at=seen,
+        last_seen_at=seen,
+    )
+
+
+class FakeRepository:
+    def __init__(self, records: list[TemporaryVoiceChannel]) -> None:
+        self.records = {(r.guild_id, r.owner_user_id): r for r in records}
+        self.deleted: list[tuple[int, int]] = []
+
+    async def iter_all(self, page_size: int = 1000):
+        for record in list(self.records.values()):
+            yield record
+
+    async def delete_record(self, guild_id: int, owner_user_id: int) -> None:
+        self.deleted.append((guild_id, owner_user_id))
+        self.records.pop((guild_id, owner_user_id), None)
+
+    async def touch_last_seen(self, guild_id: int, owner_user_id: int) -> None:
+        key = (guild_id, owner_user_id)
+        self.records[key] = replace(self.records[key], last_seen_at=datetime.now(timezone.utc))
+
+
+class FakeChannel:
+    def __init__(self, members: list[object]) -> None:
+        self.members = members
+
+
+class FakeGuild:
+    id = 1
+
+    def __init__(self, channels: dict[int, FakeChannel]) -> None:
+        self.channels = channels
+
+    def get_channel(self, channel_id: int):
+        return self.channels.get(channel_id)
+
+
+@pytest.mark.asyncio
+async def test_sweeper_deletes_idle_empty_channels_and_extends_occupied_ones() -> None:
+    repository = FakeRepository(
+        [
+            _record(10, 100, idle_for=120),  # 無人で期限切れ
+            _record(11, 101, idle_for=120),  # 期限切れだが在室者あり
+            _record(12, 102, idle_for=0),  # 期限前
+        ]
+    )
+    store = CachedTemporaryVoiceChannelStore(repository)
+    await store.load()
+    guild = FakeGuild({100: FakeChannel([]), 101: FakeChannel([object()]), 102: FakeChannel([])})
+    service = TemporaryVoiceChannelService(category_repo=object(), channel_repo=store)
+    sweeper = IdleChannelSweeper(service, lambda guild_id: guild, ttl=60)
+
+    store.add_observer(sweeper)
+    await asyncio.sleep(0.05)
+
+    assert repository.deleted == [(1, 10)]
+    assert (sweeper.stats.deleted, sweeper.stats.extended) == (1, 1)
+    assert sweeper.tracked_count == 2  # 延命した (1, 11) と期限前の (1, 12)
+    await sweeper.close()
@@ -0,0 +1,151 @@
+import asyncio
+import time
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from postgrest.exceptions import APIError
+
+from app.database import DatabaseTimeoutError
+from app.deadlines import request_deadline
+from app.repositories import (
+    CachedTemporaryVoiceChannelStore,
+    LastSeenFlusher,
+    TemporaryVoiceChannel,
+)
+
+
+def _record(owner_user_id: int, *, seconds: int = 0, channel_id: int = 100) -> TemporaryVoiceChannel:
+    base = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return TemporaryVoiceChannel(
+        guild_id=1,
+        owner_user_id=owner_user_id,
+        channel_id=channel_id,
+        category_id=10,
+        created_at=base,
+        last_seen_at=base + timedelta(seconds=seconds),
+    )
+
+
+class FakeWriter:
+    def __init__(self) -> None:
+        self.batches: list[list[TemporaryVoiceChannel]] = []
+        self.touched: list[tuple[int, int]] = []
+        self.fail = False
+
+    async def update_last_seen(self, records) -> None:
+        if self.fail:
+            raise RuntimeError("supabase down")
+        self.batches.append(list(records))
+
+    async def touch_last_seen(self, guild_id, owner_user_id) -> None:
+        self.touched.append((guild_id, owner_user_id))
+
+
+@pytest.mark.asyncio
+async def test_flush_coalesces_touches_per_owner_and_chunks_batches() -> None:
+    writer = FakeWriter()
+    flusher = LastSeenFlusher(writer, interval=60, max_batch_size=2)
+
+    flusher.touch(_record(1, seconds=1))
+    flusher.touch(_record(1, seconds=5))
+    flusher.touch(_record(2))
+    flusher.touch(_record(3))
+    await flusher.flush()
+
+    assert [len(batch) for batch in writer.batches] == [2, 1]
+    latest = {r.owner_user_id: r.last_seen_at.second for batch in writer.batches for r in batch}
+    assert latest[1] == 5
+    assert flusher.pending_count == 0
+    assert flusher.stats.flushed_rows == 3
+    assert flusher.stats.max_batch_size == 2
+
+
+@pytest.mark.asyncio
+async def test_dropped_and_refreshed_entries() -> None:
+    writer = FakeWriter()
+    flusher = LastSeenFlusher(writer, interval=60)
+
+    flusher.touch(_record(1, seconds=5))
+    flusher.touch(_record(2))
+    flusher.drop(1, 2)
+    flusher.refresh(replace(_record(1, seconds=0), channel_id=200))
+    await flusher.flush()
+
+    (batch,) = writer.batches
+    assert [(r.owner_user_id, r.channel_id, r.last_seen_at.second) for r in batch] == [(1, 200, 5)]
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_entries_and_stop_flushes_them() -> None:
+    writer = FakeWriter()
+    writer.fail = True
+    flusher = LastSeenFlusher(writer, interval=60)
+    flusher.touch(_record(1))
+
+    await flusher.flush()
+    assert flusher.pending_count == 1
+    assert flusher.stats.failed_flushes == 1
+
+    writer.fail = False
+    flusher.start()
+    await flusher.stop()
+    assert flusher.pending_count == 0
+    assert len(writer.batches) == 1
+
+
+class SlowWriter(FakeWriter):
+    def __init__(self) -> None:
+        super().__init__()
+        self.release = asyncio.Event()
+
+    async def update_last_seen(self, records) -> None:
+        await self.release.wait()
+        await super().update_last_seen(records)
+
+
+class CreatingRepository:
+    async def create_record(self, guild_id, owner_user_id, category_id):
+        return replace(_record(owner_user_id), guild_id=guild_id, channel_id=None)
+
+
+@pytest.mark.asyncio
+async def test_writes_do_not_wait_for_the_flush_request_and_honour_deadlines() -> None:
+    writer = SlowWriter()
+    flusher = LastSeenFlusher(writer, interval=60)
+    store = CachedTemporaryVoiceChannelStore(CreatingRepository(), flusher=flusher)
+    flusher.touch(_record(1))
+
+    flushing = asyncio.ensure_future(flusher.flush())
+    await asyncio.sleep(0)
+    # 送信中でもロックは空いているため、書き込みは待たされない
+    with request_deadline(time.monotonic() + 1):
+        assert (await store.create_record(1, 2, 10)).owner_user_id == 2
+    writer.release.set()
+    await flushing
+
+    async with flusher.exclusive():
+        with request_deadline(time.monotonic() + 0.05):
+            with pytest.raises(DatabaseTimeoutError):
+                await store.create_record(1, 3, 10)
+
+
+class MissingRpcWriter(FakeWriter):
+    async def update_last_seen(self, records) -> None:
+        raise APIError({"code": "PGRST202", "message": "function not found"})
+
+
+@pytest.mark.asyncio
+async def test_permanent_batch_errors_fall_back_to_row_updates() -> None:
+    writer = MissingRpcWriter()
+    flusher = LastSeenFlusher(writer, interval=60, max_batch_size=1)
+    flusher.touch(_record(1))
+    flusher.touch(_record(2))
+
+    await flusher.flush()
+
+    assert flusher.batching is False
+    assert writer.touched == [(1, 1), (1, 2)]
+    assert flusher.pending_count == 0
+    assert (flusher.stats.failed_flushes, flusher.stats.fallback_rows) == (1, 2)
@@ -0,0 +1,63 @@
+import asyncio
+from dataclasses import dataclass
+
+import pytest
+
+from app.metrics import MetricsRegistry, MetricsServer
+
+
+@dataclass(slots=True)
+class FakeStats:
+    hits: int = 0
+    last_seconds: float = 0.0
+
+
+def test_registry_renders_counters_histograms_and_stats() -> None:
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "requests", ("table",))
+    latency = registry.histogram("latency_seconds", "latency", ("table",), buckets=(0.1, 1.0))
+    stats = FakeStats()
+    registry.register_stats("cache", stats, "cache stats")
+
+    requests.inc(labels=('rules"x',))
+    requests.inc(2, labels=('rules"x',))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        latency.observe(value, ("rules",))
+    stats.hits = 7
+
+    assert registry.counter("requests_total", "requests", ("table",)) is requests
+    assert latency.count(("rules",)) == 4
+    text = registry.render()
+    assert 'requests_total{table="rules\\"x"} 3' in text
+    assert 'latency_seconds_bucket{table="rules",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{table="rules",le="1"} 3' in text
+    assert 'latency_seconds_bucket{table="rules",le="+Inf"} 4' in text
+    assert 'latency_seconds_sum{table="rules"} 3.65' in text
+    assert "# TYPE cache_hits gauge" in text
+    assert "cache_hits 7" in text
+    with pytest.raises(ValueError):
+        requests.inc(-1)
+
+
+@pytest.mark.asyncio
+async def test_metrics_server_serves_prometheus_text() -> None:
+    registry = MetricsRegistry()
+    registry.counter("events_total", "events").inc()
+    server = MetricsServer(registry, host="127.0.0.1", port=0)
+    await server.start()
+    try:
+
+        async def fetch(path: str) -> bytes:
+            reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response
+
+        ok = await fetch("/metrics")
+        assert ok.startswith(b"HTTP/1.1 200 OK")
+        assert b"events_total 1" in ok
+        assert (await fetch("/")).startswith(b"HTTP/1.1 404")
+    finally:
+        await server.close()
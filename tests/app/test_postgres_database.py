@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+import pytest
+
+from app.database import DatabaseTimeoutError
+from app.deadlines import request_deadline
+from app.postgres_database import PostgresDatabase
+
+
+class SlowPool:
+    """asyncpg.Pool の代わりに、渡された timeout を記録して応答を遅らせる。"""
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.timeouts: list[float | None] = []
+
+    async def execute(self, sql, *arguments, timeout=None):
+        self.timeouts.append(timeout)
+        await asyncio.sleep(self.delay)
+        return "DELETE 1"
+
+
+def _database(pool: SlowPool, command_timeout: float) -> PostgresDatabase:
+    database = PostgresDatabase("postgresql://localhost/test", command_timeout=command_timeout)
+    database._pool = pool
+    return database
+
+
+@pytest.mark.asyncio
+async def test_queries_are_bounded_by_the_command_timeout_and_deadline() -> None:
+    sql = "DELETE FROM temporary_voice_channels WHERE guild_id = $1"
+    pool = SlowPool(delay=1)
+    database = _database(pool, command_timeout=0.01)
+    with pytest.raises(DatabaseTimeoutError) as info:
+        await database.execute(sql, 1)
+    assert (info.value.table, info.value.operation, info.value.timeout) == (
+        "temporary_voice_channels",
+        "delete",
+        0.01,
+    )
+
+    database = _database(pool, command_timeout=5)
+    with request_deadline(time.monotonic() + 0.05):
+        with pytest.raises(DatabaseTimeoutError):
+            await database.execute(sql, 1)
+    assert pool.timeouts[-1] is not None and pool.timeouts[-1] <= 0.05
+
+    with request_deadline(time.monotonic() - 1):
+        with pytest.raises(DatabaseTimeoutError):
+            await database.execute(sql, 1)
+    assert len(pool.timeouts) == 2  # 締め切り後は送信しない
+
+    pool.delay = 0
+    assert await database.execute(sql, 1) == "DELETE 1"
+    assert pool.timeouts[-1] == 5
@@ -0,0 +1,45 @@
+import os
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("asyncpg")
+DSN = os.getenv("TEST_POSTGRES_DSN")
+if not DSN:
+    pytest.skip("TEST_POSTGRES_DSN is not set", allow_module_level=True)
+
+from app.postgres_database import PostgresDatabase  # noqa: E402
+from app.repositories import (  # noqa: E402
+    PostgresChannelNicknameRuleRepository,
+    PostgresTemporaryVoiceChannelRepository,
+)
+
+SCHEMA = Path(__file__).resolve().parents[2] / "supabase" / "schema.sql"
+GUILD_ID = 9_000_000_000_000_000_002
+
+
+@pytest.mark.asyncio
+async def test_postgres_repositories_round_trip() -> None:
+    database = PostgresDatabase(DSN, min_size=1, max_size=2)
+    await database.connect()
+    try:
+        await database.execute(SCHEMA.read_text())
+        channels = PostgresTemporaryVoiceChannelRepository(database)
+        await channels.purge_guild(GUILD_ID)
+
+        rules = PostgresChannelNicknameRuleRepository(database)
+        rule = await rules.upsert_rule(GUILD_ID, 10, 100, 7)
+        assert await rules.get_rule_for_channel(GUILD_ID, 10) == rule
+
+        for owner in range(3):
+            await channels.create_record(GUILD_ID, owner, 50)
+        record = await channels.update_channel_id(GUILD_ID, 1, 900)
+        assert await channels.get_by_channel(GUILD_ID, 900) == record
+        page = await channels.list_page((GUILD_ID, 0), 10)
+        assert [r.owner_user_id for r in page if r.guild_id == GUILD_ID] == [1, 2]
+        await channels.delete_records([(GUILD_ID, 0), (GUILD_ID, 2)])
+        assert [r.owner_user_id for r in await channels.list_by_guild(GUILD_ID)] == [1]
+    finally:
+        await database.execute("DELETE FROM channel_nickname_rules WHERE guild_id = $1", GUILD_ID)
+        await database.execute("DELETE FROM temporary_voice_channels WHERE guild_id = $1", GUILD_ID)
+        await database.close()
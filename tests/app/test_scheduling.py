@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+from app.services import DeadlineScheduler
+
+
+@pytest.mark.asyncio
+async def test_scheduler_fires_in_deadline_order_and_honours_cancel() -> None:
+    now = 0.0
+    expired: list[str] = []
+
+    async def on_expire(keys: list[str]) -> None:
+        expired.extend(keys)
+
+    scheduler: DeadlineScheduler[str] = DeadlineScheduler(on_expire, clock=lambda: now)
+    scheduler.schedule("late", 2.0)
+    scheduler.schedule("early", 1.0)
+    scheduler.schedule("cancelled", 1.5)
+    scheduler.schedule("moved", 0.5)
+    scheduler.schedule("moved", 3.0)
+    assert scheduler.cancel("cancelled") is True
+    assert scheduler.cancel("missing") is False
+
+    now = 2.0
+    scheduler.schedule("late", 2.0)  # 同じ期限で再登録しても 1 回だけ発火する
+    await asyncio.sleep(0.01)
+
+    assert expired == ["early", "late"]
+    assert len(scheduler) == 1
+    assert scheduler.deadline_of("moved") == 3.0
+    await scheduler.close()
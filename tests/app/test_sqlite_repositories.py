@@ -0,0 +1,93 @@
+from dataclasses import replace
+from datetime import datetime, timezone
+
+import pytest
+
+from app.repositories import (
+    CachedTemporaryVoiceChannelStore,
+    SQLiteChannelNicknameRuleRepository,
+    SQLiteTemporaryVoiceCategoryRepository,
+    SQLiteTemporaryVoiceChannelRepository,
+)
+from app.sqlite_database import SQLiteDatabase
+
+
+@pytest.mark.asyncio
+async def test_sqlite_rules_and_categories_round_trip(tmp_path) -> None:
+    database = SQLiteDatabase(tmp_path / "bot.sqlite3")
+    await database.connect()
+    try:
+        journal = await database.fetch_one("PRAGMA journal_mode")
+        assert journal[0] == "wal"
+
+        rules = SQLiteChannelNicknameRuleRepository(database)
+        await rules.upsert_rule(1, 10, 100, 7)
+        updated = await rules.upsert_rule(1, 10, 200, 8)
+        assert (updated.role_id, updated.updated_by) == (200, 8)
+        assert updated.updated_at.tzinfo is not None
+        assert await rules.get_rule_for_channel(1, 10) == updated
+        assert await rules.get_rule_for_channel(1, 11) is None
+        assert await rules.list_rules() == [updated]
+
+        categories = SQLiteTemporaryVoiceCategoryRepository(database)
+        await categories.upsert_category(1, 50, 7)
+        category = await categories.upsert_category(1, 51, 7)
+        assert (await categories.get_category(1)) == category
+        await categories.delete_category(1)
+        assert await categories.get_category(1) is None
+    finally:
+        await database.close()
+
+
+@pytest.mark.asyncio
+async def test_sqlite_channel_repository_backs_cached_store(tmp_path) -> None:
+    path = tmp_path / "bot.sqlite3"
+    database = SQLiteDatabase(path)
+    await database.connect()
+    repository = SQLiteTemporaryVoiceChannelRepository(database)
+    for guild_id in (1, 2):
+        for owner in range(5):
+            await repository.create_record(guild_id, owner, 50)
+    record = await repository.update_channel_id(1, 3, 900)
+    assert (await repository.get_by_channel(1, 900)) == record
+    with pytest.raises(ValueError):
+        await repository.update_channel_id(3, 1, 901)
+    with pytest.raises(Exception):
+        await repository.create_record(1, 3, 50)
+
+    keys = [(r.guild_id, r.owner_user_id) async for r in repository.iter_all(page_size=3)]
+    assert keys == sorted(keys) and len(keys) == 10
+    page = await repository.list_page((1, 4), 2)
+    assert [(r.guild_id, r.owner_user_id) for r in page] == [(2, 0), (2, 1)]
+    assert len(await repository.list_by_guild(2)) == 5
+
+    seen = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    await repository.update_last_seen([replace(record, last_seen_at=seen)])
+    assert (await repository.get_by_owner(1, 3)).last_seen_at == seen
+    await repository.delete_records([(2, 0), (2, 1)])
+    deleted = replace(record, guild_id=2, owner_user_id=0, channel_id=None)
+    await repository.update_last_seen([deleted])
+    assert await repository.get_by_owner(2, 0) is None  # 削除済みの行は作り直さない
+    await repository.delete_by_channel(1, 900)
+    await repository.purge_guild(1)
+    await database.close()
+
+    reopened = SQLiteDatabase(path)
+    await reopened.connect()
+    try:
+        store = CachedTemporaryVoiceChannelStore(SQLiteTemporaryVoiceChannelRepository(reopened))
+        await store.load()
+        assert [(r.guild_id, r.owner_user_id) for r in await store.list_all()] == [
+            (2, 2),
+            (2, 3),
+            (2, 4),
+        ]
+
+        # 索引の読み込み後に別経路で作られた行も巡回で見つかり、索引に取り込まれる
+        await SQLiteTemporaryVoiceChannelRepository(reopened).create_record(3, 1, 60)
+        assert await store.get_by_owner(3, 1) is None
+        page = await store.list_page((2, 4), 10)
+        assert [(r.guild_id, r.owner_user_id) for r in page] == [(3, 1)]
+        assert (await store.get_by_owner(3, 1)).category_id == 60
+    finally:
+        await reopened.close()
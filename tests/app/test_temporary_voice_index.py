@@ -0,0 +1,205 @@
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+from postgrest import AsyncPostgrestClient
+
+from app.repositories import (
+    CachedTemporaryVoiceChannelStore,
+    TemporaryVoiceChannel,
+    TemporaryVoiceChannelRepository,
+)
+from app.database import DatabaseTimeoutError
+
+
+def _record(guild_id: int, owner_user_id: int, channel_id: int | None) -> TemporaryVoiceChannel:
+    now = datetime.now(timezone.utc)
+    return TemporaryVoiceChannel(
+        guild_id=guild_id,
+        owner_user_id=owner_user_id,
+        channel_id=channel_id,
+        category_id=10,
+        created_at=now,
+        last_seen_at=now,
+    )
+
+
+class FakeChannelRepository:
+    def __init__(self, records: list[TemporaryVoiceChannel] | None = None) -> None:
+        self.records = {(r.guild_id, r.owner_user_id): r for r in records or []}
+        self.calls: list[str] = []
+
+    async def iter_all(self, page_size: int = 1000):
+        self.calls.append("iter_all")
+        for record in list(self.records.values()):
+            yield record
+
+    async def create_record(self, guild_id: int, owner_user_id: int, category_id: int) -> TemporaryVoiceChannel:
+        self.calls.append("create_record")
+        record = _record(guild_id, owner_user_id, None)
+        self.records[(guild_id, owner_user_id)] = record
+        return record
+
+    async def update_channel_id(self, guild_id: int, owner_user_id: int, channel_id: int) -> TemporaryVoiceChannel:
+        self.calls.append("update_channel_id")
+        record = _record(guild_id, owner_user_id, channel_id)
+        self.records[(guild_id, owner_user_id)] = record
+        return record
+
+    async def get_by_channel(self, guild_id: int, channel_id: int) -> TemporaryVoiceChannel | None:
+        self.calls.append("get_by_channel")
+        return next((r for r in self.records.values() if r.channel_id == channel_id), None)
+
+    async def delete_record(self, guild_id: int, owner_user_id: int) -> None:
+        self.calls.append("delete_record")
+        self.records.pop((guild_id, owner_user_id), None)
+
+    async def purge_guild(self, guild_id: int) -> None:
+        self.calls.append("purge_guild")
+        self.records = {k: v for k, v in self.records.items() if k[0] != guild_id}
+
+    async def touch_last_seen(self, guild_id: int, owner_user_id: int) -> None:
+        self.calls.append("touch_last_seen")
+
+
+@pytest.mark.asyncio
+async def test_loaded_index_answers_lookups_without_repository() -> None:
+    repository = FakeChannelRepository([_record(1, 10, 100), _record(2, 20, 200)])
+    store = CachedTemporaryVoiceChannelStore(repository)
+    await store.load()
+
+    assert (await store.get_by_channel(1, 100)).owner_user_id == 10
+    assert await store.get_by_channel(1, 200) is None  # 別ギルドのチャンネル
+    assert await store.get_by_channel(1, 999) is None
+    assert (await store.get_by_owner(2, 20)).channel_id == 200
+    assert [r.owner_user_id for r in await store.list_by_guild(1)] == [10]
+    assert repository.calls == ["iter_all"]
+
+
+@pytest.mark.asyncio
+async def test_writes_keep_index_consistent() -> None:
+    repository = FakeChannelRepository()
+    store = CachedTemporaryVoiceChannelStore(repository)
+    await store.load()
+
+    await store.create_record(1, 10, 5)
+    assert (await store.get_by_owner(1, 10)).channel_id is None
+
+    await store.update_channel_id(1, 10, 100)
+    assert (await store.get_by_channel(1, 100)).owner_user_id == 10
+
+    await store.update_channel_id(1, 10, 101)
+    assert await store.get_by_channel(1, 100) is None
+    assert (await store.get_by_channel(1, 101)).owner_user_id == 10
+
+    await store.delete_record(1, 10)
+    assert await store.get_by_owner(1, 10) is None
+    assert await store.get_by_channel(1, 101) is None
+
+    await store.create_record(3, 30, 5)
+    await store.update_channel_id(3, 30, 300)
+    await store.purge_guild(3)
+    assert await store.list_all() == []
+
+
+class PagingDatabase:
+    """PostgREST へ送るリクエストを記録し、用意したページを順に返す。"""
+
+    def __init__(self, pages: list[list[dict]]) -> None:
+        self._pages = pages
+        self.params: list[dict[str, str]] = []
+
+    def table(self, name: str):
+        return AsyncPostgrestClient("http://localhost").from_(name)
+
+    async def execute(self, request) -> list[dict]:
+        self.params.append(dict(request.request.params))
+        return self._pages.pop(0)
+
+
+def _row(guild_id: int, owner_user_id: int) -> dict:
+    now = datetime.now(timezone.utc).isoformat()
+    return {
+        "guild_id": guild_id,
+        "owner_user_id": owner_user_id,
+        "channel_id": None,
+        "category_id": 10,
+        "created_at": now,
+        "last_seen_at": now,
+    }
+
+
+@pytest.mark.asyncio
+async def test_iter_all_pages_by_keyset_until_short_page() -> None:
+    database = PagingDatabase([[_row(1, 10), _row(1, 11)], [_row(2, 5)]])
+    repository = TemporaryVoiceChannelRepository(database)
+
+    keys = [(r.guild_id, r.owner_user_id) async for r in repository.iter_all(page_size=2)]
+
+    assert keys == [(1, 10), (1, 11), (2, 5)]
+    first, second = database.params
+    assert (first["order"], first["limit"]) == ("guild_id.asc,owner_user_id.asc", "2")
+    assert "or" not in first
+    assert second["or"] == "(guild_id.gt.1,and(guild_id.eq.1,owner_user_id.gt.11))"
+
+
+class RpcDatabase(PagingDatabase):
+    def __init__(self) -> None:
+        super().__init__([[]])
+        self.rpc_calls: list[tuple[str, dict]] = []
+
+    def rpc(self, name: str, params: dict):
+        self.rpc_calls.append((name, params))
+        return AsyncPostgrestClient("http://localhost").rpc(name, params)
+
+
+@pytest.mark.asyncio
+async def test_update_last_seen_only_updates_existing_rows_via_rpc() -> None:
+    database = RpcDatabase()
+    repository = TemporaryVoiceChannelRepository(database)
+    first, second = _record(1, 10, 100), _record(2, 5, None)
+
+    await repository.update_last_seen([first, second])
+
+    ((name, params),) = database.rpc_calls
+    assert name == "touch_temporary_voice_channels"
+    assert params["guild_ids"] == [1, 2]
+    assert params["owner_user_ids"] == [10, 5]
+    assert params["seen_at"] == [first.last_seen_at.isoformat(), second.last_seen_at.isoformat()]
+
+
+class AmbiguousInsertRepository(FakeChannelRepository):
+    """行は挿入されたが、応答を受け取る前に失敗する。"""
+
+    def __init__(self, error: Exception) -> None:
+        super().__init__()
+        self.error = error
+
+    async def create_record(self, guild_id: int, owner_user_id: int, category_id: int) -> TemporaryVoiceChannel:
+        await super().create_record(guild_id, owner_user_id, category_id)
+        raise self.error
+
+    async def get_by_owner(self, guild_id: int, owner_user_id: int) -> TemporaryVoiceChannel | None:
+        self.calls.append("get_by_owner")
+        return self.records.get((guild_id, owner_user_id))
+
+
+@pytest.mark.asyncio
+async def test_failed_creates_reread_the_table_except_on_timeouts() -> None:
+    repository = AmbiguousInsertRepository(
+        DatabaseTimeoutError("temporary_voice_channels", "insert", 1.0)
+    )
+    store = CachedTemporaryVoiceChannelStore(repository)
+    await store.load()
+
+    # タイムアウトした行は呼び出し元が削除するため、索引には取り込まない
+    with pytest.raises(DatabaseTimeoutError):
+        await store.create_record(1, 10, 50)
+    await asyncio.sleep(0)
+    assert "get_by_owner" not in repository.calls
+    assert await store.get_by_owner(1, 10) is None
+
+    repository.error = ValueError("duplicate key")
+    with pytest.raises(ValueError):
+        await store.create_record(1, 11, 50)
+    assert (await store.get_by_owner(1, 11)) == repository.records[(1, 11)]
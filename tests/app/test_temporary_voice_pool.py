@@ -0,0 +1,137 @@
+import asyncio
+import itertools
+import types
+
+import discord
+import pytest
+
+from app.services import TemporaryVoiceChannelPool
+from app.services.temporary_voice_pool import WARM_POOL_CHANNEL_NAME
+
+
+HIDDEN = discord.PermissionOverwrite(view_channel=False, connect=False)
+
+
+class FakeVoiceChannel(discord.VoiceChannel):
+    def __init__(self, channel_id: int, name: str, category_id: int, overwrites=None) -> None:
+        self.id = channel_id
+        self.name = name
+        self.category_id = category_id
+        self.fake_overwrites = dict(overwrites or {})
+        self.edits: list[dict] = []
+        self.deleted = False
+        self.fail_with: Exception | None = None
+
+    @property
+    def members(self) -> list:
+        return []
+
+    @property
+    def overwrites(self) -> dict:
+        return self.fake_overwrites
+
+    def overwrites_for(self, obj) -> discord.PermissionOverwrite:
+        return self.fake_overwrites.get(obj, discord.PermissionOverwrite())
+
+    async def edit(self, **options):
+        if self.fail_with is not None:
+            raise self.fail_with
+        self.edits.append(options)
+        self.name = options.get("name", self.name)
+        return self
+
+    async def delete(self, *, reason: str | None = None) -> None:
+        self.deleted = True
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int) -> None:
+        self.id = guild_id
+        self.channels: dict[int, FakeVoiceChannel] = {}
+        self.default_role = discord.Object(id=guild_id)
+        self.me = None
+        self._ids = itertools.count(1000)
+
+    def get_channel(self, channel_id: int):
+        return self.channels.get(channel_id)
+
+    async def create_voice_channel(self, *, name, category, overwrites, reason):
+        channel = FakeVoiceChannel(next(self._ids), name, category.id, overwrites)
+        self.channels[channel.id] = channel
+        return channel
+
+
+@pytest.mark.asyncio
+async def test_pool_refills_and_hands_out_hidden_channels() -> None:
+    guild = FakeGuild(1)
+    category = types.SimpleNamespace(id=5, voice_channels=[])
+    pool = TemporaryVoiceChannelPool(size=2)
+
+    pool.schedule_refill(guild, category)
+    await asyncio.sleep(0)
+    assert pool.available_count(1) == 2
+    assert all(c.name == WARM_POOL_CHANNEL_NAME for c in guild.channels.values())
+
+    channel = await pool.claim(guild, category, name="alice", overwrites={})
+    assert channel is not None and channel.name == "alice"
+    assert channel.edits[0]["overwrites"] == {}
+    await asyncio.sleep(0)
+    assert pool.available_count(1) == 2  # 払い出し後に補充される
+
+    other = FakeGuild(2)
+    assert await pool.claim(other, category, name="bob", overwrites={}) is None
+    assert (pool.stats.hits, pool.stats.misses, pool.stats.hit_rate) == (1, 1, 0.5)
+    assert pool.stats.created == 3
+
+    await pool.drain(guild)
+    assert pool.available_count(1) == 0
+    assert sum(c.deleted for c in guild.channels.values()) == 2
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_pool_adopts_standby_channels_left_by_previous_process() -> None:
+    guild = FakeGuild(1)
+    standby = FakeVoiceChannel(10, WARM_POOL_CHANNEL_NAME, 5, {guild.default_role: HIDDEN})
+    regular = FakeVoiceChannel(11, "alice", 5)
+    # 利用者が待機VCと同じ名前を付けたVCは引き継がない
+    renamed = FakeVoiceChannel(
+        12,
+        WARM_POOL_CHANNEL_NAME,
+        5,
+        {guild.default_role: HIDDEN, discord.Object(id=99): discord.PermissionOverwrite()},
+    )
+    guild.channels = {10: standby, 11: regular, 12: renamed}
+    category = types.SimpleNamespace(id=5, voice_channels=[standby, regular, renamed])
+    pool = TemporaryVoiceChannelPool(size=1)
+
+    pool.adopt(guild, category)
+    pool.adopt(guild, category)
+
+    assert pool.available_count(1) == 1
+    assert pool.stats.adopted == 1
+    assert await pool.claim(guild, category, name="bob", overwrites={}) is standby
+    await pool.close()
+
+
+@pytest.mark.asyncio
+async def test_failed_claims_do_not_leak_standby_channels() -> None:
+    guild = FakeGuild(1)
+    flaky = FakeVoiceChannel(10, WARM_POOL_CHANNEL_NAME, 5, {guild.default_role: HIDDEN})
+    forbidden = FakeVoiceChannel(11, WARM_POOL_CHANNEL_NAME, 5, {guild.default_role: HIDDEN})
+    response = types.SimpleNamespace(status=500, reason="error")
+    flaky.fail_with = discord.HTTPException(response, "error")
+    forbidden.fail_with = discord.Forbidden(types.SimpleNamespace(status=403, reason="x"), "x")
+    guild.channels = {10: flaky, 11: forbidden}
+    category = types.SimpleNamespace(id=5, voice_channels=[flaky, forbidden])
+    pool = TemporaryVoiceChannelPool(size=2)
+    pool.adopt(guild, category)
+
+    assert await pool.claim(guild, category, name="alice", overwrites={}) is None
+    # 一時的な失敗は在庫に戻し、権限不足のVCは削除する
+    assert pool.available_count(1) == 1
+    assert forbidden.deleted and not flaky.deleted
+
+    flaky.fail_with = None
+    assert await pool.claim(guild, category, name="alice", overwrites={}) is flaky
+    await pool.close()
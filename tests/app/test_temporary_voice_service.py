@@ -0,0 +1,321 @@
+import asyncio
+import types
+from dataclasses import replace
+from datetime import datetime, timezone
+
+import discord
+import pytest
+
+from app.database import DatabaseTimeoutError
+from app.repositories import TemporaryVoiceChannel
+from app.services import TemporaryVoiceChannelService, TemporaryVoiceReconciler
+
+
+def _record(guild_id: int, owner_user_id: int, channel_id: int | None) -> TemporaryVoiceChannel:
+    now = datetime.now(timezone.utc)
+    return TemporaryVoiceChannel(
+        guild_id=guild_id,
+        owner_user_id=owner_user_id,
+        channel_id=channel_id,
+        category_id=10,
+        created_at=now,
+        last_seen_at=now,
+    )
+
+
+class FakeChannelStore:
+    def __init__(self, records: list[TemporaryVoiceChannel] | None = None) -> None:
+        self.records = {(r.guild_id, r.owner_user_id): r for r in records or []}
+        self.deleted_batches: list[list[tuple[int, int]]] = []
+        self.deleted: list[tuple[int, int]] = []
+        self.touched: list[tuple[int, int]] = []
+
+    async def list_all(self) -> list[TemporaryVoiceChannel]:
+        return list(self.records.values())
+
+    async def iter_all(self, page_size: int = 1000):
+        for record in list(self.records.values()):
+            yield record
+
+    async def list_by_guild(self, guild_id: int) -> list[TemporaryVoiceChannel]:
+        return [r for r in self.records.values() if r.guild_id == guild_id]
+
+    async def get_by_channel(self, guild_id: int, channel_id: int) -> TemporaryVoiceChannel | None:
+        return next(
+            (r for r in self.records.values() if r.guild_id == guild_id and r.channel_id == channel_id),
+            None,
+        )
+
+    async def delete_record(self, guild_id: int, owner_user_id: int) -> None:
+        self.deleted.append((guild_id, owner_user_id))
+        self.records.pop((guild_id, owner_user_id), None)
+
+    async def delete_records(self, keys) -> None:
+        self.deleted_batches.append(list(keys))
+        for key in keys:
+            self.records.pop(key, None)
+
+    async def purge_guild(self, guild_id: int) -> None:
+        self.records = {k: v for k, v in self.records.items() if k[0] != guild_id}
+
+    async def touch_last_seen(self, guild_id: int, owner_user_id: int) -> None:
+        self.touched.append((guild_id, owner_user_id))
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int, channels: dict[int, object] | None = None) -> None:
+        self.id = guild_id
+        self.channels = channels or {}
+
+    def get_channel(self, channel_id: int):
+        return self.channels.get(channel_id)
+
+
+def _service(store: FakeChannelStore) -> TemporaryVoiceChannelService:
+    return TemporaryVoiceChannelService(category_repo=types.SimpleNamespace(), channel_repo=store)
+
+
+@pytest.mark.asyncio
+async def test_cleanup_orphaned_channels_deletes_stale_rows_in_one_batch() -> None:
+    store = FakeChannelStore(
+        [
+            _record(1, 10, 100),  # 存在するチャンネル
+            _record(1, 11, 101),  # チャンネルが消えている
+            _record(1, 12, None),  # channel_id 未設定
+            _record(2, 20, 200),  # Bot が所属していないギルド
+        ]
+    )
+    guild = FakeGuild(1, {100: object()})
+
+    result = await _service(store).cleanup_orphaned_channels([guild])
+
+    assert sorted(store.deleted_batches[0]) == [(1, 11), (1, 12), (2, 20)]
+    assert len(store.deleted_batches) == 1
+    assert store.deleted == []
+    assert (result.removed, result.missing) == (2, 1)
+    assert result.elapsed_seconds >= 0
+    assert list(store.records) == [(1, 10)]
+
+
+class FakeVoiceChannel(discord.VoiceChannel):
+    def __init__(self, channel_id: int, tracker: dict[str, int]) -> None:
+        self.id = channel_id
+        self._tracker = tracker
+
+    @property
+    def members(self) -> list:
+        return []
+
+    async def delete(self, *, reason: str | None = None) -> None:
+        self._tracker["active"] += 1
+        self._tracker["peak"] = max(self._tracker["peak"], self._tracker["active"])
+        await asyncio.sleep(0.01)
+        self._tracker["active"] -= 1
+
+
+@pytest.mark.asyncio
+async def test_configure_category_tears_down_with_bounded_concurrency() -> None:
+    tracker = {"active": 0, "peak": 0}
+    channels = {100 + index: FakeVoiceChannel(100 + index, tracker) for index in range(6)}
+    store = FakeChannelStore([_record(1, index, 100 + index) for index in range(6)] + [_record(1, 99, 555)])
+    guild = FakeGuild(1, channels)
+    category_repo = types.SimpleNamespace()
+
+    async def upsert_category(guild_id: int, category_id: int, updated_by: int):
+        return (guild_id, category_id, updated_by)
+
+    category_repo.upsert_category = upsert_category
+    service = TemporaryVoiceChannelService(
+        category_repo=category_repo, channel_repo=store, teardown_concurrency=2
+    )
+    progress: list[tuple[int, int]] = []
+
+    async def report(completed: int, total: int) -> None:
+        progress.append((completed, total))
+
+    result = await service.configure_category(
+        guild, types.SimpleNamespace(id=5), executor_id=42, progress=report
+    )
+
+    assert sorted(result.deleted_channel_ids) == sorted(channels)
+    assert result.missing_channel_ids == [555]
+    assert tracker["peak"] == 2
+    assert progress[-1] == (6, 6)
+    assert result.teardown_seconds > 0
+    assert store.records == {}
+
+
+@pytest.mark.asyncio
+async def test_voice_events_in_same_guild_are_serialized() -> None:
+    tracker = {"active": 0, "peak": 0}
+    channel = FakeVoiceChannel(100, tracker)
+    store = FakeChannelStore([_record(1, 10, 100)])
+    guild = FakeGuild(1, {100: channel})
+    service = _service(store)
+    member = types.SimpleNamespace(id=10, guild=guild)
+
+    await asyncio.gather(
+        service.handle_voice_state_update(member, channel, None),
+        service.handle_voice_state_update(member, channel, None),
+    )
+
+    assert store.deleted == [(1, 10)]
+    assert tracker["peak"] == 1
+    assert service.guild_locks.stats.acquisitions == 2
+    assert service.guild_locks.stats.contended == 1
+    assert service.guild_locks.active_count == 0
+
+
+class OccupiableVoiceChannel(FakeVoiceChannel):
+    def __init__(self, channel_id: int, tracker: dict[str, int]) -> None:
+        super().__init__(channel_id, tracker)
+        self.occupants: list[object] = []
+
+    @property
+    def members(self) -> list:
+        return self.occupants
+
+
+@pytest.mark.asyncio
+async def test_empty_channel_deletion_waits_for_grace_period_and_rejoin_cancels() -> None:
+    tracker = {"active": 0, "peak": 0}
+    channel = OccupiableVoiceChannel(100, tracker)
+    store = FakeChannelStore([_record(1, 10, 100)])
+    guild = FakeGuild(1, {100: channel})
+    service = TemporaryVoiceChannelService(
+        category_repo=types.SimpleNamespace(), channel_repo=store, empty_grace_seconds=0.05
+    )
+    member = types.SimpleNamespace(id=10, guild=guild)
+
+    await service.handle_voice_state_update(member, channel, None)
+    assert store.deleted == []
+    assert service.pending_deletion_count == 1
+
+    channel.occupants.append(member)
+    await service.handle_voice_state_update(member, None, channel)
+    assert service.pending_deletion_count == 0
+    assert service.stats.deletions_cancelled == 1
+
+    channel.occupants.clear()
+    await service.handle_voice_state_update(member, channel, None)
+    await asyncio.sleep(0.1)
+
+    assert store.deleted == [(1, 10)]
+    assert (service.stats.deletions_scheduled, service.stats.deletions_executed) == (2, 1)
+    await service.close()
+
+
+class PagedChannelStore(FakeChannelStore):
+    def __init__(self, records: list[TemporaryVoiceChannel]) -> None:
+        super().__init__(records)
+        self.pages: list[tuple[tuple[int, int] | None, int]] = []
+
+    async def list_page(self, after, limit: int) -> list[TemporaryVoiceChannel]:
+        self.pages.append((after, limit))
+        keys = sorted(key for key in self.records if after is None or key > after)[:limit]
+        return [self.records[key] for key in keys]
+
+
+@pytest.mark.asyncio
+async def test_reconciler_walks_table_in_pages_and_skips_recent_rows() -> None:
+    old = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    records = [
+        _record(1, 10, 100),
+        _record(1, 11, 101),
+        _record(1, 12, None),
+        _record(2, 20, 200),
+        _record(3, 30, 300),
+    ]
+    records = [
+        r if r.owner_user_id == 30 else replace(r, created_at=old, last_seen_at=old)
+        for r in records
+    ]
+    store = PagedChannelStore(records)
+    guild = FakeGuild(1, {100: object()})
+    reconciler = TemporaryVoiceReconciler(
+        _service(store), lambda: [guild], interval=0, page_size=2, page_delay=0
+    )
+
+    reconciler.start()
+    await asyncio.wait_for(reconciler._task, timeout=1)
+
+    assert store.pages == [(None, 2), ((1, 11), 2), ((2, 20), 2)]
+    assert sorted(store.records) == [(1, 10), (3, 30)]  # (3, 30) は作成直後のため保留
+    assert (reconciler.stats.removed, reconciler.stats.missing) == (2, 1)
+    assert (reconciler.stats.scanned, reconciler.stats.passes_completed) == (5, 1)
+    assert reconciler.cursor is None
+
+
+class FakeCategoryChannel(discord.CategoryChannel):
+    def __init__(self, category_id: int) -> None:
+        self.id = category_id
+
+
+class FlakyCreateStore(FakeChannelStore):
+    """最初の `update_channel_id` だけがタイムアウトする。"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.fail_updates = 1
+
+    async def get_by_owner(self, guild_id: int, owner_user_id: int):
+        return self.records.get((guild_id, owner_user_id))
+
+    async def create_record(self, guild_id: int, owner_user_id: int, category_id: int):
+        record = _record(guild_id, owner_user_id, None)
+        self.records[(guild_id, owner_user_id)] = record
+        return record
+
+    async def update_channel_id(self, guild_id: int, owner_user_id: int, channel_id: int):
+        if self.fail_updates:
+            self.fail_updates -= 1
+            raise DatabaseTimeoutError("temporary_voice_channels", "update", 1.0)
+        record = replace(self.records[(guild_id, owner_user_id)], channel_id=channel_id)
+        self.records[(guild_id, owner_user_id)] = record
+        return record
+
+
+class FakeMember:
+    def __init__(self, guild, member_id: int) -> None:
+        self.guild = guild
+        self.id = member_id
+        self.display_name = "alice"
+
+
+class CreatingGuild(FakeGuild):
+    def __init__(self, guild_id: int) -> None:
+        super().__init__(guild_id, {10: FakeCategoryChannel(10)})
+        self.created: list[FakeVoiceChannel] = []
+        self.tracker = {"active": 0, "peak": 0}
+
+    async def create_voice_channel(self, *, name, category, overwrites, reason):
+        channel = FakeVoiceChannel(500 + len(self.created), self.tracker)
+        self.created.append(channel)
+        return channel
+
+
+@pytest.mark.asyncio
+async def test_create_can_be_retried_after_a_database_timeout() -> None:
+    store = FlakyCreateStore()
+    category = types.SimpleNamespace(guild_id=1, category_id=10)
+    categories = types.SimpleNamespace(get_category=lambda guild_id: _resolved(category))
+    service = TemporaryVoiceChannelService(category_repo=categories, channel_repo=store)
+    guild = CreatingGuild(1)
+    member = FakeMember(guild, 7)
+    service._recent_deletions[(1, 7)] = service._clock()  # 直前に削除された扱いにする
+
+    with pytest.raises(DatabaseTimeoutError):
+        await service.create_temporary_channel(member)
+    await service.close()  # 作成途中のレコードの削除を待つ
+    assert store.deleted == [(1, 7)]
+    assert guild.tracker["peak"] == 1  # 記録できなかったVCも削除済み
+    assert service.stats.churned_recreations == 0  # 失敗した作成は作り直しに数えない
+
+    channel = await service.create_temporary_channel(member)
+    assert channel is guild.created[-1]
+    assert store.records[(1, 7)].channel_id == channel.id
+    assert service.stats.churned_recreations == 1
+
+
+async def _resolved(value):
+    return value
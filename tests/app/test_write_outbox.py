@@ -0,0 +1,165 @@
+import asyncio
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+from app.repositories import (
+    OutboxTemporaryVoiceCategoryRepository,
+    OutboxTemporaryVoiceChannelRepository,
+    TemporaryVoiceChannel,
+    WriteOutbox,
+)
+from app.repositories.outbox import is_retryable_outbox_error
+from app.resilience import RetryPolicy
+
+
+class FakeChannelRepository:
+    def __init__(self) -> None:
+        self.calls: list[tuple] = []
+        self.down = False
+
+    async def delete_records(self, keys) -> None:
+        if self.down:
+            raise httpx.ConnectError("supabase down")
+        self.calls.append(("delete_records", sorted(keys)))
+
+    async def create_record(self, guild_id, owner_user_id, category_id):
+        if self.down:
+            raise httpx.ConnectError("supabase down")
+        self.calls.append(("create_record", guild_id, owner_user_id))
+
+    async def list_page(self, after, limit):
+        keys = [(1, owner) for owner in range(6)]
+        keys = [key for key in keys if after is None or key > after][:limit]
+        self.calls.append(("list_page", after, limit))
+        return [_record(*key) for key in keys]
+
+    async def update_last_seen(self, records) -> None:
+        self.calls.append(("update_last_seen", len(records)))
+
+
+def _record(guild_id: int, owner_user_id: int) -> TemporaryVoiceChannel:
+    now = datetime.now(timezone.utc)
+    return TemporaryVoiceChannel(guild_id, owner_user_id, None, 50, now, now)
+
+
+class FakeCategoryRepository:
+    def __init__(self) -> None:
+        self.rows: dict[int, int] = {}
+        self.fail_with: Exception | None = None
+
+    async def upsert_category(self, guild_id, category_id, updated_by):
+        if self.fail_with is not None:
+            raise self.fail_with
+        self.rows[guild_id] = category_id
+
+    async def get_category(self, guild_id):
+        return self.rows.get(guild_id)
+
+
+@pytest.mark.asyncio
+async def test_deletes_return_after_append_and_are_sent_in_one_batch(tmp_path) -> None:
+    remote = FakeChannelRepository()
+    remote.down = True
+    outbox = WriteOutbox(tmp_path / "outbox.sqlite3", retry_policy=RetryPolicy(base_delay=0))
+    channels = OutboxTemporaryVoiceChannelRepository(remote, outbox)
+    await outbox.open()
+
+    await asyncio.gather(channels.delete_record(1, 10), channels.delete_records([(1, 11), (2, 5)]))
+    assert outbox.pending_count == 3
+    assert outbox.stats.commits == 1
+    assert remote.calls == []
+
+    with pytest.raises(httpx.ConnectError):
+        await channels.create_record(1, 10, 50)
+    assert outbox.stats.failed_sends == 1
+
+    remote.down = False
+    await channels.create_record(1, 10, 50)
+    # 同じキーの削除が先に届き、他のキーの削除はまだ送られない
+    assert remote.calls == [("delete_records", [(1, 10)]), ("create_record", 1, 10)]
+
+    outbox.start()
+    for _ in range(100):
+        if outbox.pending_count == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert remote.calls[-1] == ("delete_records", [(1, 11), (2, 5)])
+    assert outbox.stats.send_batches == 2
+    await outbox.close()
+
+
+@pytest.mark.asyncio
+async def test_unsent_writes_are_replayed_after_restart(tmp_path) -> None:
+    path = tmp_path / "outbox.sqlite3"
+    remote = FakeCategoryRepository()
+    remote.fail_with = httpx.ConnectError("supabase down")
+    outbox = WriteOutbox(path)
+    categories = OutboxTemporaryVoiceCategoryRepository(remote, outbox)
+    await outbox.open()
+    stored = await categories.upsert_category(1, 50, 7)
+    assert stored.category_id == 50
+    await categories.upsert_category(1, 51, 7)
+    await outbox.close()
+    assert remote.rows == {}
+
+    remote.fail_with = None
+    restarted = WriteOutbox(path)
+    categories = OutboxTemporaryVoiceCategoryRepository(remote, restarted)
+    await restarted.open()
+    assert restarted.stats.replayed == 2
+    assert await categories.get_category(1) == 51
+    await restarted.close()
+
+    reopened = WriteOutbox(path)
+    OutboxTemporaryVoiceCategoryRepository(remote, reopened)
+    await reopened.open()
+    assert reopened.pending_count == 0
+    await reopened.close()
+
+
+@pytest.mark.asyncio
+async def test_permanent_errors_are_dropped(tmp_path) -> None:
+    remote = FakeCategoryRepository()
+    remote.fail_with = RuntimeError("Supabase query failed: invalid input")
+    outbox = WriteOutbox(tmp_path / "outbox.sqlite3")
+    categories = OutboxTemporaryVoiceCategoryRepository(remote, outbox)
+    await outbox.open()
+    await categories.upsert_category(1, 50, 7)
+
+    assert await categories.get_category(1) is None
+    assert outbox.pending_count == 0
+    assert outbox.stats.dropped == 1
+    await outbox.close()
+
+
+@pytest.mark.asyncio
+async def test_reads_skip_pending_deletes_without_flushing_the_backlog(tmp_path) -> None:
+    remote = FakeChannelRepository()
+    outbox = WriteOutbox(tmp_path / "outbox.sqlite3")
+    channels = OutboxTemporaryVoiceChannelRepository(remote, outbox)
+    await outbox.open()
+    await channels.delete_records([(1, 1), (1, 2), (9, 9)])
+
+    page = await channels.list_page(None, 3)
+    assert [r.owner_user_id for r in page] == [0, 3, 4]
+    assert [call[0] for call in remote.calls] == ["list_page", "list_page"]
+    assert outbox.pending_count == 3
+
+    # 対象キーの削除だけを 1 回にまとめて送ってから更新する
+    await channels.update_last_seen([_record(1, 1), _record(1, 2), _record(1, 3)])
+    assert remote.calls[-2:] == [
+        ("delete_records", [(1, 1), (1, 2)]),
+        ("update_last_seen", 3),
+    ]
+    assert outbox.pending_count == 1
+    await outbox.close()
+
+
+def test_asyncpg_connection_errors_are_retried() -> None:
+    asyncpg = pytest.importorskip("asyncpg")
+
+    assert is_retryable_outbox_error(asyncpg.exceptions.ConnectionDoesNotExistError("closed"))
+    assert is_retryable_outbox_error(asyncpg.exceptions.TooManyConnectionsError("busy"))
+    assert not is_retryable_outbox_error(asyncpg.exceptions.UniqueViolationError("dup"))
@@ -1,9 +1,11 @@
+import time
 import types
-from datetime import datetime
+from datetime import datetime, timezone
 
 import pytest
 
 from bot import register_commands
+from app.database import DatabaseTimeoutError
 from app.repositories import TemporaryVoiceCategory
 from app.services import (
     CategoryNotConfiguredError,
@@ -40,6 +42,11 @@ class FakeInteraction:
         self.guild = types.SimpleNamespace(id=guild_id)
         self.response = FakeResponse()
         self.followup = FakeFollowup()
+        self.edited: list[str] = []
+        self.created_at = datetime.now(timezone.utc)
+
+    async def edit_original_response(self, *, content: str) -> None:
+        self.edited.append(content)
 
 
 class FakeCommandTree:
@@ -62,13 +69,16 @@ class FakeTemporaryVoiceService:
     def __init__(self) -> None:
         self.category_calls: list[tuple[object, object, int]] = []
         self.create_calls: list[object] = []
+        self.create_deadlines: list[float | None] = []
         self.reset_calls: list[object] = []
         self.create_error: Exception | None = None
         self.reset_error: Exception | None = None
         self.create_result = types.SimpleNamespace(mention="<#999>")
 
-    async def configure_category(self, guild, category, executor_id: int) -> CategoryUpdateResult:
+    async def configure_category(self, guild, category, executor_id: int, *, progress=None) -> CategoryUpdateResult:
         self.category_calls.append((guild, category, executor_id))
+        if progress is not None:
+            await progress(2, 2)
         entity = TemporaryVoiceCategory(
             guild_id=guild.id,
             category_id=category.id,
@@ -77,8 +87,9 @@ class FakeTemporaryVoiceService:
         )
         return CategoryUpdateResult(category=entity, deleted_channel_ids=[1, 2], missing_channel_ids=[])
 
-    async def create_temporary_channel(self, member):
+    async def create_temporary_channel(self, member, *, deadline=None):
         self.create_calls.append(member)
+        self.create_deadlines.append(deadline)
         if self.create_error is not None:
             error = self.create_error
             self.create_error = None
@@ -157,6 +168,7 @@ async def test_temporary_vc_category_command_configures_category() -> None:
     assert interaction.response.deferred_ephemeral is True
     assert interaction.followup.sent[0]["ephemeral"] is True
     assert voice_service.category_calls[0][2] == 42
+    assert interaction.edited == ["🧹 既存の一時VCを削除しています… 2/2"]
 
 
 @pytest.mark.asyncio
@@ -173,6 +185,23 @@ async def test_temporary_vc_create_command_handles_success() -> None:
 
     assert interaction.response.sent[0]["content"].startswith("✅")
     assert len(voice_service.create_calls) == 1
+    assert 0 < voice_service.create_deadlines[0] - time.monotonic() < 3
+
+
+@pytest.mark.asyncio
+async def test_temporary_vc_create_command_reports_database_timeout() -> None:
+    tree = FakeCommandTree()
+    client = types.SimpleNamespace(tree=tree)
+    voice_service = FakeTemporaryVoiceService()
+    voice_service.create_error = DatabaseTimeoutError("temporary_voice_channels", "insert", 2.5)
+    await register_commands(client, rule_store=types.SimpleNamespace(), temporary_voice_service=voice_service)
+
+    command = _get_group_command(tree, "create")
+    interaction = FakeInteraction(guild_id=5, user_id=77)
+
+    await command.callback(interaction)
+
+    assert interaction.response.sent[0]["content"].startswith("⌛")
 
 
 @pytest.mark.asyncio
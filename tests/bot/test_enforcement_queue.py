@@ -0,0 +1,143 @@
+import asyncio
+import types
+from dataclasses import replace
+from datetime import datetime
+
+import pytest
+
+from app.repositories import ChannelNicknameRule
+from bot.enforcement import SUPERSEDED_REACTION, NicknameEnforcementQueue
+
+
+def _rule() -> ChannelNicknameRule:
+    return ChannelNicknameRule(
+        guild_id=1,
+        channel_id=99,
+        role_id=5,
+        updated_by=1,
+        updated_at=datetime.now(),
+    )
+
+
+def _message(author_id: int) -> types.SimpleNamespace:
+    return types.SimpleNamespace(
+        guild=types.SimpleNamespace(id=1),
+        author=types.SimpleNamespace(id=author_id),
+        content=f"nick-{author_id}",
+    )
+
+
+@pytest.mark.asyncio
+async def test_queue_processes_jobs_on_workers() -> None:
+    handled: list[int] = []
+
+    async def handler(message, rule) -> None:
+        handled.append(message.author.id)
+
+    queue = NicknameEnforcementQueue(handler, workers=2, max_size=8)
+    queue.start()
+    for author_id in range(5):
+        queue.submit(_message(author_id), _rule())
+    await queue.join()
+    await queue.stop()
+
+    assert sorted(handled) == [0, 1, 2, 3, 4]
+    assert queue.stats.processed == 5
+    assert queue.stats.shed == 0
+    assert queue.depth == 0
+
+
+@pytest.mark.asyncio
+async def test_queue_sheds_oldest_job_when_full() -> None:
+    handled: list[int] = []
+
+    async def handler(message, rule) -> None:
+        handled.append(message.author.id)
+
+    queue = NicknameEnforcementQueue(handler, workers=1, max_size=2)
+    for author_id in range(4):
+        queue.submit(_message(author_id), _rule())
+
+    assert queue.depth == 2
+    assert queue.stats.shed == 2
+
+    queue.start()
+    await queue.join()
+    await queue.stop()
+
+    assert handled == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_queue_keeps_running_after_handler_error() -> None:
+    handled: list[int] = []
+
+    async def handler(message, rule) -> None:
+        if message.author.id == 0:
+            raise RuntimeError("boom")
+        handled.append(message.author.id)
+
+    queue = NicknameEnforcementQueue(handler, workers=1, max_size=4)
+    queue.start()
+    queue.submit(_message(0), _rule())
+    queue.submit(_message(1), _rule())
+    await asyncio.wait_for(queue.join(), timeout=1)
+    await queue.stop()
+
+    assert handled == [1]
+    assert queue.stats.failed == 1
+    assert queue.stats.processed == 1
+    assert queue.stats.average_wait_seconds == queue.stats.total_wait_seconds / 2
+
+
+@pytest.mark.asyncio
+async def test_queue_coalesces_rapid_posts_from_same_member() -> None:
+    handled: list[str] = []
+
+    async def handler(message, rule) -> None:
+        handled.append(message.content)
+
+    reactions: list[str] = []
+
+    async def add_reaction(emoji: str) -> None:
+        reactions.append(emoji)
+
+    queue = NicknameEnforcementQueue(handler, workers=1, max_size=4, coalesce_window=0.01)
+    queue.start()
+    for content in ("first", "second", "third"):
+        message = _message(7)
+        message.content = content
+        message.add_reaction = add_reaction
+        queue.submit(message, _rule())
+    other = _message(8)
+    queue.submit(other, _rule())
+
+    await asyncio.sleep(0.05)
+    await queue.join()
+    await queue.stop()
+
+    assert sorted(handled) == ["nick-8", "third"]
+    assert queue.stats.coalesced == 2
+    assert reactions == [SUPERSEDED_REACTION, SUPERSEDED_REACTION]
+
+
+@pytest.mark.asyncio
+async def test_queue_does_not_coalesce_posts_for_different_roles() -> None:
+    handled: list[int] = []
+
+    async def handler(message, rule) -> None:
+        handled.append(rule.role_id)
+
+    queue = NicknameEnforcementQueue(handler, workers=1, max_size=4, coalesce_window=0.05)
+    queue.start()
+    queue.submit(_message(7), _rule())
+    queue.submit(_message(7), replace(_rule(), channel_id=100, role_id=6))
+
+    await asyncio.sleep(0.1)
+    await queue.join()
+    await queue.stop()
+
+    assert sorted(handled) == [5, 6]
+    assert queue.stats.coalesced == 0
+    # まとめるために待った時間はキュー待ちに含めない
+    assert queue.stats.max_wait_seconds < 0.05
@@ -22,12 +22,27 @@ class FakeMember:
         self.bot = False
         self.added: list[tuple[FakeRole, str | None]] = []
         self.edits: list[tuple[str | None, str | None]] = []
+        self.role_edits: list[list[FakeRole]] = []
+        self.forbid_role_edit = False
 
     async def add_roles(self, role: FakeRole, *, reason: str | None = None) -> None:
         self.roles.append(role)
         self.added.append((role, reason))
 
-    async def edit(self, *, nick: str | None = None, reason: str | None = None) -> None:
+    async def edit(
+        self,
+        *,
+        nick: str | None = None,
+        roles: list[FakeRole] | None = None,
+        reason: str | None = None,
+    ) -> None:
+        if roles is not None:
+            if self.forbid_role_edit:
+                raise handlers_module.discord.Forbidden(
+                    types.SimpleNamespace(status=403, reason="Forbidden"), "Missing Permissions"
+                )
+            self.roles = list(roles)
+            self.role_edits.append(list(roles))
         if nick is not None:
             self.display_name = nick
         self.edits.append((nick, reason))
@@ -76,9 +91,33 @@ async def test_enforce_updates_nickname_and_assigns_role() -> None:
     await enforce_nickname_and_role(message, rule)
 
     assert member.display_name == "NewNick"
-    assert member.edits[0][0] == "NewNick"
+    assert member.edits == [("NewNick", handlers_module.NICKNAME_AND_ROLE_REASON)]
     assert member.roles[0] is role
-    assert member.added[0][1] is not None
+    assert member.role_edits == [[role]]
+    assert member.added == []
+    assert "✅" in message.reactions
+
+
+@pytest.mark.asyncio
+async def test_enforce_falls_back_to_two_step_update_when_combined_edit_forbidden() -> None:
+    role = FakeRole(role_id=50)
+    member = FakeMember(display_name="OldNick")
+    member.forbid_role_edit = True
+    guild = FakeGuild(guild_id=777, role=role)
+    message = FakeMessage(member, guild, content="NewNick")
+    rule = ChannelNicknameRule(
+        guild_id=777,
+        channel_id=99,
+        role_id=50,
+        updated_by=1,
+        updated_at=datetime.now(),
+    )
+
+    await enforce_nickname_and_role(message, rule)
+
+    assert member.display_name == "NewNick"
+    assert member.edits == [("NewNick", handlers_module.NICKNAME_CHANGE_REASON)]
+    assert member.added == [(role, handlers_module.ROLE_ASSIGN_REASON)]
     assert "✅" in message.reactions
 
 
@@ -0,0 +1,73 @@
+import types
+
+from bot.permissions import MemberManageabilityCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _role(role_id: int, position: int, *, managed: bool = False) -> types.SimpleNamespace:
+    return types.SimpleNamespace(id=role_id, position=position, managed=managed)
+
+
+def _guild(*, bot_position: int = 10, owner_id: int = 1, manage: bool = True) -> types.SimpleNamespace:
+    permissions = types.SimpleNamespace(manage_nicknames=manage, manage_roles=manage)
+    me = types.SimpleNamespace(id=500, top_role=_role(900, bot_position), guild_permissions=permissions)
+    return types.SimpleNamespace(id=77, owner_id=owner_id, me=me)
+
+
+def _member(member_id: int, position: int) -> types.SimpleNamespace:
+    return types.SimpleNamespace(id=member_id, top_role=_role(800 + member_id, position))
+
+
+def test_member_above_bot_or_owner_cannot_be_edited() -> None:
+    cache = MemberManageabilityCache()
+    guild = _guild(bot_position=10, owner_id=1)
+
+    assert cache.can_edit_nickname(guild, _member(2, 5)) is True
+    assert cache.can_edit_nickname(guild, _member(3, 10)) is False
+    assert cache.can_edit_nickname(guild, _member(1, 0)) is False
+    assert cache.stats.skipped_nickname_edits == 2
+
+
+def test_role_assignment_requires_lower_position_and_permission() -> None:
+    cache = MemberManageabilityCache()
+
+    assert cache.can_assign_role(_guild(bot_position=10), _role(1, 3)) is True
+    assert cache.can_assign_role(_guild(bot_position=10), _role(2, 12)) is False
+    assert cache.can_assign_role(_guild(bot_position=10), _role(3, 3, managed=True)) is False
+    assert MemberManageabilityCache().can_assign_role(_guild(manage=False), _role(1, 3)) is False
+
+
+def test_forbidden_outcomes_expire_after_ttl() -> None:
+    clock = FakeClock()
+    cache = MemberManageabilityCache(forbidden_ttl=60, clock=clock)
+    guild = _guild()
+    member = _member(2, 5)
+
+    cache.record_member_forbidden(guild.id, member.id)
+    assert cache.can_edit_nickname(guild, member) is False
+
+    clock.now = 61
+    assert cache.can_edit_nickname(guild, member) is True
+
+
+def test_invalidation_recomputes_verdicts() -> None:
+    cache = MemberManageabilityCache()
+    guild = _guild(bot_position=10)
+    member = _member(2, 15)
+    assert cache.can_edit_nickname(guild, member) is False
+
+    member.top_role = _role(802, 3)
+    assert cache.can_edit_nickname(guild, member) is False  # キャッシュ済みの判定
+    cache.invalidate_member(guild.id, member.id)
+    assert cache.can_edit_nickname(guild, member) is True
+
+    guild.me.top_role = _role(900, 1)
+    cache.invalidate_guild(guild.id)
+    assert cache.can_edit_nickname(guild, member) is False